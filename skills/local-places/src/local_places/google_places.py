@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import json
 import logging
+import math
 import os
-from typing import Any
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
 
 import httpx
 from fastapi import HTTPException
@@ -66,6 +72,20 @@ _RESOLVE_FIELD_MASK = (
     "places.types"
 )
 
+# Consecutive upstream failures (transport errors, 429, 5xx) before an endpoint's
+# circuit opens, and how long it stays open before a single half-open probe.
+_BREAKER_FAILURE_THRESHOLD = 5
+_BREAKER_RESET_SECONDS = 30.0
+
+# Cached results younger than the fresh window are served directly; older ones
+# within the stale window are served immediately while a background refresh runs.
+# Anything older is refetched, but still served if Google is failing.
+_CACHE_FRESH_SECONDS = 300.0
+_CACHE_STALE_SECONDS = 3600.0
+_CACHE_MAX_ENTRIES = 512
+
+_T = TypeVar("_T")
+
 
 class _GoogleResponse:
     def __init__(self, response: httpx.Response):
@@ -94,23 +114,208 @@ def _api_headers(field_mask: str) -> dict[str, str]:
     }
 
 
+class _CircuitBreaker:
+    """Fails fast once an endpoint keeps erroring, then lets one probe through."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self._failure_threshold = failure_threshold
+        self._reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    def before_request(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self._reset_seconds - time.monotonic()
+            if remaining > 0 or self._probing:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Google Places API temporarily unavailable.",
+                    headers={"Retry-After": str(max(1, math.ceil(remaining)))},
+                )
+            # Half-open: this caller is the probe, everyone else keeps failing fast.
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Google Places circuit '%s' closed.", self.name)
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release(self) -> None:
+        """End a request that says nothing about upstream health (e.g. interrupted)."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self._failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(
+                        "Google Places circuit '%s' opened after %s failures.",
+                        self.name,
+                        self._failures,
+                    )
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class _StaleCache:
+    """Thread-safe LRU of parsed results, remembering when each was stored."""
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> tuple[Any, float] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            stored_at, value = entry
+            return value, time.monotonic() - stored_at
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+_BREAKERS = {
+    endpoint: _CircuitBreaker(endpoint, _BREAKER_FAILURE_THRESHOLD, _BREAKER_RESET_SECONDS)
+    for endpoint in ("searchText", "details")
+}
+_cache = _StaleCache(_CACHE_MAX_ENTRIES)
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="places-refresh")
+_refreshing: set[str] = set()
+_refreshing_lock = threading.Lock()
+
+
 def _request(
-    method: str, url: str, payload: dict[str, Any] | None, field_mask: str
+    endpoint: str,
+    method: str,
+    url: str,
+    payload: dict[str, Any] | None,
+    field_mask: str,
 ) -> _GoogleResponse:
+    headers = _api_headers(field_mask)
+    breaker = _BREAKERS[endpoint]
+    breaker.before_request()
     try:
         with httpx.Client(timeout=10.0) as client:
             response = client.request(
                 method=method,
                 url=url,
-                headers=_api_headers(field_mask),
+                headers=headers,
                 json=payload,
             )
     except httpx.HTTPError as exc:
+        breaker.record_failure()
         raise HTTPException(status_code=502, detail="Google Places API unavailable.") from exc
-
+    except BaseException:
+        # KeyboardInterrupt, cancellation and the like are not upstream failures,
+        # but a half-open probe must still hand over to the next caller.
+        breaker.release()
+        raise
+
+    if response.status_code >= 500:
+        breaker.record_failure()
+    elif response.status_code == 429:
+        breaker.release()  # rate limited: upstream is up, but this is no success either
+    else:
+        breaker.record_success()
     return _GoogleResponse(response)
 
 
+def _fetch_payload(
+    endpoint: str,
+    method: str,
+    url: str,
+    body: dict[str, Any] | None,
+    field_mask: str,
+) -> dict[str, Any]:
+    response = _request(endpoint, method, url, body, field_mask)
+
+    if response.status_code >= 400:
+        logger.error(
+            "Google Places API error %s. response=%s",
+            response.status_code,
+            response.text,
+        )
+        raise HTTPException(
+            status_code=502,
+            detail=f"Google Places API error ({response.status_code}).",
+        )
+
+    try:
+        return response.json()
+    except ValueError as exc:
+        logger.error(
+            "Google Places API returned invalid JSON. response=%s",
+            response.text,
+        )
+        raise HTTPException(status_code=502, detail="Invalid Google response.") from exc
+
+
+def _cache_key(endpoint: str, body: dict[str, Any] | None, *parts: str) -> str:
+    return json.dumps([endpoint, *parts, body], sort_keys=True, separators=(",", ":"))
+
+
+def _refresh(key: str, fetch: Callable[[], Any]) -> None:
+    try:
+        _cache.put(key, fetch())
+    except HTTPException as exc:
+        logger.warning("Background refresh failed: %s", exc.detail)
+    except Exception:
+        logger.exception("Background refresh failed.")
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(key)
+
+
+def _schedule_refresh(key: str, fetch: Callable[[], Any]) -> None:
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    _refresh_executor.submit(_refresh, key, fetch)
+
+
+def _cached(key: str, fetch: Callable[[], _T]) -> _T:
+    cached = _cache.get(key)
+    if cached is not None:
+        value, age = cached
+        if age < _CACHE_FRESH_SECONDS:
+            return value
+        if age < _CACHE_STALE_SECONDS:
+            _schedule_refresh(key, fetch)
+            return value
+
+    try:
+        value = fetch()
+    except HTTPException as exc:
+        if cached is None or exc.status_code < 502:
+            raise
+        logger.warning(
+            "Serving stale Google Places result (age %.0fs): %s", cached[1], exc.detail
+        )
+        return cached[0]
+
+    _cache.put(key, value)
+    return value
+
+
 def _build_text_query(request: SearchRequest) -> str:
     keyword = request.filters.keyword if request.filters else None
     if keyword:
@@ -189,28 +394,13 @@ def _parse_price_level(raw: str | None) -> int | None:
 
 
 def search_places(request: SearchRequest) -> SearchResponse:
-    url = f"{GOOGLE_PLACES_BASE_URL}/places:searchText"
-    response = _request("POST", url, _build_search_body(request), _SEARCH_FIELD_MASK)
+    body = _build_search_body(request)
+    return _cached(_cache_key("searchText", body), lambda: _search_places(body))
 
-    if response.status_code >= 400:
-        logger.error(
-            "Google Places API error %s. response=%s",
-            response.status_code,
-            response.text,
-        )
-        raise HTTPException(
-            status_code=502,
-            detail=f"Google Places API error ({response.status_code}).",
-        )
 
-    try:
-        payload = response.json()
-    except ValueError as exc:
-        logger.error(
-            "Google Places API returned invalid JSON. response=%s",
-            response.text,
-        )
-        raise HTTPException(status_code=502, detail="Invalid Google response.") from exc
+def _search_places(body: dict[str, Any]) -> SearchResponse:
+    url = f"{GOOGLE_PLACES_BASE_URL}/places:searchText"
+    payload = _fetch_payload("searchText", "POST", url, body, _SEARCH_FIELD_MASK)
 
     places = payload.get("places", [])
     results = []
@@ -235,28 +425,14 @@ def search_places(request: SearchRequest) -> SearchResponse:
 
 
 def get_place_details(place_id: str) -> PlaceDetails:
-    url = f"{GOOGLE_PLACES_BASE_URL}/places/{place_id}"
-    response = _request("GET", url, None, _DETAILS_FIELD_MASK)
+    return _cached(
+        _cache_key("details", None, place_id), lambda: _get_place_details(place_id)
+    )
 
-    if response.status_code >= 400:
-        logger.error(
-            "Google Places API error %s. response=%s",
-            response.status_code,
-            response.text,
-        )
-        raise HTTPException(
-            status_code=502,
-            detail=f"Google Places API error ({response.status_code}).",
-        )
 
-    try:
-        payload = response.json()
-    except ValueError as exc:
-        logger.error(
-            "Google Places API returned invalid JSON. response=%s",
-            response.text,
-        )
-        raise HTTPException(status_code=502, detail="Invalid Google response.") from exc
+def _get_place_details(place_id: str) -> PlaceDetails:
+    url = f"{GOOGLE_PLACES_BASE_URL}/places/{place_id}"
+    payload = _fetch_payload("details", "GET", url, None, _DETAILS_FIELD_MASK)
 
     return PlaceDetails(
         place_id=payload.get("id", place_id),
@@ -274,29 +450,15 @@ def get_place_details(place_id: str) -> PlaceDetails:
 
 
 def resolve_locations(request: LocationResolveRequest) -> LocationResolveResponse:
-    url = f"{GOOGLE_PLACES_BASE_URL}/places:searchText"
     body = {"textQuery": request.location_text, "pageSize": request.limit}
-    response = _request("POST", url, body, _RESOLVE_FIELD_MASK)
+    return _cached(
+        _cache_key("searchText", body, "resolve"), lambda: _resolve_locations(body)
+    )
 
-    if response.status_code >= 400:
-        logger.error(
-            "Google Places API error %s. response=%s",
-            response.status_code,
-            response.text,
-        )
-        raise HTTPException(
-            status_code=502,
-            detail=f"Google Places API error ({response.status_code}).",
-        )
 
-    try:
-        payload = response.json()
-    except ValueError as exc:
-        logger.error(
-            "Google Places API returned invalid JSON. response=%s",
-            response.text,
-        )
-        raise HTTPException(status_code=502, detail="Invalid Google response.") from exc
+def _resolve_locations(body: dict[str, Any]) -> LocationResolveResponse:
+    url = f"{GOOGLE_PLACES_BASE_URL}/places:searchText"
+    payload = _fetch_payload("searchText", "POST", url, body, _RESOLVE_FIELD_MASK)
 
     places = payload.get("places", [])
     results = []
@@ -0,0 +1,167 @@
+"""Tests for the Google Places client's circuit breaker and stale-while-revalidate cache."""
+
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from local_places import google_places as gp
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Route the module's httpx.Client through a MockTransport driven by `handler`."""
+    state = {"calls": 0, "handler": lambda request: httpx.Response(200, json={})}
+
+    def handle(request):
+        state["calls"] += 1
+        return state["handler"](request)
+
+    transport = httpx.MockTransport(handle)
+    real_client = httpx.Client
+    monkeypatch.setattr(
+        gp.httpx, "Client", lambda **kwargs: real_client(transport=transport, **kwargs)
+    )
+    monkeypatch.setenv("GOOGLE_PLACES_API_KEY", "test-key")
+    monkeypatch.setattr(gp, "_cache", gp._StaleCache(gp._CACHE_MAX_ENTRIES))
+    monkeypatch.setattr(
+        gp,
+        "_BREAKERS",
+        {name: gp._CircuitBreaker(name, 5, 30.0) for name in ("searchText", "details")},
+    )
+    return state
+
+
+def details_request():
+    return gp._request("details", "GET", "https://places.test/v1/places/abc", None, "id")
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_circuit_opens_after_five_failures_and_fails_fast_with_retry_after(upstream):
+    upstream["handler"] = lambda request: httpx.Response(500)
+    for _ in range(5):
+        assert details_request().status_code == 500
+
+    with pytest.raises(HTTPException) as excinfo:
+        details_request()
+    assert excinfo.value.status_code == 503
+    assert 1 <= int(excinfo.value.headers["Retry-After"]) <= 30
+    assert upstream["calls"] == 5
+
+    # Other endpoints keep their own circuit.
+    gp._request("searchText", "POST", "https://places.test/v1/places:searchText", {}, "id")
+    assert upstream["calls"] == 6
+
+
+def test_transport_errors_count_as_failures(upstream):
+    def refuse(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    upstream["handler"] = refuse
+    for _ in range(5):
+        with pytest.raises(HTTPException) as excinfo:
+            details_request()
+        assert excinfo.value.status_code == 502
+    with pytest.raises(HTTPException) as excinfo:
+        details_request()
+    assert excinfo.value.status_code == 503
+
+
+def test_interrupts_and_rate_limits_do_not_open_the_circuit(upstream):
+    def interrupt(request):
+        raise KeyboardInterrupt
+
+    upstream["handler"] = interrupt
+    for _ in range(6):
+        with pytest.raises(KeyboardInterrupt):
+            details_request()
+    upstream["handler"] = lambda request: httpx.Response(429)
+    for _ in range(6):
+        assert details_request().status_code == 429
+
+    upstream["handler"] = lambda request: httpx.Response(200, json={})
+    assert details_request().status_code == 200
+    assert upstream["calls"] == 13
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = gp._CircuitBreaker("details", failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    breaker.before_request()  # one failure: still closed
+    breaker.record_failure()
+    with pytest.raises(HTTPException):
+        breaker.before_request()
+
+    time.sleep(0.06)
+    breaker.before_request()  # this caller is the probe
+    with pytest.raises(HTTPException) as excinfo:
+        breaker.before_request()  # everyone else still fails fast
+    assert excinfo.value.headers["Retry-After"] == "1"
+
+    breaker.record_failure()  # failed probe reopens at once
+    with pytest.raises(HTTPException):
+        breaker.before_request()
+
+    time.sleep(0.06)
+    breaker.before_request()
+    breaker.record_success()  # successful probe closes the circuit
+    breaker.before_request()
+    breaker.before_request()
+
+
+def test_stale_entry_is_served_while_refresh_runs_in_background(upstream, monkeypatch):
+    monkeypatch.setattr(gp, "_CACHE_FRESH_SECONDS", 0.0)
+    release = threading.Event()
+    names = iter(["Old Cafe", "New Cafe"])
+
+    def handler(request):
+        name = next(names)
+        if name == "New Cafe":
+            assert release.wait(5)
+        return httpx.Response(200, json={"id": "abc", "displayName": {"text": name}})
+
+    upstream["handler"] = handler
+    assert gp.get_place_details("abc").name == "Old Cafe"
+
+    # Stale: answered from cache at once, one refresh scheduled however often it is asked.
+    assert gp.get_place_details("abc").name == "Old Cafe"
+    assert gp.get_place_details("abc").name == "Old Cafe"
+    wait_for(lambda: upstream["calls"] == 2)
+    assert gp._refreshing
+
+    release.set()
+    wait_for(lambda: not gp._refreshing)
+    assert upstream["calls"] == 2
+    assert gp._cache.get(gp._cache_key("details", None, "abc"))[0].name == "New Cafe"
+
+
+def test_failed_refresh_keeps_the_stale_entry(upstream, monkeypatch, caplog):
+    monkeypatch.setattr(gp, "_CACHE_FRESH_SECONDS", 0.0)
+    upstream["handler"] = lambda request: httpx.Response(
+        200, json={"id": "abc", "displayName": {"text": "Old Cafe"}}
+    )
+    assert gp.get_place_details("abc").name == "Old Cafe"
+
+    upstream["handler"] = lambda request: httpx.Response(503)
+    with caplog.at_level("WARNING", logger="local_places.google_places"):
+        assert gp.get_place_details("abc").name == "Old Cafe"
+        wait_for(lambda: not gp._refreshing)
+    assert "Background refresh failed" in caplog.text
+    assert gp._cache.get(gp._cache_key("details", None, "abc"))[0].name == "Old Cafe"
+
+    # Past the stale window the request goes upstream, but a 5xx still falls back.
+    monkeypatch.setattr(gp, "_CACHE_STALE_SECONDS", 0.0)
+    assert gp.get_place_details("abc").name == "Old Cafe"
+
+    # Nothing cached: the upstream error surfaces.
+    with pytest.raises(HTTPException) as excinfo:
+        gp.get_place_details("xyz")
+    assert excinfo.value.status_code == 502
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark model_usage parsing/aggregation on synthetic multi-year CodexBar payloads.
+
+Usage:
+    python bench_model_usage.py --years 10 --models 12
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List
+
+from model_usage import (
+    BudgetEngine,
+    BudgetRule,
+    aggregate_costs,
+    iter_daily_entries,
+    latest_day_cost,
+    load_payload,
+    parse_daily_entries,
+    pick_current_model,
+    summarize_entries,
+)
+
+
+def synthetic_payload(years: int, models: int, seed: int = 7) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=365 * years - 1)
+    payload = []
+    for provider in ("claude", "codex"):
+        names = [f"{provider}-model-{idx}" for idx in range(models)]
+        daily = []
+        for offset in range(365 * years):
+            day = (start + timedelta(days=offset)).isoformat()
+            used = rng.sample(names, k=rng.randint(1, models))
+            daily.append(
+                {
+                    "date": day,
+                    "inputTokens": rng.randint(1_000, 5_000_000),
+                    "outputTokens": rng.randint(1_000, 500_000),
+                    "cacheReadTokens": rng.randint(0, 10_000_000),
+                    "cacheCreationTokens": rng.randint(0, 1_000_000),
+                    "totalTokens": rng.randint(1_000, 20_000_000),
+                    "totalCost": round(rng.uniform(0, 250), 6),
+                    "modelsUsed": used,
+                    "modelBreakdowns": [
+                        {"modelName": name, "cost": round(rng.uniform(0, 80), 6)} for name in used
+                    ],
+                }
+            )
+        payload.append({"provider": provider, "source": "local", "daily": daily})
+    return payload
+
+
+def measure(label: str, fn: Callable[[], Any], runs: int) -> Any:
+    best = float("inf")
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<30} {best * 1000:>10.1f} ms {peak / 1_048_576:>10.1f} MiB peak")
+    return result
+
+
+def current_multi_pass(entries: List[Dict[str, Any]]) -> Any:
+    model, latest_date = pick_current_model(entries)
+    totals = aggregate_costs(entries)
+    return model, latest_date, totals.get(model), latest_day_cost(entries, model), len(entries)
+
+
+def current_single_pass(entries: List[Dict[str, Any]]) -> Any:
+    summary = summarize_entries(entries)
+    model = summary.current_model
+    return (
+        model,
+        summary.current_model_date,
+        summary.totals.get(model),
+        summary.latest_day_cost(model),
+        summary.row_count,
+    )
+
+
+def budget_rules(count: int, models: int, seed: int = 33) -> List[BudgetRule]:
+    rng = random.Random(seed)
+    rules = []
+    for idx in range(count):
+        provider = rng.choice([None, "codex", "claude"])
+        model = None
+        if provider and rng.random() < 0.7:
+            model = f"{provider}-model-{rng.randrange(models)}"
+        rules.append(
+            BudgetRule(
+                name=f"rule-{idx}",
+                limit_usd=rng.uniform(10, 5000),
+                window_days=rng.choice([1, 7, 30, 90, 365]),
+                provider=provider,
+                model=model,
+            )
+        )
+    return rules
+
+
+def evaluate_budgets(path: str, rules: List[BudgetRule]) -> Any:
+    engine = BudgetEngine(rules)
+    for provider in ("codex", "claude"):
+        for entry in iter_daily_entries(path, provider):
+            engine.add_entry(provider, entry)
+    return engine.evaluate()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark model_usage on synthetic payloads.")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--models", type=int, default=12)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--rules", type=int, default=500)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(synthetic_payload(args.years, args.models), handle)
+        size_mib = os.path.getsize(path) / 1_048_576
+        print(f"payload: {args.years} years, {args.models} models/provider, {size_mib:.1f} MiB")
+
+        legacy = measure(
+            "load_payload (json.loads)",
+            lambda: aggregate_costs(parse_daily_entries(load_payload(path, "codex"))),
+            args.runs,
+        )
+        streamed = measure(
+            "iter_daily_entries (stream)",
+            lambda: aggregate_costs(iter_daily_entries(path, "codex")),
+            args.runs,
+        )
+        if legacy != streamed:
+            raise SystemExit("streaming totals differ from json.loads totals")
+
+        entries = parse_daily_entries(load_payload(path, "codex"))
+        shuffled = list(entries)
+        random.Random(0).shuffle(shuffled)
+        for order, rows in (("sorted", entries), ("shuffled", shuffled)):
+            multi = measure(
+                f"current/{order}: multi-pass", lambda: current_multi_pass(rows), args.runs
+            )
+            single = measure(
+                f"current/{order}: 1-pass", lambda: current_single_pass(rows), args.runs
+            )
+            if multi != single:
+                raise SystemExit("single-pass current summary differs from multi-pass helpers")
+
+        rules = budget_rules(args.rules, args.models)
+        measure(f"budgets: {args.rules} rules", lambda: evaluate_budgets(path, rules), args.runs)
+    finally:
+        os.unlink(path)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -7,14 +7,53 @@ Defaults to current model (most recent daily entry), or list all models.
 
 from __future__ import annotations
 
+import time
+
+# --profile counts "startup" from here, on the same clock as the other phases: module
+# imports, module body and argument parsing. Interpreter start-up before this line is
+# not included; `python -X importtime` breaks the imports down further.
+LOADED_AT = time.perf_counter()
+
+# Startup matters: this runs from cron and heartbeat hooks, so anything only some modes
+# need (sqlite3, csv, subprocess, process pools, sockets, numpy) is imported where used.
 import argparse
+import itertools
 import json
 import os
-import subprocess
+import re
 import sys
-from dataclasses import dataclass
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    import socketserver
+    import sqlite3
+    import subprocess
+
+STREAM_CHUNK_SIZE = 1 << 16
+DEFAULT_CACHE_MAX_AGE = 300
+DEFAULT_WATCH_INTERVAL = 2.0
+# Each codexbar poll re-runs the CLI and rescans its logs, unlike a stat of an input file.
+DEFAULT_CODEXBAR_WATCH_INTERVAL = 60.0
+BUDGET_ALERT_EXIT_CODE = 3
+PROVIDERS = ("codex", "claude")
+ROLLING_WINDOWS = (7, 30)
+MIN_BURN_DAYS = 3
+PERCENTILES = (50, 90, 99)
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_CHARS = re.compile(r"[0-9.eE+-]*")
 
 
 def positive_int(value: str) -> int:
@@ -27,11 +66,23 @@ def positive_int(value: str) -> int:
     return parsed
 
 
+def positive_float(value: str) -> float:
+    try:
+        parsed = float(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError("must be a number") from exc
+    if not parsed > 0:
+        raise argparse.ArgumentTypeError("must be > 0")
+    return parsed
+
+
 def eprint(msg: str) -> None:
     print(msg, file=sys.stderr)
 
 
 def run_codexbar_cost(provider: str) -> List[Dict[str, Any]]:
+    import subprocess
+
     cmd = ["codexbar", "cost", "--format", "json", "--provider", provider]
     try:
         output = subprocess.check_output(cmd, text=True)
@@ -71,10 +122,287 @@ def load_payload(input_path: Optional[str], provider: str) -> Dict[str, Any]:
     raise RuntimeError("Unsupported JSON input format.")
 
 
-@dataclass
-class ModelCost:
-    model: str
-    cost: float
+class JsonStream:
+    """Incremental JSON reader that decodes one value at a time from a text stream.
+
+    Only the structure the caller walks (arrays/objects entered via iter_array and
+    iter_object) is parsed piecewise; everything else is decoded whole with value().
+    The buffer only ever holds the unconsumed tail plus one chunk, so memory stays
+    bounded by the largest single value decoded rather than the document size.
+    """
+
+    def __init__(self, handle: TextIO, chunk_size: int = STREAM_CHUNK_SIZE) -> None:
+        self._handle = handle
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._handle.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found {found!r} in JSON stream.")
+        self._pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                parsed, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number running up to the buffer edge ("12", "12." or "12.5e") may
+            # continue in the next chunk; only a delimiter after it proves it complete.
+            if (
+                isinstance(parsed, (int, float))
+                and not isinstance(parsed, bool)
+                and _NUMBER_CHARS.match(self._buf, end).end() == len(self._buf)
+                and self._fill()
+            ):
+                continue
+            self._pos = end
+            return parsed
+
+    def iter_array(self) -> Iterator[None]:
+        """Yield once per element; the caller must consume each element."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("]")
+            return
+
+    def iter_object(self) -> Iterator[str]:
+        """Yield each key; the caller must consume the matching value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError("Expected string key in JSON stream.")
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("}")
+            return
+
+
+def _stream_provider_daily(
+    stream: JsonStream, provider: Optional[str]
+) -> Generator[Dict[str, Any], None, bool]:
+    """Yield daily rows of one provider object; return whether it matched.
+
+    provider=None accepts the object unconditionally (single-provider input).
+    Rows seen before the "provider" key are held back until it is known.
+    """
+    matched = provider is None
+    known = matched
+    pending: List[Dict[str, Any]] = []
+    for key in stream.iter_object():
+        if key == "provider" and not known:
+            matched = stream.value() == provider
+            known = True
+            if matched:
+                yield from pending
+            pending = []
+        elif key == "daily" and stream.peek() == "[":
+            for _ in stream.iter_array():
+                entry = stream.value()
+                if not isinstance(entry, dict):
+                    continue
+                if matched:
+                    yield entry
+                elif not known:
+                    pending.append(entry)
+        else:
+            stream.value()
+    return matched
+
+
+def stream_daily_entries(
+    handle: TextIO,
+    provider: str,
+    expect_array: bool = False,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    match_provider: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Stream daily rows for `provider` without loading the whole payload.
+
+    Accepts the same shapes as load_payload: a single provider object or the
+    codexbar array of provider objects. A single object is taken as-is unless
+    match_provider is set, in which case its "provider" field must match too.
+    """
+    stream = JsonStream(handle, chunk_size=chunk_size)
+    first = stream.peek()
+    if first == "{" and not expect_array:
+        matched = yield from _stream_provider_daily(stream, provider if match_provider else None)
+        if not matched:
+            raise RuntimeError(f"Provider '{provider}' not found in codexbar payload.")
+        return
+    if first == "[":
+        for _ in stream.iter_array():
+            if stream.peek() != "{":
+                stream.value()
+                continue
+            matched = yield from _stream_provider_daily(stream, provider)
+            if matched:
+                return
+        raise RuntimeError(f"Provider '{provider}' not found in codexbar payload.")
+    if expect_array:
+        raise RuntimeError("Expected codexbar cost JSON array.")
+    raise RuntimeError("Unsupported JSON input format.")
+
+
+def stream_codexbar_daily(provider: str) -> Iterator[Dict[str, Any]]:
+    import subprocess
+
+    cmd = ["codexbar", "cost", "--format", "json", "--provider", provider]
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    except FileNotFoundError:
+        raise RuntimeError("codexbar not found on PATH. Install CodexBar CLI first.")
+    assert proc.stdout is not None
+    try:
+        try:
+            yield from stream_daily_entries(proc.stdout, provider, expect_array=True)
+        except (ValueError, RuntimeError) as exc:
+            # A failed run usually explains a truncated or missing payload better.
+            if _drain_and_wait(proc) != 0:
+                raise RuntimeError(f"codexbar cost failed (exit {proc.returncode}).") from exc
+            if isinstance(exc, ValueError):
+                raise RuntimeError(f"Failed to parse codexbar JSON output: {exc}") from exc
+            raise
+        if _drain_and_wait(proc) != 0:
+            raise RuntimeError(f"codexbar cost failed (exit {proc.returncode}).")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+
+def _drain_and_wait(proc: "subprocess.Popen[str]") -> int:
+    assert proc.stdout is not None
+    while proc.stdout.read(STREAM_CHUNK_SIZE):
+        pass
+    return proc.wait()
+
+
+def iter_daily_entries(
+    input_path: Optional[str], provider: str, match_provider: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """Streaming counterpart of load_payload + parse_daily_entries."""
+    if not input_path:
+        yield from stream_codexbar_daily(provider)
+    elif input_path == "-":
+        yield from stream_daily_entries(sys.stdin, provider, match_provider=match_provider)
+    else:
+        with open(input_path, "r", encoding="utf-8") as handle:
+            yield from stream_daily_entries(handle, provider, match_provider=match_provider)
+
+
+def expand_inputs(paths: Iterable[str]) -> List[str]:
+    """Expand directories to the *.json files directly inside them."""
+    import glob
+
+    expanded: List[str] = []
+    for path in paths:
+        if path != "-" and os.path.isdir(path):
+            expanded.extend(sorted(glob.glob(os.path.join(path, "*.json"))))
+        else:
+            expanded.append(path)
+    return expanded
+
+
+def is_missing_provider(exc: Exception, provider: str) -> bool:
+    return isinstance(exc, RuntimeError) and str(exc).startswith(f"Provider '{provider}' not found")
+
+
+def collect_source(
+    input_path: Optional[str], provider: str, days: Optional[int], match_provider: bool
+) -> Dict[str, Any]:
+    """Aggregate one (input, provider) source; runs in a worker process.
+
+    A provider missing from a file is not an error when collecting every provider,
+    since most hosts only use one of them.
+    """
+    result: Dict[str, Any] = {"source": input_path or "codexbar", "provider": provider}
+    rows = 0
+
+    def counted(entries: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        nonlocal rows
+        for entry in entries:
+            rows += 1
+            yield entry
+
+    try:
+        entries = iter_daily_entries(input_path, provider, match_provider=match_provider)
+        result["totals"] = aggregate_costs(counted(iter_filter_by_days(entries, days)))
+    except Exception as exc:
+        if match_provider and is_missing_provider(exc, provider):
+            result["missing"] = True
+        else:
+            result["error"] = str(exc)
+    result["dailyRowCount"] = rows
+    return result
+
+
+def collect_sources(
+    inputs: List[Optional[str]],
+    providers: List[str],
+    days: Optional[int],
+    jobs: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Run collect_source for every input x provider, concurrently when there are several."""
+    match_provider = len(providers) > 1
+    tasks = [(path, provider, days, match_provider) for path in inputs for provider in providers]
+    if len(tasks) == 1:
+        return [collect_source(*tasks[0])]
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(len(tasks), jobs or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(collect_source, *task) for task in tasks]
+        return [future.result() for future in futures]
+
+
+def merge_totals(results: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+    totals: Dict[str, float] = {}
+    for result in results:
+        for model, cost in result.get("totals", {}).items():
+            totals[model] = totals.get(model, 0.0) + cost
+    return totals
 
 
 def parse_daily_entries(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -86,26 +414,270 @@ def parse_daily_entries(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
     return [entry for entry in daily if isinstance(entry, dict)]
 
 
+_DATE_CACHE: Dict[str, Optional[date]] = {}
+
+
 def parse_date(value: str) -> Optional[date]:
+    """Parse YYYY-MM-DD, memoized since the same few thousand days repeat across calls."""
     try:
-        return datetime.strptime(value, "%Y-%m-%d").date()
-    except Exception:
+        return _DATE_CACHE[value]
+    except KeyError:
+        pass
+    except TypeError:
         return None
+    parsed: Optional[date]
+    try:
+        if len(value) == 10 and value[4] == "-" and value[7] == "-":
+            parsed = date.fromisoformat(value)
+        else:
+            # strptime also accepts unpadded fields like 2025-1-2.
+            parsed = datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        parsed = None
+    if len(_DATE_CACHE) >= 65536:
+        _DATE_CACHE.clear()
+    _DATE_CACHE[value] = parsed
+    return parsed
 
 
 def filter_by_days(entries: List[Dict[str, Any]], days: Optional[int]) -> List[Dict[str, Any]]:
     if not days:
         return entries
+    return list(iter_filter_by_days(entries, days))
+
+
+def iter_filter_by_days(
+    entries: Iterable[Dict[str, Any]], days: Optional[int]
+) -> Iterator[Dict[str, Any]]:
+    if not days:
+        yield from entries
+        return
     cutoff = date.today() - timedelta(days=days - 1)
-    filtered: List[Dict[str, Any]] = []
     for entry in entries:
         day = entry.get("date")
         if not isinstance(day, str):
             continue
         parsed = parse_date(day)
         if parsed and parsed >= cutoff:
-            filtered.append(entry)
-    return filtered
+            yield entry
+
+
+# Bump when the schema changes: the cache is disposable and rebuilt from the source.
+CACHE_VERSION = 2
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS days (
+    source TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    date TEXT NOT NULL,
+    models_used TEXT,
+    PRIMARY KEY (source, provider, date)
+);
+CREATE TABLE IF NOT EXISTS model_costs (
+    source TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    date TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    cost REAL,
+    PRIMARY KEY (source, provider, date, position)
+);
+CREATE TABLE IF NOT EXISTS undated (
+    source TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (source, provider, position)
+);
+CREATE TABLE IF NOT EXISTS refreshes (
+    source TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    refreshed_at REAL NOT NULL,
+    PRIMARY KEY (source, provider)
+);
+"""
+CODEXBAR_SOURCE = "codexbar"
+
+
+def default_cache_path() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "model-usage", "usage.sqlite3")
+
+
+def cache_source(input_path: Optional[str]) -> str:
+    """Cache key for where rows come from: the absolute input path, or codexbar itself."""
+    return CODEXBAR_SOURCE if input_path is None else os.path.abspath(input_path)
+
+
+def open_cache(path: str) -> sqlite3.Connection:
+    import sqlite3
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != CACHE_VERSION:
+        with conn:
+            for table in ("days", "model_costs", "undated", "refreshes"):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+    conn.executescript(CACHE_SCHEMA)
+    return conn
+
+
+def cache_refreshed_at(
+    conn: sqlite3.Connection, provider: str, source: str = CODEXBAR_SOURCE
+) -> Optional[float]:
+    row = conn.execute(
+        "SELECT refreshed_at FROM refreshes WHERE source = ? AND provider = ?", (source, provider)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def last_cached_date(
+    conn: sqlite3.Connection, provider: str, source: str = CODEXBAR_SOURCE
+) -> Optional[str]:
+    row = conn.execute(
+        "SELECT MAX(date) FROM days WHERE source = ? AND provider = ?", (source, provider)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def cost_value(item: Dict[str, Any]) -> Optional[float]:
+    cost = item.get("cost")
+    return cost if isinstance(cost, (int, float)) else None
+
+
+def ingest_entries(
+    conn: sqlite3.Connection,
+    provider: str,
+    entries: Iterable[Dict[str, Any]],
+    full: bool = False,
+    source: str = CODEXBAR_SOURCE,
+) -> int:
+    """Store one source's daily rows in the cache and return how many were (re)written.
+
+    Incremental by default: rows older than the newest cached day are skipped, and
+    that day itself is rewritten since it was probably still accumulating usage.
+    Rows without a valid YYYY-MM-DD date cannot be keyed by day; they are kept
+    as-is and replaced on every ingest, so cached and uncached reports match.
+    """
+    written = 0
+    key = (source, provider)
+    with conn:
+        if full:
+            conn.execute("DELETE FROM days WHERE source = ? AND provider = ?", key)
+            conn.execute("DELETE FROM model_costs WHERE source = ? AND provider = ?", key)
+        conn.execute("DELETE FROM undated WHERE source = ? AND provider = ?", key)
+        since = None if full else last_cached_date(conn, provider, source)
+        undated = 0
+        for entry in entries:
+            day = entry.get("date")
+            parsed = parse_date(day) if isinstance(day, str) else None
+            if parsed is None:
+                conn.execute(
+                    "INSERT INTO undated (source, provider, position, entry) VALUES (?, ?, ?, ?)",
+                    (*key, undated, json.dumps(entry)),
+                )
+                undated += 1
+                written += 1
+                continue
+            day = parsed.isoformat()
+            if since and day < since:
+                continue
+            models_used = entry.get("modelsUsed")
+            conn.execute(
+                "INSERT OR REPLACE INTO days (source, provider, date, models_used)"
+                " VALUES (?, ?, ?, ?)",
+                (*key, day, json.dumps(models_used) if isinstance(models_used, list) else None),
+            )
+            conn.execute(
+                "DELETE FROM model_costs WHERE source = ? AND provider = ? AND date = ?",
+                (*key, day),
+            )
+            breakdowns = entry.get("modelBreakdowns")
+            if isinstance(breakdowns, list):
+                conn.executemany(
+                    "INSERT INTO model_costs (source, provider, date, position, model, cost)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (*key, day, position, item["modelName"], cost_value(item))
+                        for position, item in enumerate(breakdowns)
+                        if isinstance(item, dict) and isinstance(item.get("modelName"), str)
+                    ],
+                )
+            written += 1
+        conn.execute(
+            "INSERT OR REPLACE INTO refreshes (source, provider, refreshed_at) VALUES (?, ?, ?)",
+            (*key, time.time()),
+        )
+    return written
+
+
+def iter_cached_entries(
+    conn: sqlite3.Connection,
+    provider: str,
+    days: Optional[int] = None,
+    source: str = CODEXBAR_SOURCE,
+) -> Iterator[Dict[str, Any]]:
+    """Rebuild one source's daily rows from the cache: undated rows first, then oldest first.
+
+    Undated rows are left out when `days` is set, as iter_filter_by_days does.
+    """
+    if not days:
+        for (entry,) in conn.execute(
+            "SELECT entry FROM undated WHERE source = ? AND provider = ? ORDER BY position",
+            (source, provider),
+        ):
+            yield json.loads(entry)
+    cutoff = (date.today() - timedelta(days=days - 1)).isoformat() if days else ""
+    rows = conn.execute(
+        "SELECT d.date, d.models_used, c.model, c.cost FROM days d"
+        " LEFT JOIN model_costs c"
+        " ON c.source = d.source AND c.provider = d.provider AND c.date = d.date"
+        " WHERE d.source = ? AND d.provider = ? AND d.date >= ?"
+        " ORDER BY d.date, c.position",
+        (source, provider, cutoff),
+    )
+    for (day, models_used), group in itertools.groupby(rows, key=lambda row: row[:2]):
+        entry: Dict[str, Any] = {
+            "date": day,
+            "modelBreakdowns": [
+                {"modelName": model, "cost": cost}
+                for _, _, model, cost in group
+                if model is not None
+            ],
+        }
+        if models_used is not None:
+            entry["modelsUsed"] = json.loads(models_used)
+        yield entry
+
+
+def cached_daily_entries(
+    cache_path: str,
+    input_path: Optional[str],
+    provider: str,
+    days: Optional[int],
+    max_age: int = DEFAULT_CACHE_MAX_AGE,
+    refresh: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Serve daily rows from the cache, re-ingesting new days from the source when stale.
+
+    Stdin has no stable identity (each run may pipe a different payload), so it
+    is always parsed directly and never cached.
+    """
+    if input_path == "-":
+        yield from iter_daily_entries(input_path, provider)
+        return
+    source = cache_source(input_path)
+    conn = open_cache(cache_path)
+    try:
+        refreshed_at = cache_refreshed_at(conn, provider, source)
+        if refresh or refreshed_at is None or time.time() - refreshed_at >= max_age:
+            entries = iter_daily_entries(input_path, provider)
+            ingest_entries(conn, provider, entries, full=refresh, source=source)
+        yield from iter_cached_entries(conn, provider, days, source)
+    finally:
+        conn.close()
 
 
 def aggregate_costs(entries: Iterable[Dict[str, Any]]) -> Dict[str, float]:
@@ -139,17 +711,17 @@ def pick_current_model(entries: List[Dict[str, Any]]) -> Tuple[Optional[str], Op
     for entry in reversed(sorted_entries):
         breakdowns = entry.get("modelBreakdowns")
         if isinstance(breakdowns, list) and breakdowns:
-            scored: List[ModelCost] = []
+            scored: List[Tuple[str, float]] = []
             for item in breakdowns:
                 if not isinstance(item, dict):
                     continue
                 model = item.get("modelName")
                 cost = item.get("cost")
                 if isinstance(model, str) and isinstance(cost, (int, float)):
-                    scored.append(ModelCost(model=model, cost=float(cost)))
+                    scored.append((model, float(cost)))
             if scored:
-                scored.sort(key=lambda item: item.cost, reverse=True)
-                return scored[0].model, entry.get("date") if isinstance(entry.get("date"), str) else None
+                scored.sort(key=lambda item: item[1], reverse=True)
+                return scored[0][0], entry.get("date") if isinstance(entry.get("date"), str) else None
         models_used = entry.get("modelsUsed")
         if isinstance(models_used, list) and models_used:
             last = models_used[-1]
@@ -185,6 +757,232 @@ def latest_day_cost(entries: List[Dict[str, Any]], model: str) -> Tuple[Optional
     return None, None
 
 
+class UsageSummary(NamedTuple):
+    """Everything --mode current reports, gathered in one pass over the rows."""
+
+    totals: Dict[str, float]
+    current_model: Optional[str]
+    current_model_date: Optional[str]
+    latest_costs: Dict[str, Tuple[Optional[str], Optional[float]]]
+    row_count: int
+
+    def latest_day_cost(self, model: str) -> Tuple[Optional[str], Optional[float]]:
+        return self.latest_costs.get(model, (None, None))
+
+
+def summarize_entries(entries: Iterable[Dict[str, Any]]) -> UsageSummary:
+    """Single pass equivalent of aggregate_costs, pick_current_model and latest_day_cost.
+
+    Instead of sorting, remember the row with the greatest date key (per model, and
+    overall among rows that name a model); on ties the later row wins, matching
+    reversed() over a stable sort. Those few rows are re-read once at the end.
+    """
+    # model -> [total cost, has numeric cost, latest date key, latest row]
+    stats: Dict[str, List[Any]] = {}
+    current_key: Any = None
+    current_entry: Optional[Dict[str, Any]] = None
+    row_count = 0
+    for entry in entries:
+        row_count += 1
+        key = entry.get("date") or ""
+        breakdowns = entry.get("modelBreakdowns")
+        scored = False
+        if isinstance(breakdowns, list):
+            for item in breakdowns:
+                if not isinstance(item, dict):
+                    continue
+                model = item.get("modelName")
+                if not isinstance(model, str):
+                    continue
+                acc = stats.get(model)
+                if acc is None:
+                    acc = stats[model] = [0.0, False, key, entry]
+                elif key >= acc[2]:
+                    acc[2] = key
+                    acc[3] = entry
+                cost = item.get("cost")
+                if isinstance(cost, (int, float)):
+                    acc[0] += float(cost)
+                    acc[1] = True
+                    scored = True
+        if not scored:
+            models_used = entry.get("modelsUsed")
+            if not (
+                isinstance(models_used, list) and models_used and isinstance(models_used[-1], str)
+            ):
+                continue
+        if current_entry is None or key >= current_key:
+            current_key = key
+            current_entry = entry
+
+    current_model, current_model_date = (
+        pick_current_model([current_entry]) if current_entry is not None else (None, None)
+    )
+    return UsageSummary(
+        totals={model: acc[0] for model, acc in stats.items() if acc[1]},
+        current_model=current_model,
+        current_model_date=current_model_date,
+        latest_costs={model: latest_day_cost([acc[3]], model) for model, acc in stats.items()},
+        row_count=row_count,
+    )
+
+
+def _require_numpy() -> Any:
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("--mode series/stats requires numpy (pip install numpy).")
+    return numpy
+
+
+class CostMatrix(NamedTuple):
+    """Daily cost per model: costs[day, model] over a contiguous date range."""
+
+    start: date
+    models: List[str]
+    costs: Any
+
+    @property
+    def dates(self) -> List[date]:
+        return [self.start + timedelta(days=offset) for offset in range(self.costs.shape[0])]
+
+
+def build_cost_matrix(
+    entries: Iterable[Dict[str, Any]], model: Optional[str] = None
+) -> CostMatrix:
+    """Load modelBreakdowns into a date x model array; missing days are zero.
+
+    Rows without a valid date, non-string models and non-numeric costs are skipped,
+    as in aggregate_costs. Models are ordered by total cost, highest first.
+    """
+    np = _require_numpy()
+    model_index: Dict[str, int] = {}
+    days: List[int] = []
+    columns: List[int] = []
+    costs: List[float] = []
+    for entry in entries:
+        day = entry.get("date")
+        parsed = parse_date(day) if isinstance(day, str) else None
+        breakdowns = entry.get("modelBreakdowns")
+        if parsed is None or not isinstance(breakdowns, list):
+            continue
+        ordinal = parsed.toordinal()
+        for item in breakdowns:
+            if not isinstance(item, dict):
+                continue
+            name = item.get("modelName")
+            cost = item.get("cost")
+            if not isinstance(name, str) or not isinstance(cost, (int, float)):
+                continue
+            if model and name != model:
+                continue
+            days.append(ordinal)
+            columns.append(model_index.setdefault(name, len(model_index)))
+            costs.append(float(cost))
+
+    if not days:
+        return CostMatrix(start=date.today(), models=[], costs=np.zeros((0, 0)))
+    day_array = np.asarray(days, dtype=np.int64)
+    first = int(day_array.min())
+    shape = (int(day_array.max()) - first + 1, len(model_index))
+    flat = (day_array - first) * shape[1] + np.asarray(columns, dtype=np.int64)
+    matrix = np.bincount(flat, weights=costs, minlength=shape[0] * shape[1]).reshape(shape)
+    order = np.argsort(-matrix.sum(axis=0), kind="stable")
+    names = list(model_index)
+    return CostMatrix(
+        start=date.fromordinal(first),
+        models=[names[column] for column in order],
+        costs=matrix[:, order],
+    )
+
+
+def rolling_sum(values: Any, window: int) -> Any:
+    """Trailing sum over `window` days along axis 0 (shorter at the start)."""
+    np = _require_numpy()
+    cumulative = np.cumsum(values, axis=0)
+    shifted = np.zeros_like(cumulative)
+    shifted[window:] = cumulative[:-window]
+    return cumulative - shifted
+
+
+def build_json_series(provider: str, matrix: CostMatrix) -> Dict[str, Any]:
+    total = matrix.costs.sum(axis=1)
+    payload: Dict[str, Any] = {
+        "provider": provider,
+        "mode": "series",
+        "dates": [day.isoformat() for day in matrix.dates],
+        "models": {
+            model: matrix.costs[:, column].tolist() for column, model in enumerate(matrix.models)
+        },
+        "totalCostUSD": total.tolist(),
+    }
+    for window in ROLLING_WINDOWS:
+        payload[f"rolling{window}dCostUSD"] = rolling_sum(total, window).tolist()
+    return payload
+
+
+def _series_stats(
+    np: Any, daily: Any, idle_days: int, month_to_date: float, days_left: int
+) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {
+        "totalCostUSD": float(daily.sum()),
+        "meanDailyCostUSD": float(daily.mean()),
+        "maxDailyCostUSD": float(daily.max()),
+    }
+    for pct, value in zip(PERCENTILES, np.percentile(daily, PERCENTILES)):
+        stats[f"p{pct}DailyCostUSD"] = float(value)
+    # Trailing windows end at the anchor date: days after the last row spent nothing.
+    recent = np.concatenate([daily, np.zeros(idle_days)])
+    for window in ROLLING_WINDOWS:
+        stats[f"last{window}dCostUSD"] = float(recent[-window:].sum())
+    # Burn rate: mean daily spend over the shortest rolling window, or over the days
+    # actually covered when the history is shorter. Too few days give no projection.
+    observed = min(ROLLING_WINDOWS[0], len(recent))
+    burn = float(recent[-observed:].sum()) / observed if observed >= MIN_BURN_DAYS else None
+    stats["burnRateUSDPerDay"] = burn
+    stats["projected30dCostUSD"] = None if burn is None else burn * 30
+    stats["projectedMonthEndCostUSD"] = None if burn is None else month_to_date + burn * days_left
+    return stats
+
+
+def build_json_stats(
+    provider: str, matrix: CostMatrix, today: Optional[date] = None
+) -> Dict[str, Any]:
+    """Summary statistics; last-N-day windows and projections count back from `today`."""
+    np = _require_numpy()
+    dates = matrix.dates
+    last = dates[-1]
+    anchor = max(today or date.today(), last)
+    idle_days = (anchor - last).days
+    next_month = (anchor.replace(day=28) + timedelta(days=4)).replace(day=1)
+    days_left = (next_month - anchor).days - 1
+    month_start = anchor.replace(day=1)
+    month_rows = matrix.costs[max(0, (month_start - matrix.start).days) :]
+    total = matrix.costs.sum(axis=1)
+    return {
+        "provider": provider,
+        "mode": "stats",
+        "firstDate": dates[0].isoformat(),
+        "lastDate": last.isoformat(),
+        "asOfDate": anchor.isoformat(),
+        "days": len(dates),
+        "total": _series_stats(np, total, idle_days, float(month_rows.sum()), days_left),
+        "models": [
+            {
+                "model": model,
+                **_series_stats(
+                    np,
+                    matrix.costs[:, column],
+                    idle_days,
+                    float(month_rows[:, column].sum()),
+                    days_left,
+                ),
+            }
+            for column, model in enumerate(matrix.models)
+        ],
+    }
+
+
 def render_text_current(
     provider: str,
     model: str,
@@ -243,38 +1041,378 @@ def build_json_all(provider: str, totals: Dict[str, float]) -> Dict[str, Any]:
     }
 
 
-def main() -> int:
-    parser = argparse.ArgumentParser(description="Summarize CodexBar model usage from local cost logs.")
-    parser.add_argument("--provider", choices=["codex", "claude"], default="codex")
-    parser.add_argument("--mode", choices=["current", "all"], default="current")
-    parser.add_argument("--model", help="Explicit model name to report instead of auto-current.")
-    parser.add_argument("--input", help="Path to codexbar cost JSON (or '-' for stdin).")
-    parser.add_argument("--days", type=positive_int, help="Limit to last N days (based on daily rows).")
-    parser.add_argument("--format", choices=["text", "json"], default="text")
-    parser.add_argument("--pretty", action="store_true", help="Pretty-print JSON output.")
+def render_text_series(provider: str, matrix: CostMatrix) -> str:
+    payload = build_json_series(provider, matrix)
+    windows = [f"rolling{window}dCostUSD" for window in ROLLING_WINDOWS]
+    lines = [f"Provider: {provider}", "Daily cost (" + ", ".join(f"{w}d" for w in ROLLING_WINDOWS) + "):"]
+    for idx, day in enumerate(payload["dates"]):
+        rolling = ", ".join(usd(payload[key][idx]) for key in windows)
+        lines.append(f"- {day}: {usd(payload['totalCostUSD'][idx])} ({rolling})")
+    return "\n".join(lines)
+
+
+def render_text_stats(provider: str, matrix: CostMatrix) -> str:
+    payload = build_json_stats(provider, matrix)
+    lines = [
+        f"Provider: {provider}",
+        f"Range: {payload['firstDate']} .. {payload['lastDate']} ({payload['days']} days)",
+        f"As of: {payload['asOfDate']}",
+    ]
+    for label, stats in [("Total", payload["total"])] + [
+        (item["model"], item) for item in payload["models"]
+    ]:
+        percentiles = ", ".join(f"p{pct} {usd(stats[f'p{pct}DailyCostUSD'])}" for pct in PERCENTILES)
+        lines.append(
+            f"- {label}: {usd(stats['totalCostUSD'])} total, {usd(stats['burnRateUSDPerDay'])}/day burn, "
+            f"month-end {usd(stats['projectedMonthEndCostUSD'])}; daily {percentiles}"
+        )
+    return "\n".join(lines)
+
+
+def write_csv_series(provider: str, matrix: CostMatrix, handle: TextIO) -> None:
+    payload = build_json_series(provider, matrix)
+    windows = [f"rolling{window}dCostUSD" for window in ROLLING_WINDOWS]
+    import csv
+
+    writer = csv.writer(handle)
+    writer.writerow(["date", *matrix.models, "total", *(f"rolling_{w}d" for w in ROLLING_WINDOWS)])
+    for idx, day in enumerate(payload["dates"]):
+        writer.writerow(
+            [
+                day,
+                *(payload["models"][model][idx] for model in matrix.models),
+                payload["totalCostUSD"][idx],
+                *(payload[key][idx] for key in windows),
+            ]
+        )
 
-    args = parser.parse_args()
 
+def write_csv_stats(provider: str, matrix: CostMatrix, handle: TextIO) -> None:
+    payload = build_json_stats(provider, matrix)
+    rows = [{"model": "total", **payload["total"]}] + payload["models"]
+    import csv
+
+    writer = csv.DictWriter(handle, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def _sorted_models(totals: Dict[str, float]) -> List[Dict[str, Any]]:
+    return [
+        {"model": model, "totalCostUSD": cost}
+        for model, cost in sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    ]
+
+
+def build_json_sources(provider: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    sources = []
+    for result in results:
+        source = {key: result[key] for key in ("source", "provider", "dailyRowCount")}
+        if "error" in result:
+            source["error"] = result["error"]
+        elif result.get("missing"):
+            source["missing"] = True
+        else:
+            source["totalCostUSD"] = sum(result["totals"].values())
+            source["models"] = _sorted_models(result["totals"])
+        sources.append(source)
+    return {
+        "provider": provider,
+        "mode": "all",
+        "models": _sorted_models(merge_totals(results)),
+        "sources": sources,
+    }
+
+
+def render_text_sources(provider: str, results: List[Dict[str, Any]]) -> str:
+    lines = [render_text_all(provider, merge_totals(results)), "Sources:"]
+    for result in results:
+        label = f"{result['source']} ({result['provider']})"
+        if "error" in result:
+            lines.append(f"- {label}: error: {result['error']}")
+        elif result.get("missing"):
+            lines.append(f"- {label}: no data")
+        else:
+            total = sum(result["totals"].values())
+            lines.append(f"- {label}: {usd(total)} over {result['dailyRowCount']} daily rows")
+    return "\n".join(lines)
+
+
+class BudgetRule(NamedTuple):
+    name: str
+    limit_usd: float
+    window_days: int
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    burn_days: int = 0
+
+    @property
+    def effective_burn_days(self) -> int:
+        return self.burn_days or min(7, self.window_days)
+
+
+def load_budget_rules(path: str) -> List[BudgetRule]:
+    """Read rules from a JSON list (or {"rules": [...]}) of objects like
+    {"name", "limitUSD", "windowDays", "provider"?, "model"?, "burnDays"?}.
+    """
+    with open(path, "r", encoding="utf-8") as handle:
+        data = json.load(handle)
+    if isinstance(data, dict):
+        data = data.get("rules")
+    if not isinstance(data, list) or not data:
+        raise RuntimeError("Budget file must contain a non-empty list of rules.")
+    rules: List[BudgetRule] = []
+    for idx, raw in enumerate(data, start=1):
+        if not isinstance(raw, dict):
+            raise RuntimeError(f"Budget rule #{idx} must be an object.")
+        limit = raw.get("limitUSD")
+        window = raw.get("windowDays")
+        burn = raw.get("burnDays", 0)
+        provider = raw.get("provider")
+        model = raw.get("model")
+        # bool is an int subclass, so JSON true/false would otherwise pass as 1/0.
+        if not isinstance(limit, (int, float)) or isinstance(limit, bool) or limit <= 0:
+            raise RuntimeError(f"Budget rule #{idx}: limitUSD must be a positive number.")
+        if not isinstance(window, int) or isinstance(window, bool) or window < 1:
+            raise RuntimeError(f"Budget rule #{idx}: windowDays must be an integer >= 1.")
+        if not isinstance(burn, int) or isinstance(burn, bool) or burn < 0:
+            raise RuntimeError(f"Budget rule #{idx}: burnDays must be a non-negative integer.")
+        if provider not in (None, "*", *PROVIDERS):
+            raise RuntimeError(f"Budget rule #{idx}: unknown provider {provider!r}.")
+        if model is not None and not isinstance(model, str):
+            raise RuntimeError(f"Budget rule #{idx}: model must be a string.")
+        rules.append(
+            BudgetRule(
+                name=str(raw.get("name") or f"rule-{idx}"),
+                limit_usd=float(limit),
+                window_days=window,
+                provider=None if provider == "*" else provider,
+                model=model,
+                burn_days=burn,
+            )
+        )
+    return rules
+
+
+class BudgetEngine:
+    """Incrementally evaluates budget rules over rolling windows ending `today`.
+
+    Rows are bucketed per (provider, model) and the provider/model/overall rollups,
+    keeping only days inside the longest window, so evaluation cost depends on the
+    rules and that horizon rather than on history length. Re-adding a source's
+    provider day (e.g. today's row as it grows) replaces the earlier contribution;
+    rows for the same day from different sources (hosts) add up.
+    """
+
+    def __init__(self, rules: List[BudgetRule], today: Optional[date] = None) -> None:
+        self.rules = rules
+        self.today = today or date.today()
+        horizon = max(max(rule.window_days, rule.effective_burn_days) for rule in rules)
+        self._last = self.today.toordinal()
+        self._first = self._last - horizon + 1
+        self._daily: Dict[Tuple[Optional[str], Optional[str]], Dict[int, float]] = {}
+        self._rows: Dict[Tuple[Optional[str], str, int], Dict[str, float]] = {}
+
+    def add_entry(
+        self, provider: str, entry: Dict[str, Any], source: Optional[str] = None
+    ) -> None:
+        day = entry.get("date")
+        parsed = parse_date(day) if isinstance(day, str) else None
+        if parsed is None:
+            return
+        ordinal = parsed.toordinal()
+        if ordinal < self._first or ordinal > self._last:
+            return
+        costs = aggregate_costs([entry])
+        previous = self._rows.get((source, provider, ordinal))
+        if previous:
+            self._apply(provider, ordinal, previous, -1.0)
+        self._rows[(source, provider, ordinal)] = costs
+        self._apply(provider, ordinal, costs, 1.0)
+
+    def _apply(self, provider: str, ordinal: int, costs: Dict[str, float], sign: float) -> None:
+        for model, cost in costs.items():
+            for key in ((provider, model), (provider, None), (None, model), (None, None)):
+                bucket = self._daily.setdefault(key, {})
+                bucket[ordinal] = bucket.get(ordinal, 0.0) + sign * cost
+
+    def _spend(self, key: Tuple[Optional[str], Optional[str]], days: int) -> float:
+        bucket = self._daily.get(key)
+        if not bucket:
+            return 0.0
+        start = self._last - days + 1
+        return sum(cost for ordinal, cost in bucket.items() if ordinal >= start)
+
+    def evaluate(self) -> List[Dict[str, Any]]:
+        results = []
+        for rule in self.rules:
+            key = (rule.provider, rule.model)
+            spent = self._spend(key, rule.window_days)
+            burn_days = rule.effective_burn_days
+            burn = self._spend(key, burn_days) / burn_days
+            projected = burn * rule.window_days
+            if spent >= rule.limit_usd:
+                status = "exceeded"
+            elif projected >= rule.limit_usd:
+                status = "projected"
+            else:
+                status = "ok"
+            results.append(
+                {
+                    "name": rule.name,
+                    "provider": rule.provider,
+                    "model": rule.model,
+                    "windowDays": rule.window_days,
+                    "limitUSD": rule.limit_usd,
+                    "spentUSD": spent,
+                    "burnRateUSDPerDay": burn,
+                    "projectedUSD": projected,
+                    "status": status,
+                }
+            )
+        return results
+
+
+def render_text_budgets(results: List[Dict[str, Any]]) -> str:
+    lines = ["Budgets:"]
+    for result in results:
+        scope = "/".join(filter(None, [result["provider"], result["model"]])) or "all"
+        lines.append(
+            f"- [{result['status']}] {result['name']} ({scope}, {result['windowDays']}d): "
+            f"{usd(result['spentUSD'])} spent, {usd(result['projectedUSD'])} projected "
+            f"of {usd(result['limitUSD'])}"
+        )
+    return "\n".join(lines)
+
+
+def _input_stamp(path: Optional[str]) -> Optional[Tuple[int, int]]:
+    if path is None:
+        return None
     try:
-        payload = load_payload(args.input, args.provider)
-    except Exception as exc:
-        eprint(str(exc))
-        return 1
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def remove_stale_socket(socket_path: str) -> None:
+    """Unlink a socket left behind by a dead server; refuse to touch anything else."""
+    import socket
+    import stat
+
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise RuntimeError(f"{socket_path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except ConnectionRefusedError:
+        os.unlink(socket_path)
+    else:
+        raise RuntimeError(f"Another server is already listening on {socket_path}")
+    finally:
+        probe.close()
+
+
+def serve_latest(socket_path: str) -> socketserver.BaseServer:
+    """Answer every connection on a Unix socket with the latest NDJSON summary line."""
+    import socketserver
+    import threading
+
+    class _LatestHandler(socketserver.BaseRequestHandler):
+        def handle(self) -> None:
+            self.request.sendall(self.server.latest)  # type: ignore[attr-defined]
+
+    remove_stale_socket(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, _LatestHandler)
+    server.latest = b"{}\n"  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def watch_sources(
+    input_args: List[Optional[str]],
+    providers: List[str],
+    days: Optional[int],
+    emit: Any,
+    interval: float = DEFAULT_WATCH_INTERVAL,
+    jobs: Optional[int] = None,
+    max_polls: Optional[int] = None,
+) -> None:
+    """Poll inputs and emit a fresh --mode all report whenever it changes.
+
+    Files are re-parsed only when their mtime or size changes (directories are
+    re-expanded each poll, so new files are picked up). codexbar sources have
+    nothing to stat and are re-collected every poll. Everything is re-collected
+    when the date rolls over, since --days windows move with it.
+    """
+    provider_label = providers[0] if len(providers) == 1 else "all"
+    stamps: Dict[Optional[str], Optional[Tuple[int, int]]] = {}
+    results: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    last_report: Optional[Dict[str, Any]] = None
+    today = date.today()
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        if polls:
+            time.sleep(interval)
+        polls += 1
+        if date.today() != today:
+            today = date.today()
+            stamps.clear()
+        inputs: List[Optional[str]] = (
+            expand_inputs([path for path in input_args if path]) if any(input_args) else [None]
+        )
+        current = {path: _input_stamp(path) for path in inputs}
+        changed = [
+            path
+            for path in inputs
+            if path is None or path not in stamps or current[path] != stamps[path]
+        ]
+        stamps = current
+        if changed:
+            for result in collect_sources(changed, providers, days, jobs=jobs):
+                results[(result["source"], result["provider"])] = result
+        ordered = [
+            results[(path or "codexbar", provider)] for path in inputs for provider in providers
+        ]
+        report = build_json_sources(provider_label, ordered)
+        if report != last_report:
+            last_report = report
+            emit({"updatedAt": time.strftime("%Y-%m-%dT%H:%M:%S%z"), **report})
+
 
-    entries = parse_daily_entries(payload)
-    entries = filter_by_days(entries, args.days)
+def timed_entries(
+    entries: Iterable[Dict[str, Any]], timings: Dict[str, float]
+) -> Iterator[Dict[str, Any]]:
+    """Yield from entries, adding the time spent producing each one to timings["parse"]."""
+    iterator = iter(entries)
+    clock = time.perf_counter
+    while True:
+        started = clock()
+        try:
+            entry = next(iterator)
+        except StopIteration:
+            timings["parse"] += clock() - started
+            return
+        timings["parse"] += clock() - started
+        yield entry
 
+
+def print_report(args: argparse.Namespace, result: Any) -> int:
+    """Print a single-source report; result comes from the aggregator for args.mode."""
     if args.mode == "current":
         model = args.model
         latest_date = None
         if not model:
-            model, latest_date = pick_current_model(entries)
+            model, latest_date = result.current_model, result.current_model_date
         if not model:
             eprint("No model data found in codexbar cost payload.")
             return 2
-        totals = aggregate_costs(entries)
-        total_cost = totals.get(model)
-        latest_cost_date, latest_cost = latest_day_cost(entries, model)
+        total_cost = result.totals.get(model)
+        latest_cost_date, latest_cost = result.latest_day_cost(model)
 
         if args.format == "json":
             payload_out = build_json_current(
@@ -284,7 +1422,7 @@ def main() -> int:
                 total_cost=total_cost,
                 latest_cost=latest_cost,
                 latest_cost_date=latest_cost_date,
-                entry_count=len(entries),
+                entry_count=result.row_count,
             )
             indent = 2 if args.pretty else None
             print(json.dumps(payload_out, indent=indent, sort_keys=args.pretty))
@@ -297,24 +1435,279 @@ def main() -> int:
                     total_cost=total_cost,
                     latest_cost=latest_cost,
                     latest_cost_date=latest_cost_date,
-                    entry_count=len(entries),
+                    entry_count=result.row_count,
                 )
             )
         return 0
 
-    totals = aggregate_costs(entries)
-    if not totals:
+    if args.mode in ("series", "stats"):
+        if not result.models:
+            eprint("No model breakdowns found in codexbar cost payload.")
+            return 2
+        if args.format == "csv":
+            writer = write_csv_series if args.mode == "series" else write_csv_stats
+            writer(args.provider, result, sys.stdout)
+        elif args.format == "json":
+            builder = build_json_series if args.mode == "series" else build_json_stats
+            indent = 2 if args.pretty else None
+            print(json.dumps(builder(args.provider, result), indent=indent, sort_keys=args.pretty))
+        else:
+            renderer = render_text_series if args.mode == "series" else render_text_stats
+            print(renderer(args.provider, result))
+        return 0
+
+    if not result:
         eprint("No model breakdowns found in codexbar cost payload.")
         return 2
 
     if args.format == "json":
-        payload_out = build_json_all(provider=args.provider, totals=totals)
+        payload_out = build_json_all(provider=args.provider, totals=result)
         indent = 2 if args.pretty else None
         print(json.dumps(payload_out, indent=indent, sort_keys=args.pretty))
     else:
-        print(render_text_all(provider=args.provider, totals=totals))
+        print(render_text_all(provider=args.provider, totals=result))
     return 0
 
 
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Summarize CodexBar model usage from local cost logs.")
+    parser.add_argument(
+        "--provider",
+        choices=[*PROVIDERS, "all"],
+        default="codex",
+        help="'all' reports every provider combined (implies --mode all).",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["current", "all", "series", "stats"],
+        help="Default: current. series/stats need numpy: daily series with rolling sums, "
+        "or percentiles and burn rate.",
+    )
+    parser.add_argument("--model", help="Explicit model name to report instead of auto-current.")
+    parser.add_argument(
+        "--input",
+        action="append",
+        help="Path to codexbar cost JSON, a directory of *.json files, or '-' for stdin. "
+        "Repeat to combine several hosts into one report.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print time spent in startup, parse, aggregate and render to stderr.",
+    )
+    parser.add_argument(
+        "--budgets",
+        metavar="RULES",
+        help=f"Evaluate budget rules from a JSON file; exits {BUDGET_ALERT_EXIT_CODE} if any "
+        "rule is exceeded or projected to be.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running: re-read inputs when they change and print an NDJSON "
+        "--mode all report on every change.",
+    )
+    parser.add_argument(
+        "--interval",
+        type=positive_float,
+        help=f"Seconds between --watch polls (default: {DEFAULT_WATCH_INTERVAL:g} for --input, "
+        f"{DEFAULT_CODEXBAR_WATCH_INTERVAL:g} for codexbar).",
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        help="With --watch, also answer each connection on this Unix socket with the latest report.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=positive_int,
+        help="Worker processes when collecting several sources (default: CPU count).",
+    )
+    parser.add_argument("--days", type=positive_int, help="Limit to last N days (based on daily rows).")
+    parser.add_argument(
+        "--format",
+        choices=["text", "json", "csv"],
+        default="text",
+        help="csv is only supported for --mode series/stats.",
+    )
+    parser.add_argument("--pretty", action="store_true", help="Pretty-print JSON output.")
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Answer from a local SQLite cache of daily costs, only ingesting new days when stale.",
+    )
+    parser.add_argument(
+        "--cache-path",
+        help=f"Cache file (implies --cache; default: {default_cache_path()}).",
+    )
+    parser.add_argument(
+        "--cache-max-age",
+        type=positive_int,
+        default=DEFAULT_CACHE_MAX_AGE,
+        help=f"Seconds before the cache re-reads the source (default: {DEFAULT_CACHE_MAX_AGE}).",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Rebuild the cache from the full history (implies --cache).",
+    )
+
+    args = parser.parse_args()
+    inputs: List[Optional[str]] = expand_inputs(args.input) if args.input else [None]
+    providers = list(PROVIDERS) if args.provider == "all" else [args.provider]
+    if args.serve and not args.watch:
+        parser.error("--serve requires --watch")
+    if args.profile and (args.watch or args.budgets or len(inputs) * len(providers) > 1):
+        parser.error("--profile does not support --watch, --budgets or multiple sources")
+    if args.watch:
+        if args.mode not in (None, "all"):
+            parser.error("--watch only supports --mode all")
+        if "-" in inputs:
+            parser.error("--watch cannot read from stdin")
+        if args.format == "csv" or args.cache or args.cache_path or args.refresh:
+            parser.error("--watch does not support --format csv or --cache")
+        try:
+            server = serve_latest(args.serve) if args.serve else None
+        except (OSError, RuntimeError) as exc:
+            eprint(str(exc))
+            return 1
+
+        def emit(report: Dict[str, Any]) -> None:
+            line = json.dumps(report)
+            if server is not None:
+                server.latest = (line + "\n").encode("utf-8")  # type: ignore[attr-defined]
+            print(line, flush=True)
+
+        import signal
+
+        # Let SIGTERM (service managers, timeout) run the socket cleanup below.
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            watch_sources(
+                args.input or [None],
+                providers,
+                args.days,
+                emit,
+                interval=args.interval
+                or (DEFAULT_WATCH_INTERVAL if args.input else DEFAULT_CODEXBAR_WATCH_INTERVAL),
+                jobs=args.jobs,
+            )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+                os.unlink(args.serve)
+        return 0
+
+    if args.budgets:
+        if args.mode is not None or args.format == "csv" or args.days:
+            parser.error("--budgets cannot be combined with --mode, --days or --format csv")
+        if "-" in inputs and len(inputs) > 1:
+            parser.error("--input - cannot be combined with other sources")
+        try:
+            engine = BudgetEngine(load_budget_rules(args.budgets))
+            match_provider = len(providers) > 1
+            for path in inputs:
+                for provider in providers:
+                    try:
+                        for entry in iter_daily_entries(path, provider, match_provider):
+                            engine.add_entry(provider, entry, path)
+                    except RuntimeError as exc:
+                        if not (match_provider and is_missing_provider(exc, provider)):
+                            raise
+        except Exception as exc:
+            eprint(str(exc))
+            return 1
+        results = engine.evaluate()
+        alerts = [result for result in results if result["status"] != "ok"]
+        if args.format == "json":
+            indent = 2 if args.pretty else None
+            payload_out = {
+                "mode": "budgets",
+                "date": engine.today.isoformat(),
+                "alerts": alerts,
+                "rules": results,
+            }
+            print(json.dumps(payload_out, indent=indent, sort_keys=args.pretty))
+        else:
+            print(render_text_budgets(results))
+        return BUDGET_ALERT_EXIT_CODE if alerts else 0
+
+    if len(inputs) * len(providers) > 1:
+        if args.mode not in (None, "all"):
+            parser.error("multiple providers or inputs only support --mode all")
+        if "-" in inputs:
+            parser.error("--input - cannot be combined with other sources")
+        if args.format == "csv":
+            parser.error("--format csv requires --mode series or stats")
+        if args.cache or args.cache_path or args.refresh:
+            parser.error("--cache only supports a single provider and input")
+        results = collect_sources(inputs, providers, args.days, jobs=args.jobs)
+        if not merge_totals(results):
+            failed = [result for result in results if "error" in result]
+            for result in failed:
+                eprint(f"{result['source']} ({result['provider']}): {result['error']}")
+            if len(failed) == len(results):
+                return 1
+            eprint("No model breakdowns found in codexbar cost payload.")
+            return 2
+        if args.format == "json":
+            indent = 2 if args.pretty else None
+            payload_out = build_json_sources(args.provider, results)
+            print(json.dumps(payload_out, indent=indent, sort_keys=args.pretty))
+        else:
+            print(render_text_sources(args.provider, results))
+        return 0
+
+    args.mode = args.mode or "current"
+    args.input = inputs[0]
+    if args.format == "csv" and args.mode not in ("series", "stats"):
+        parser.error("--format csv requires --mode series or stats")
+
+    if args.cache or args.cache_path or args.refresh:
+        source = cached_daily_entries(
+            args.cache_path or default_cache_path(),
+            args.input,
+            args.provider,
+            args.days,
+            max_age=args.cache_max_age,
+            refresh=args.refresh,
+        )
+    else:
+        source = iter_daily_entries(args.input, args.provider)
+    stream = iter_filter_by_days(source, args.days)
+    timings: Optional[Dict[str, float]] = None
+    if args.profile:
+        startup = time.perf_counter() - LOADED_AT
+        timings = {"startup": startup, "parse": 0.0, "aggregate": 0.0, "render": 0.0}
+        stream = iter_filter_by_days(timed_entries(source, timings), args.days)
+    consume_started = time.perf_counter()
+    try:
+        if args.mode == "current":
+            result: Any = summarize_entries(stream)
+        elif args.mode in ("series", "stats"):
+            result = build_cost_matrix(stream, model=args.model)
+        else:
+            result = aggregate_costs(stream)
+    except Exception as exc:
+        eprint(str(exc))
+        return 1
+    if timings is None:
+        return print_report(args, result)
+
+    render_started = time.perf_counter()
+    timings["aggregate"] = render_started - consume_started - timings["parse"]
+    try:
+        return print_report(args, result)
+    finally:
+        timings["render"] = time.perf_counter() - render_started
+        eprint(
+            "profile: "
+            + ", ".join(f"{phase} {seconds * 1000:.1f} ms" for phase, seconds in timings.items())
+        )
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
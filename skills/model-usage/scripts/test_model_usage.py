@@ -4,10 +4,67 @@ Tests for model_usage helpers.
 """
 
 import argparse
+import io
+import json
+import os
+import random
+import socket
+import tempfile
 from datetime import date, timedelta
-from unittest import TestCase, main
+from unittest import TestCase, main, skipUnless
+from unittest.mock import patch
 
-from model_usage import filter_by_days, positive_int
+import model_usage
+from model_usage import (
+    BudgetEngine,
+    BudgetRule,
+    aggregate_costs,
+    build_cost_matrix,
+    build_json_series,
+    build_json_stats,
+    cache_refreshed_at,
+    collect_sources,
+    expand_inputs,
+    filter_by_days,
+    ingest_entries,
+    iter_cached_entries,
+    latest_day_cost,
+    load_budget_rules,
+    load_payload,
+    merge_totals,
+    open_cache,
+    parse_daily_entries,
+    parse_date,
+    pick_current_model,
+    positive_float,
+    positive_int,
+    serve_latest,
+    stream_daily_entries,
+    summarize_entries,
+    watch_sources,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SAMPLE_PAYLOAD = [
+    {
+        "provider": "claude",
+        "daily": [{"date": "2025-01-01", "modelBreakdowns": [{"modelName": "a", "cost": 1}]}],
+    },
+    {
+        "provider": "codex",
+        "updatedAt": "2025-01-03T00:00:00Z",
+        "daily": [
+            {"date": "2025-01-02", "modelBreakdowns": [{"modelName": "gpt-5", "cost": 12.5}]},
+            "not-a-row",
+            {"date": "2025-01-03", "modelBreakdowns": [{"modelName": "gpt-5", "cost": 1234.5678}]},
+        ],
+        "totals": {"totalCost": 1247.0678},
+    },
+]
 
 
 class TestModelUsage(TestCase):
@@ -21,6 +78,12 @@ class TestModelUsage(TestCase):
         with self.assertRaises(argparse.ArgumentTypeError):
             positive_int("-3")
 
+    def test_positive_float_rejects_zero_negative_and_nan(self):
+        self.assertEqual(positive_float("0.5"), 0.5)
+        for value in ("0", "-2", "nan", "soon"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                positive_float(value)
+
     def test_filter_by_days_keeps_recent_entries(self):
         today = date.today()
         entries = [
@@ -35,6 +98,419 @@ class TestModelUsage(TestCase):
         self.assertEqual(filtered[0]["date"], (today - timedelta(days=1)).strftime("%Y-%m-%d"))
         self.assertEqual(filtered[1]["date"], today.strftime("%Y-%m-%d"))
 
+    def test_parse_date_accepts_only_year_month_day(self):
+        self.assertEqual(parse_date("2025-03-09"), date(2025, 3, 9))
+        self.assertEqual(parse_date("2025-3-9"), date(2025, 3, 9))
+        self.assertIsNone(parse_date("20250309"))
+        self.assertIsNone(parse_date("2025-02-30"))
+        self.assertIsNone(parse_date("2025-03-09T10:00:00"))
+        self.assertIsNone(parse_date(None))
+        self.assertIsNone(parse_date(["2025-03-09"]))
+
+    def stream(self, payload, provider="codex", chunk_size=7):
+        handle = io.StringIO(json.dumps(payload, indent=1))
+        return list(stream_daily_entries(handle, provider, chunk_size=chunk_size))
+
+    def test_stream_daily_entries_matches_load_payload(self):
+        for provider in ("codex", "claude"):
+            with self.subTest(provider=provider):
+                expected = parse_daily_entries(
+                    load_payload_from(SAMPLE_PAYLOAD, provider)
+                )
+                self.assertEqual(self.stream(SAMPLE_PAYLOAD, provider), expected)
+
+    def test_stream_daily_entries_handles_values_split_across_chunks(self):
+        for chunk_size in (1, 2, 3, 64):
+            with self.subTest(chunk_size=chunk_size):
+                rows = self.stream(SAMPLE_PAYLOAD, chunk_size=chunk_size)
+                self.assertEqual(rows[-1]["modelBreakdowns"][0]["cost"], 1234.5678)
+
+    def test_stream_daily_entries_handles_floats_split_at_every_offset(self):
+        row = '{"date": "2025-01-02", "modelBreakdowns": [{"modelName": "gpt-5", "cost": 1.25E-1}]}'
+        doc = '{"provider": "codex", "sessionCostUSD":12.5e3, "daily": [' + row + "]}"
+
+        class SplitReader:
+            def __init__(self, first):
+                self.parts = [doc[:first], doc[first:]]
+
+            def read(self, _size):
+                return self.parts.pop(0) if self.parts else ""
+
+        for offset in range(1, len(doc)):
+            with self.subTest(offset=offset):
+                rows = list(stream_daily_entries(SplitReader(offset), "codex", chunk_size=1))
+                self.assertEqual(rows[0]["modelBreakdowns"][0]["cost"], 0.125)
+        for chunk_size in range(1, 12):
+            with self.subTest(chunk_size=chunk_size):
+                handle = io.StringIO(doc)
+                rows = list(stream_daily_entries(handle, "codex", chunk_size=chunk_size))
+                self.assertEqual(rows[0]["modelBreakdowns"][0]["cost"], 0.125)
+
+    def test_stream_daily_entries_accepts_single_provider_object(self):
+        self.assertEqual(self.stream(SAMPLE_PAYLOAD[1]), parse_daily_entries(SAMPLE_PAYLOAD[1]))
+
+    def test_stream_daily_entries_handles_provider_key_after_daily(self):
+        payload = [
+            {"daily": SAMPLE_PAYLOAD[0]["daily"], "provider": "claude"},
+            {"daily": SAMPLE_PAYLOAD[1]["daily"], "provider": "codex"},
+        ]
+        self.assertEqual(self.stream(payload), parse_daily_entries(SAMPLE_PAYLOAD[1]))
+
+    def test_stream_daily_entries_reports_missing_provider(self):
+        with self.assertRaisesRegex(RuntimeError, "Provider 'codex' not found"):
+            self.stream(SAMPLE_PAYLOAD[:1])
+
+    def test_stream_daily_entries_rejects_malformed_json(self):
+        with self.assertRaises(ValueError):
+            list(stream_daily_entries(io.StringIO('[{"provider": "codex", "daily": [{'), "codex"))
+
+    def test_summarize_entries_matches_multi_pass_helpers(self):
+        rng = random.Random(28)
+        models = ["gpt-5", "gpt-5-codex", "o3", "claude"]
+        dates = ["2025-01-01", "2025-01-02", "2025-01-03", None, ""]
+        junk = [None, "x", 3, {"modelName": 1, "cost": 2}, {"modelName": "o3", "cost": "9"}]
+        for _ in range(200):
+            entries = []
+            for _ in range(rng.randint(0, 8)):
+                breakdowns = [
+                    {"modelName": rng.choice(models), "cost": rng.choice([0, 1, 2.5, 2.5])}
+                    for _ in range(rng.randint(0, 3))
+                ]
+                if rng.random() < 0.3:
+                    breakdowns.insert(rng.randint(0, len(breakdowns)), rng.choice(junk))
+                entry = {"date": rng.choice(dates)}
+                if rng.random() < 0.8:
+                    entry["modelBreakdowns"] = rng.choice([breakdowns, breakdowns, None, "bad"])
+                if rng.random() < 0.5:
+                    entry["modelsUsed"] = rng.sample(models, k=rng.randint(0, 2))
+                entries.append(entry)
+
+            summary = summarize_entries(iter(entries))
+
+            self.assertEqual(summary.totals, aggregate_costs(entries))
+            self.assertEqual(
+                (summary.current_model, summary.current_model_date), pick_current_model(entries)
+            )
+            self.assertEqual(summary.row_count, len(entries))
+            for model in models:
+                self.assertEqual(summary.latest_day_cost(model), latest_day_cost(entries, model))
+
+    def test_cache_round_trips_daily_rows(self):
+        conn = open_cache(":memory:")
+        rows = parse_daily_entries(SAMPLE_PAYLOAD[1])
+
+        self.assertEqual(ingest_entries(conn, "codex", rows), 2)
+        cached = list(iter_cached_entries(conn, "codex"))
+
+        self.assertEqual(cached, rows)
+        self.assertEqual(summarize_entries(cached), summarize_entries(rows))
+
+    def test_cache_only_reingests_from_last_cached_day(self):
+        conn = open_cache(":memory:")
+        today = date.today()
+        days = [(today - timedelta(days=offset)).isoformat() for offset in (2, 1, 0)]
+
+        def row(day, cost):
+            return {"date": day, "modelBreakdowns": [{"modelName": "gpt-5", "cost": cost}]}
+
+        ingest_entries(conn, "codex", [row(days[0], 1), row(days[1], 2)])
+        written = ingest_entries(
+            conn, "codex", [row(days[0], 100), row(days[1], 3), row(days[2], 4)]
+        )
+
+        self.assertEqual(written, 2)
+        self.assertEqual(aggregate_costs(iter_cached_entries(conn, "codex")), {"gpt-5": 8.0})
+        self.assertEqual(aggregate_costs(iter_cached_entries(conn, "codex", days=2)), {"gpt-5": 7.0})
+        self.assertEqual(list(iter_cached_entries(conn, "claude")), [])
+
+        ingest_entries(conn, "codex", [row(days[0], 100)], full=True)
+        self.assertEqual(aggregate_costs(iter_cached_entries(conn, "codex")), {"gpt-5": 100.0})
+
+    def test_cache_keeps_sources_and_undated_rows_apart(self):
+        conn = open_cache(":memory:")
+        today = date.today().isoformat()
+        undated = {"date": "today", "modelBreakdowns": [{"modelName": "gpt-5", "cost": 5.0}]}
+        dated = {"date": today, "modelBreakdowns": [{"modelName": "gpt-5", "cost": 1.0}]}
+
+        ingest_entries(conn, "codex", [undated, dated], source="/srv/a.json")
+        ingest_entries(conn, "codex", [dated], source="/srv/b.json")
+
+        def cached(source, days=None):
+            return list(iter_cached_entries(conn, "codex", days, source))
+
+        self.assertEqual(cached("/srv/a.json"), [undated, dated])
+        self.assertEqual(cached("/srv/a.json", days=1), [dated])
+        self.assertEqual(cached("/srv/b.json"), [dated])
+        self.assertEqual(list(iter_cached_entries(conn, "codex")), [])
+        self.assertIsNone(cache_refreshed_at(conn, "codex"))
+        self.assertIsNotNone(cache_refreshed_at(conn, "codex", "/srv/b.json"))
+
+    def test_profile_reports_every_phase_on_stderr(self):
+        argv = ["model_usage.py", "--input", "-", "--mode", "all", "--format", "json", "--profile"]
+        stdin = io.StringIO(json.dumps(SAMPLE_PAYLOAD))
+        with patch("sys.argv", argv), patch("sys.stdin", stdin), patch(
+            "sys.stdout", new_callable=io.StringIO
+        ) as out, patch("sys.stderr", new_callable=io.StringIO) as err:
+            self.assertEqual(model_usage.main(), 0)
+
+        self.assertEqual(json.loads(out.getvalue())["mode"], "all")
+        line = err.getvalue().strip()
+        self.assertTrue(line.startswith("profile: "), line)
+        phases = [item.split()[0] for item in line[len("profile: ") :].split(", ")]
+        self.assertEqual(phases, ["startup", "parse", "aggregate", "render"])
+        self.assertTrue(all(item.endswith(" ms") for item in line.split(", ")))
+
+    def test_cache_never_reuses_rows_from_an_earlier_stdin_payload(self):
+        day = date.today().isoformat()
+        reports = []
+        with tempfile.TemporaryDirectory() as tmpdir:
+            argv = ["model_usage.py", "--input", "-", "--mode", "all", "--format", "json"]
+            argv += ["--cache-path", os.path.join(tmpdir, "usage.sqlite3")]
+            for model, cost in (("gpt-5", 10), ("o3", 99)):
+                breakdowns = [{"modelName": model, "cost": cost}]
+                daily = [{"date": day, "modelBreakdowns": breakdowns}]
+                payload = {"provider": "codex", "daily": daily}
+                stdin = io.StringIO(json.dumps(payload))
+                with patch("sys.argv", argv), patch("sys.stdin", stdin), patch(
+                    "sys.stdout", new_callable=io.StringIO
+                ) as out:
+                    self.assertEqual(model_usage.main(), 0)
+                reports.append(json.loads(out.getvalue())["models"])
+
+        self.assertEqual(reports[0], [{"model": "gpt-5", "totalCostUSD": 10.0}])
+        self.assertEqual(reports[1], [{"model": "o3", "totalCostUSD": 99.0}])
+
+    @skipUnless(numpy, "numpy not installed")
+    def test_cost_matrix_fills_gaps_and_matches_totals(self):
+        entries = [
+            {"date": "2025-01-01", "modelBreakdowns": [{"modelName": "a", "cost": 1}]},
+            {"date": "2025-01-04", "modelBreakdowns": [{"modelName": "b", "cost": 5}, "bad"]},
+            {"date": "2025-01-04", "modelBreakdowns": [{"modelName": "a", "cost": 2.5}]},
+            {"date": "nope", "modelBreakdowns": [{"modelName": "a", "cost": 100}]},
+        ]
+
+        matrix = build_cost_matrix(entries)
+        series = build_json_series("codex", matrix)
+
+        self.assertEqual(matrix.models, ["b", "a"])
+        self.assertEqual(series["dates"], ["2025-01-01", "2025-01-02", "2025-01-03", "2025-01-04"])
+        self.assertEqual(series["models"]["a"], [1.0, 0.0, 0.0, 2.5])
+        self.assertEqual(series["rolling7dCostUSD"], [1.0, 1.0, 1.0, 8.5])
+        self.assertEqual(
+            dict(zip(matrix.models, matrix.costs.sum(axis=0).tolist())),
+            aggregate_costs(entries[:3]),
+        )
+
+    @skipUnless(numpy, "numpy not installed")
+    def test_stats_projects_burn_rate_to_month_end(self):
+        entries = [
+            {"date": f"2025-04-{day:02d}", "modelBreakdowns": [{"modelName": "a", "cost": day}]}
+            for day in range(1, 11)
+        ]
+
+        matrix = build_cost_matrix(entries)
+        stats = build_json_stats("codex", matrix, today=date(2025, 4, 10))["total"]
+
+        self.assertEqual(stats["totalCostUSD"], 55.0)
+        self.assertEqual(stats["last7dCostUSD"], 49.0)
+        self.assertEqual(stats["burnRateUSDPerDay"], 7.0)
+        self.assertEqual(stats["projectedMonthEndCostUSD"], 55.0 + 7.0 * 20)
+        self.assertEqual(stats["p50DailyCostUSD"], 5.5)
+
+        # Five quiet days later the windows have moved on; the data has not.
+        later = build_json_stats("codex", matrix, today=date(2025, 4, 15))
+        self.assertEqual((later["lastDate"], later["asOfDate"]), ("2025-04-10", "2025-04-15"))
+        self.assertEqual(later["total"]["last7dCostUSD"], 9.0 + 10.0)
+        self.assertEqual(later["total"]["projectedMonthEndCostUSD"], 55.0 + 19.0 / 7 * 15)
+        self.assertEqual(later["total"]["p50DailyCostUSD"], 5.5)
+
+        # From May on, April spend no longer counts towards the month-end projection.
+        may = build_json_stats("codex", matrix, today=date(2025, 5, 2))["total"]
+        self.assertEqual(may["last30dCostUSD"], 55.0 - 1 - 2)
+        self.assertEqual(may["projectedMonthEndCostUSD"], 0.0)
+
+    @skipUnless(numpy, "numpy not installed")
+    def test_stats_burn_rate_uses_only_the_days_observed(self):
+        def row(day, cost):
+            breakdowns = [{"modelName": "a", "cost": cost}]
+            return {"date": f"2025-04-{day:02d}", "modelBreakdowns": breakdowns}
+
+        today = date(2025, 4, 10)
+        matrix = build_cost_matrix([row(8, 4), row(9, 6), row(10, 8)])
+        stats = build_json_stats("codex", matrix, today=today)["total"]
+        self.assertEqual(stats["burnRateUSDPerDay"], 6.0)
+        self.assertEqual(stats["projected30dCostUSD"], 180.0)
+
+        # Two days of history are too few to project from.
+        short = build_json_stats("codex", build_cost_matrix([row(9, 6), row(10, 8)]), today=today)
+        self.assertIsNone(short["total"]["burnRateUSDPerDay"])
+        self.assertIsNone(short["total"]["projectedMonthEndCostUSD"])
+        self.assertEqual(short["total"]["last7dCostUSD"], 14.0)
+
+    def test_collect_sources_merges_hosts_and_providers(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            host_dir = os.path.join(tmpdir, "hosts")
+            os.mkdir(host_dir)
+            with open(os.path.join(host_dir, "a.json"), "w", encoding="utf-8") as handle:
+                json.dump(SAMPLE_PAYLOAD, handle)
+            with open(os.path.join(host_dir, "b.json"), "w", encoding="utf-8") as handle:
+                json.dump(SAMPLE_PAYLOAD[1], handle)
+            broken = os.path.join(tmpdir, "broken.json")
+            with open(broken, "w", encoding="utf-8") as handle:
+                handle.write("[{")
+
+            inputs = expand_inputs([host_dir, broken])
+            results = collect_sources(inputs, ["codex", "claude"], None, jobs=2)
+
+        names = [os.path.basename(path) for path in inputs]
+        self.assertEqual(names, ["a.json", "b.json", "broken.json"])
+        by_source = {(os.path.basename(r["source"]), r["provider"]): r for r in results}
+        self.assertEqual(by_source[("a.json", "claude")]["totals"], {"a": 1.0})
+        self.assertTrue(by_source[("b.json", "claude")]["missing"])
+        self.assertIn("error", by_source[("broken.json", "codex")])
+        self.assertEqual(by_source[("b.json", "codex")]["dailyRowCount"], 2)
+        self.assertEqual(merge_totals(results), {"a": 1.0, "gpt-5": 2 * (12.5 + 1234.5678)})
+
+    def test_sources_report_errors_when_the_rest_have_no_totals(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            empty = os.path.join(tmpdir, "empty.json")
+            with open(empty, "w", encoding="utf-8") as handle:
+                json.dump({"provider": "codex", "daily": []}, handle)
+            broken = os.path.join(tmpdir, "broken.json")
+            with open(broken, "w", encoding="utf-8") as handle:
+                handle.write("[{")
+            argv = ["model_usage.py", "--input", empty, "--input", broken, "--jobs", "1"]
+            with patch("sys.argv", argv), patch("sys.stdout", new_callable=io.StringIO), patch(
+                "sys.stderr", new_callable=io.StringIO
+            ) as err:
+                code = model_usage.main()
+
+        self.assertEqual(code, 2)
+        self.assertIn(f"{broken} (codex): ", err.getvalue())
+        self.assertIn("No model breakdowns found", err.getvalue())
+
+    def test_watch_sources_reparses_only_changed_inputs(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            first = os.path.join(tmpdir, "a.json")
+            second = os.path.join(tmpdir, "b.json")
+            for path in (first, second):
+                with open(path, "w", encoding="utf-8") as handle:
+                    json.dump(SAMPLE_PAYLOAD, handle)
+            reports = []
+            parsed = []
+
+            def emit(report):
+                reports.append(report)
+                if len(reports) == 1:
+                    with open(second, "w", encoding="utf-8") as handle:
+                        json.dump(SAMPLE_PAYLOAD[:1], handle)
+
+            def fake_collect(paths, providers, days, jobs=None):
+                parsed.append([os.path.basename(path) for path in paths])
+                return collect_sources(paths, providers, days, jobs=1)
+
+            with patch("model_usage.collect_sources", fake_collect):
+                watch_sources([tmpdir], ["codex"], None, emit, interval=0, max_polls=3)
+
+        self.assertEqual(parsed, [["a.json", "b.json"], ["b.json"]])
+        self.assertEqual(len(reports), 2)
+        self.assertEqual(reports[0]["models"][0]["totalCostUSD"], 2 * (12.5 + 1234.5678))
+        self.assertIn("error", reports[1]["sources"][1])
+
+    def test_serve_latest_only_replaces_stale_sockets(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "usage.sock")
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write("keep me")
+            with self.assertRaises(RuntimeError):
+                serve_latest(path)
+            os.unlink(path)
+
+            stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stale.bind(path)
+            stale.close()
+            server = serve_latest(path)
+            try:
+                with self.assertRaises(RuntimeError):
+                    serve_latest(path)
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                    client.connect(path)
+                    self.assertEqual(client.recv(16), b"{}\n")
+            finally:
+                server.shutdown()
+                server.server_close()
+
+    def test_budget_engine_reports_exceeded_and_projected_rules(self):
+        today = date(2025, 3, 31)
+
+        def row(offset, model, cost):
+            day = (today - timedelta(days=offset)).isoformat()
+            return {"date": day, "modelBreakdowns": [{"modelName": model, "cost": cost}]}
+
+        engine = BudgetEngine(
+            [
+                BudgetRule(name="codex-week", limit_usd=50, window_days=7, provider="codex"),
+                BudgetRule(name="gpt-month", limit_usd=100, window_days=30, model="gpt-5"),
+                BudgetRule(name="all-month", limit_usd=1000, window_days=30, burn_days=2),
+            ],
+            today=today,
+        )
+        engine.add_entry("codex", row(40, "gpt-5", 500))
+        for offset in range(3):
+            engine.add_entry("codex", row(offset, "gpt-5", 10))
+        engine.add_entry("claude", row(1, "opus", 20))
+
+        results = {result["name"]: result for result in engine.evaluate()}
+        self.assertEqual(results["codex-week"]["spentUSD"], 30.0)
+        self.assertEqual(results["codex-week"]["status"], "ok")
+        self.assertEqual(results["gpt-month"]["burnRateUSDPerDay"], 30.0 / 7)
+        self.assertEqual(results["gpt-month"]["status"], "projected")
+        self.assertEqual(results["all-month"]["projectedUSD"], 20.0 * 30)
+
+        engine.add_entry("codex", row(0, "gpt-5", 30))
+        results = {result["name"]: result for result in engine.evaluate()}
+        self.assertEqual(results["codex-week"]["spentUSD"], 50.0)
+        self.assertEqual(results["codex-week"]["status"], "exceeded")
+
+    def test_budget_rules_reject_booleans_as_numbers(self):
+        base = {"name": "weekly", "limitUSD": 10, "windowDays": 7}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "budgets.json")
+            for field in ("limitUSD", "windowDays", "burnDays"):
+                with self.subTest(field=field):
+                    with open(path, "w", encoding="utf-8") as handle:
+                        json.dump([dict(base, **{field: True})], handle)
+                    with self.assertRaisesRegex(RuntimeError, field):
+                        load_budget_rules(path)
+
+    def test_budgets_add_up_the_same_day_across_inputs(self):
+        day = date.today().isoformat()
+        payload = {
+            "provider": "codex",
+            "daily": [{"date": day, "modelBreakdowns": [{"modelName": "gpt-5", "cost": 40}]}],
+        }
+        rules = [{"name": "codex-week", "limitUSD": 60, "windowDays": 7, "provider": "codex"}]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = []
+            for name in ("a.json", "b.json", "budgets.json"):
+                paths.append(os.path.join(tmpdir, name))
+                with open(paths[-1], "w", encoding="utf-8") as handle:
+                    json.dump(rules if name == "budgets.json" else payload, handle)
+            argv = ["model_usage.py", "--input", paths[0], "--input", paths[1]]
+            argv += ["--budgets", paths[2], "--format", "json"]
+            with patch("sys.argv", argv), patch("sys.stdout", new_callable=io.StringIO) as out:
+                code = model_usage.main()
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["rules"][0]["spentUSD"], 80.0)
+        self.assertEqual(report["rules"][0]["status"], "exceeded")
+        self.assertEqual(code, model_usage.BUDGET_ALERT_EXIT_CODE)
+
+
+def load_payload_from(data, provider):
+    with patch("sys.stdin", io.StringIO(json.dumps(data))):
+        return load_payload("-", provider)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "pillow>=10.0.0",
+# ]
+# ///
+"""
+Benchmark saving generated images: the old always-decode-and-PNG path vs save_image.
+
+Synthesizes API-like results at 1K/2K/4K and reports encode time and output size
+per returned format and requested output format.
+
+Usage:
+    uv run bench_generate_image.py --runs 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+from generate_image import save_image
+from PIL import Image as PILImage
+
+SIZES = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+
+def synthetic_image(edge: int, mode: str) -> PILImage.Image:
+    """Gradients plus noise: compresses roughly like a photo, unlike flat colour or pure noise."""
+    red = PILImage.linear_gradient("L").resize((edge, edge))
+    green = PILImage.effect_noise((edge, edge), 40)
+    blue = PILImage.radial_gradient("L").resize((edge, edge))
+    image = PILImage.merge("RGB", (red, green, blue))
+    if mode == "RGBA":
+        image.putalpha(255)
+    elif mode == "RGBA+alpha":
+        image.putalpha(PILImage.radial_gradient("L").resize((edge, edge)))
+    return image
+
+
+def encode(image: PILImage.Image, fmt: str) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def legacy_save(data: bytes, output_path: Path) -> None:
+    """What generate_image.py did before: always decode, flatten via split(), save PNG."""
+    image = PILImage.open(BytesIO(data))
+    if image.mode == "RGBA":
+        rgb_image = PILImage.new("RGB", image.size, (255, 255, 255))
+        rgb_image.paste(image, mask=image.split()[3])
+        rgb_image.save(str(output_path), "PNG")
+    elif image.mode == "RGB":
+        image.save(str(output_path), "PNG")
+    else:
+        image.convert("RGB").save(str(output_path), "PNG")
+
+
+def best_of(fn, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark generated-image saving.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--resolutions", default="1K,2K,4K")
+    args = parser.parse_args()
+
+    cases = [
+        ("PNG", "RGB", ["png", "jpeg", "webp"]),
+        ("PNG", "RGBA", ["png"]),
+        ("PNG", "RGBA+alpha", ["png"]),
+        ("JPEG", "RGB", ["jpeg", "png"]),
+    ]
+    print(
+        f"{'res':<4} {'returned':<16} {'output':<6} {'old ms':>9} {'new ms':>9}"
+        f" {'old KiB':>9} {'new KiB':>9}"
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir)
+        for label in args.resolutions.split(","):
+            edge = SIZES[label.strip()]
+            for source_format, mode, outputs in cases:
+                data = encode(synthetic_image(edge, mode), source_format)
+                old_path = out / "old.png"
+                old_ms = best_of(lambda: legacy_save(data, old_path), args.runs)
+                old_kib = old_path.stat().st_size / 1024
+                for fmt in outputs:
+                    new_path = out / f"new.{fmt}"
+                    new_ms = best_of(lambda: save_image(data, new_path, fmt), args.runs)
+                    new_kib = new_path.stat().st_size / 1024
+                    returned = f"{source_format} {mode}"
+                    print(
+                        f"{label:<4} {returned:<16} {fmt:<6} {old_ms:>9.1f} {new_ms:>9.1f}"
+                        f" {old_kib:>9.0f} {new_kib:>9.0f}"
+                    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
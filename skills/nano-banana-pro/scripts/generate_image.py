@@ -14,13 +14,54 @@ Usage:
 
 Multi-image editing (up to 14 images):
     uv run generate_image.py --prompt "combine these images" --filename "output.png" -i img1.png -i img2.png -i img3.png
+
+Batch mode (one client, several requests in flight):
+    uv run generate_image.py --batch jobs.jsonl --concurrency 4
+    # jobs.jsonl: {"prompt": "...", "filename": "a.png", "inputs": ["in.jpg"], "resolution": "2K"}
+
+Warm worker (SDK imported and client created once, requests over a Unix socket):
+    uv run generate_image.py --serve /tmp/nano-banana.sock &
+    python3 generate_image.py --worker /tmp/nano-banana.sock --prompt "..." --filename "output.png"
 """
 
 import argparse
+import hashlib
+import json
 import os
+import shutil
+import stat
+import struct
 import sys
+import threading
+import time
 from pathlib import Path
 
+MAX_INPUT_IMAGES = 14
+
+# Longest edge each output resolution can make use of; larger inputs are downscaled to it.
+INPUT_MAX_EDGE = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+# Formats the API accepts as-is, so small inputs can be uploaded without decoding.
+UPLOAD_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# Output formats: PIL format name and encoder options.
+OUTPUT_FORMATS = {
+    "png": ("PNG", {"compress_level": 3}),  # ~3x faster than the default 6, ~10% larger
+    "jpeg": ("JPEG", {"quality": 92}),
+    "webp": ("WEBP", {"quality": 90}),
+}
+FORMAT_SUFFIXES = {".png": "png", ".jpg": "jpeg", ".jpeg": "jpeg", ".webp": "webp"}
+
+# A --serve worker exits after this many seconds without requests.
+WORKER_IDLE_TIMEOUT = 900
+
+# Disk budget for prepared input images, and how long before expiry a Files API
+# upload stops being reused (uploads live 48 hours).
+INPUT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+UPLOAD_EXPIRY_MARGIN = 3600
+
+MODEL = "gemini-3-pro-image-preview"
+
 
 def get_api_key(provided_key: str | None) -> str | None:
     """Get API key from argument first, then environment."""
@@ -29,18 +70,892 @@ def get_api_key(provided_key: str | None) -> str | None:
     return os.environ.get("GEMINI_API_KEY")
 
 
+def probe_image_size(path: str) -> tuple[str, int, int] | None:
+    """Read (format, width, height) from the file header without decoding any pixels."""
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            width, height = struct.unpack(">II", head[16:24])
+            return "PNG", width, height
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            width, height = struct.unpack("<HH", head[6:10])
+            return "GIF", width, height
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+            chunk = head[12:16]
+            if chunk == b"VP8X":
+                width = 1 + int.from_bytes(head[24:27], "little")
+                height = 1 + int.from_bytes(head[27:30], "little")
+            elif chunk == b"VP8L":
+                bits = int.from_bytes(head[21:25], "little")
+                width, height = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            elif chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", head[26:30])
+                width, height = width & 0x3FFF, height & 0x3FFF
+            else:
+                return None
+            return "WEBP", width, height
+        if head[:2] == b"\xff\xd8":
+            f.seek(2)
+            return _probe_jpeg(f)
+    return None
+
+
+def _probe_jpeg(f) -> tuple[str, int, int] | None:
+    sof = _read_jpeg_sof(f)
+    return ("JPEG", sof[2], sof[1]) if sof else None
+
+
+def _read_jpeg_sof(f) -> tuple[int, int, int, int] | None:
+    """Walk JPEG marker segments to the first SOF header: (precision, height, width, components)."""
+    while True:
+        byte = f.read(1)
+        if byte != b"\xff":
+            return None
+        marker = f.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = f.read(1)
+        if not marker:
+            return None
+        kind = marker[0]
+        if kind == 0x01 or 0xD0 <= kind <= 0xD8:
+            continue  # markers without a length
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if 0xC0 <= kind <= 0xCF and kind not in (0xC4, 0xC8, 0xCC):
+            sof = f.read(6)
+            if len(sof) < 6:
+                return None
+            return struct.unpack(">BHHB", sof)
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "nano-banana-pro"
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class DiskCache:
+    """Files under root matching `pattern`, evicted least-recently-used first past max_bytes.
+
+    Hits should touch their entry (os.utime) so eviction follows last use.
+    """
+
+    pattern = "??/*"
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total: int | None = None
+
+    def added(self, entry: Path) -> None:
+        with self.lock:
+            if self.total is None:
+                self.total = sum(size for _, size, _ in self.entries())
+            else:
+                self.total += entry.stat().st_size
+            if self.total > self.max_bytes:
+                self.evict()
+
+    def entries(self) -> list[tuple[float, int, Path]]:
+        found = []
+        for entry in self.root.glob(self.pattern):
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            found.append((st.st_mtime, st.st_size, entry))
+        return found
+
+    def evict(self) -> None:
+        entries = sorted(self.entries())
+        self.total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if self.total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            self.total -= size
+
+
+class InputCache(DiskCache):
+    """Content-addressed store of prepared input images and their Files API uploads.
+
+    Prepared (downscaled, re-encoded) bytes are keyed on the source file's hash
+    and the target edge, and evicted least-recently-used first past max_bytes.
+    Uploads are keyed on the hash of the bytes sent and of the API key (files
+    belong to the uploading key's project) and reused until UPLOAD_EXPIRY_MARGIN
+    before they expire, so repeat edits of the same inputs skip both
+    preprocessing and upload.
+    """
+
+    pattern = "prepared/??/*"
+
+    def __init__(
+        self, root: Path, max_bytes: int = INPUT_CACHE_MAX_BYTES, api_key: str | None = None
+    ) -> None:
+        super().__init__(root, max_bytes)
+        self.uploads_supported = True
+        self.account = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+    def prepared_path(self, digest: str, max_edge: int | None) -> Path:
+        return self.root / "prepared" / digest[:2] / f"{digest}-{max_edge or 'full'}"
+
+    def fetch_prepared(
+        self, digest: str, max_edge: int | None
+    ) -> tuple[bytes, str, int, int] | None:
+        entry = self.prepared_path(digest, max_edge)
+        try:
+            with open(entry, "rb") as f:
+                meta = json.loads(f.readline())
+                data = f.read()
+            os.utime(entry)
+        except (OSError, ValueError):
+            return None
+        return data, meta["mime_type"], meta["width"], meta["height"]
+
+    def store_prepared(
+        self,
+        digest: str,
+        max_edge: int | None,
+        data: bytes,
+        mime_type: str,
+        width: int,
+        height: int,
+    ) -> None:
+        entry = self.prepared_path(digest, max_edge)
+        meta = {"mime_type": mime_type, "width": width, "height": height}
+        write_atomic(entry, json.dumps(meta).encode("utf-8") + b"\n" + data)
+        self.added(entry)
+
+    def upload_path(self, data: bytes) -> Path:
+        digest = hashlib.sha256(data).hexdigest()
+        return self.root / "uploads" / f"{digest}-{self.account}.json"
+
+    def forget_upload(self, data: bytes) -> None:
+        """Drop the cached upload of data, e.g. after the backend rejected its URI."""
+        self.upload_path(data).unlink(missing_ok=True)
+
+    def upload(self, client, data: bytes, mime_type: str, log=print) -> tuple[str | None, bool]:
+        """Return (Files API URI, reused) for data, uploading it unless a live upload is cached.
+
+        A None URI means the bytes should be sent inline: the SDK or backend has
+        no Files API (remembered for this cache), or this upload failed.
+        """
+        record_path = self.upload_path(data)
+        try:
+            record = json.loads(record_path.read_text(encoding="utf-8"))
+            if record["expires"] - time.time() > UPLOAD_EXPIRY_MARGIN:
+                return record["uri"], True
+        except (OSError, ValueError, KeyError):
+            pass
+        if not self.uploads_supported:
+            return None, False
+
+        from io import BytesIO
+
+        try:
+            uploaded = client.files.upload(file=BytesIO(data), config={"mime_type": mime_type})
+        except (AttributeError, NotImplementedError, ValueError) as e:
+            # Vertex AI clients raise ValueError: the Files API is Gemini-only.
+            self.uploads_supported = False
+            log(f"Files API unavailable ({e}); sending input images inline.")
+            return None, False
+        except Exception as e:
+            log(f"Upload failed ({e}); sending this input image inline.")
+            return None, False
+        expires = getattr(uploaded, "expiration_time", None)
+        if expires is not None:
+            record = {"uri": uploaded.uri, "expires": expires.timestamp()}
+            write_atomic(record_path, json.dumps(record).encode("utf-8"))
+        return uploaded.uri, False
+
+
+class ResultCache(DiskCache):
+    """Generated images keyed on (model, prompt, input hashes, resolution, format, downscale).
+
+    Entries are copies, never hardlinks: outputs get overwritten in place by
+    later runs. With reuse=False (--no-cache) lookups are skipped but fresh
+    results still replace their entries.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, reuse: bool = True) -> None:
+        super().__init__(root, max_bytes)
+        self.reuse = reuse
+
+    @staticmethod
+    def key(
+        prompt: str, input_digests: list[str], resolution: str | None, fmt: str, downscale: bool
+    ) -> str:
+        fields = {
+            "model": MODEL,
+            "prompt": prompt,
+            "inputs": input_digests,
+            "resolution": resolution,
+            "format": fmt,
+            "downscale": downscale,
+        }
+        blob = json.dumps(fields, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(blob).hexdigest()
+
+    def item_key(self, item: dict, fmt: str, downscale: bool) -> str | None:
+        """Key for a job item; None if an input can't be read (load_inputs reports it)."""
+        try:
+            digests = [file_digest(path) for path in item["inputs"]]
+        except OSError:
+            return None
+        return self.key(item["prompt"], digests, item.get("resolution"), fmt, downscale)
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def fetch(self, key: str, dest: Path) -> bool:
+        """Copy a cached result to dest; False on a miss or when reuse is off."""
+        if not self.reuse:
+            return False
+        entry = self.path(key)
+        tmp = dest.with_name(f".{dest.name}.{threading.get_ident()}.tmp")
+        try:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(entry, tmp)
+            os.utime(entry)
+        except FileNotFoundError:
+            tmp.unlink(missing_ok=True)
+            return False
+        os.replace(tmp, dest)
+        return True
+
+    def store(self, key: str, src: Path) -> None:
+        entry = self.path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_name(f".{entry.name}.{threading.get_ident()}.tmp")
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, entry)
+        self.added(entry)
+
+
+def auto_resolution(max_input_dim: int) -> str:
+    """Pick the output resolution that matches the largest input dimension."""
+    if max_input_dim >= 3000:
+        return "4K"
+    if max_input_dim >= 1500:
+        return "2K"
+    return "1K"
+
+
+def prepare_input(path: str, max_edge: int | None) -> tuple[bytes, str, int, int]:
+    """Downscale (to max_edge) and re-encode one input image for upload.
+
+    Runs in a worker process. JPEGs are decoded at reduced scale via draft(),
+    so a 4K photo never needs its full-size pixels in memory. Returns
+    (data, mime_type, width, height).
+    """
+    from io import BytesIO
+
+    from PIL import Image as PILImage
+    from PIL import ImageOps
+
+    with PILImage.open(path) as img:
+        if max_edge:
+            img.draft("RGB", (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        if max_edge:
+            img.thumbnail((max_edge, max_edge), PILImage.Resampling.LANCZOS)
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or (
+            img.mode == "P" and "transparency" in img.info
+        )
+        buffer = BytesIO()
+        if has_alpha:
+            img.convert("RGBA").save(buffer, "WEBP", quality=90)
+            mime_type = "image/webp"
+        else:
+            img.convert("RGB").save(buffer, "JPEG", quality=90, optimize=True)
+            mime_type = "image/jpeg"
+        return buffer.getvalue(), mime_type, img.width, img.height
+
+
+def prepare_inputs(
+    paths: list[str],
+    probes: list[tuple[str, int, int]],
+    max_edge: int | None,
+    pool=None,
+    log=print,
+    cache: InputCache | None = None,
+) -> list[tuple[bytes, str]]:
+    """Return (data, mime_type) per input, re-encoding in a process pool only where needed.
+
+    Inputs already in an uploadable format and within max_edge are sent as their
+    original bytes without being decoded. A shared `pool` is used when given,
+    and re-encoded inputs are looked up in and added to `cache`.
+    """
+    prepared: list[tuple[bytes, str] | None] = [None] * len(paths)
+    digests: dict[int, str] = {}
+    jobs = []
+    for i, (path, (fmt, width, height)) in enumerate(zip(paths, probes)):
+        within = not max_edge or max(width, height) <= max_edge
+        if fmt in UPLOAD_MIME_TYPES and within:
+            prepared[i] = (Path(path).read_bytes(), UPLOAD_MIME_TYPES[fmt])
+            log(f"Loaded input image: {path} ({width}x{height})")
+            continue
+        if cache is not None:
+            try:
+                digests[i] = file_digest(path)
+            except OSError as e:
+                raise RuntimeError(f"Could not load input image '{path}': {e}") from e
+            hit = cache.fetch_prepared(digests[i], max_edge)
+            if hit is not None:
+                data, mime_type, new_width, new_height = hit
+                prepared[i] = (data, mime_type)
+                log(
+                    f"Loaded input image: {path} ({width}x{height} -> {new_width}x{new_height},"
+                    f" {len(data) // 1024} KB {mime_type}, cached)"
+                )
+                continue
+        jobs.append(i)
+
+    def collect(i: int, result) -> None:
+        try:
+            data, mime_type, width, height = result()
+        except Exception as e:
+            raise RuntimeError(f"Could not load input image '{paths[i]}': {e}") from e
+        prepared[i] = (data, mime_type)
+        if i in digests:
+            cache.store_prepared(digests[i], max_edge, data, mime_type, width, height)
+        _, old_width, old_height = probes[i]
+        log(
+            f"Loaded input image: {paths[i]} ({old_width}x{old_height} -> {width}x{height},"
+            f" {len(data) // 1024} KB {mime_type})"
+        )
+
+    if pool is None and len(jobs) == 1:
+        collect(jobs[0], lambda: prepare_input(paths[jobs[0]], max_edge))
+    elif jobs:
+        from concurrent.futures import ProcessPoolExecutor
+
+        own_pool = pool is None
+        if own_pool:
+            pool = ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1))
+        try:
+            futures = [pool.submit(prepare_input, paths[i], max_edge) for i in jobs]
+            for i, future in zip(jobs, futures):
+                collect(i, future.result)
+        finally:
+            if own_pool:
+                pool.shutdown()
+    return prepared
+
+
+def load_inputs(
+    paths: list[str],
+    resolution: str | None,
+    downscale: bool = True,
+    pool=None,
+    log=print,
+    cache: InputCache | None = None,
+) -> tuple[list[tuple[bytes, str]], str]:
+    """Probe input images, settle the output resolution and prepare the inputs for upload.
+
+    A resolution of None is auto-detected from the largest input (1K without inputs).
+    Only headers are read to pick the resolution; pixels are decoded only for
+    inputs that must be downscaled or converted. Returns (prepared, resolution).
+    """
+    if len(paths) > MAX_INPUT_IMAGES:
+        raise RuntimeError(f"Too many input images ({len(paths)}). Maximum is {MAX_INPUT_IMAGES}.")
+
+    probes = []
+    for path in paths:
+        try:
+            probe = probe_image_size(path)
+            if probe is None:
+                # Unusual format: PIL's open() also reads just the header.
+                from PIL import Image as PILImage
+
+                with PILImage.open(path) as img:
+                    probe = (img.format or "", img.width, img.height)
+        except Exception as e:
+            raise RuntimeError(f"Could not load input image '{path}': {e}") from e
+        probes.append(probe)
+
+    if resolution is None:
+        resolution = "1K"
+        if probes:
+            # Auto-detect resolution from the largest input
+            max_input_dim = max(max(width, height) for _, width, height in probes)
+            resolution = auto_resolution(max_input_dim)
+            log(f"Auto-detected resolution: {resolution} (from max input dimension {max_input_dim})")
+
+    max_edge = INPUT_MAX_EDGE[resolution] if downscale else None
+    return prepare_inputs(paths, probes, max_edge, pool, log, cache), resolution
+
+
+def resolve_output(filename: str, fmt: str | None) -> tuple[Path, str]:
+    """Return (path, format): the format follows the file suffix unless one is given."""
+    path = Path(filename)
+    suffix_format = FORMAT_SUFFIXES.get(path.suffix.lower())
+    if fmt is None:
+        return path, suffix_format or "png"
+    if suffix_format != fmt:
+        path = path.with_suffix(".jpg" if fmt == "jpeg" else f".{fmt}")
+    return path, fmt
+
+
+def sniff_format(data: bytes) -> str | None:
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data[:2] == b"\xff\xd8":
+        return "jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def is_plain_rgb(data: bytes, fmt: str) -> bool:
+    """True if the encoded image is 8-bit RGB without alpha, judged from its headers alone."""
+    if fmt == "png":
+        idat = data.find(b"IDAT")
+        return len(data) > 25 and data[24] == 8 and data[25] == 2 and data.find(b"tRNS", 0, idat) < 0
+    if fmt == "jpeg":
+        # Grayscale (1) and CMYK (4) components still need converting to RGB.
+        from io import BytesIO
+
+        if data[:2] != b"\xff\xd8":
+            return False
+        stream = BytesIO(data)
+        stream.seek(2)
+        sof = _read_jpeg_sof(stream)
+        return sof is not None and sof[0] == 8 and sof[3] == 3
+    if fmt == "webp":
+        chunk = data[12:16]
+        return chunk == b"VP8 " or (chunk == b"VP8X" and not data[20] & 0x10)
+    return False
+
+
+def flatten_to_rgb(image):
+    """Drop alpha, compositing onto white only when some pixel is actually transparent."""
+    from PIL import Image as PILImage
+
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        alpha = image.getchannel("A")
+        if alpha.getextrema()[0] == 255:
+            return image.convert("RGB")
+        background = PILImage.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=alpha)
+        return background
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def save_image(data: bytes, output_path: Path, fmt: str) -> bool:
+    """Write returned image bytes as fmt, flattened onto white; True if it had to be re-encoded.
+
+    Bytes that are already opaque RGB in the requested format are written as-is,
+    without importing PIL or decoding the image.
+    """
+    if sniff_format(data) == fmt and is_plain_rgb(data, fmt):
+        output_path.write_bytes(data)
+        return False
+
+    from io import BytesIO
+
+    from PIL import Image as PILImage
+
+    pil_format, options = OUTPUT_FORMATS[fmt]
+    with PILImage.open(BytesIO(data)) as image:
+        flatten_to_rgb(image).save(str(output_path), pil_format, **options)
+    return True
+
+
+def input_parts(
+    client, types, inputs: list[tuple[bytes, str]], cache=None, log=print
+) -> tuple[list, list[bytes]]:
+    """Content parts for prepared inputs: uploaded file references where possible, else inline.
+
+    Also returns the inputs whose parts reuse an upload from an earlier run.
+    """
+    uploads: list[tuple[str | None, bool]] = [(None, False)] * len(inputs)
+    if cache is not None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(len(inputs), 8) or 1) as pool:
+            uploads = list(
+                pool.map(lambda item: cache.upload(client, item[0], item[1], log), inputs)
+            )
+    parts = [
+        types.Part.from_uri(file_uri=uri, mime_type=mime_type)
+        if uri
+        else types.Part.from_bytes(data=data, mime_type=mime_type)
+        for (uri, _), (data, mime_type) in zip(uploads, inputs)
+    ]
+    reused = [data for (_, was_cached), (data, _) in zip(uploads, inputs) if was_cached]
+    return parts, reused
+
+
+def save_parts(parts, output_path: Path, fmt: str, log=print, text=None) -> bool:
+    """Log text parts and save image parts to output_path; True if an image was saved.
+
+    With a `text` list (one per stream), fragments are logged as they arrive
+    with log(fragment, end=""), the "Model response: " prefix only before the
+    first, and collected in the list. Interim images the model marks as
+    thoughts are skipped, so only the final image ends up at output_path.
+    """
+    image_saved = False
+    for part in parts or []:
+        if part.text is not None:
+            if text is None:
+                log(f"Model response: {part.text}")
+            else:
+                log(part.text if text else f"Model response: {part.text}", end="")
+                text.append(part.text)
+        elif part.inline_data is not None and not getattr(part, "thought", False):
+            # inline_data.data is already bytes, not base64
+            image_data = part.inline_data.data
+            if isinstance(image_data, str):
+                # If it's a string, it might be base64
+                import base64
+                image_data = base64.b64decode(image_data)
+
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            save_image(image_data, output_path, fmt)
+            image_saved = True
+    return image_saved
+
+
+def generate_image(
+    client,
+    types,
+    prompt: str,
+    inputs: list[tuple[bytes, str]],
+    resolution: str,
+    output_path: Path,
+    fmt: str = "png",
+    log=print,
+    cache: InputCache | None = None,
+    stream: bool = False,
+) -> bool:
+    """Run one generate_content call and save the returned image; True if one was saved.
+
+    With a cache, inputs are referenced through (cached) Files API uploads
+    rather than sent inline; if a request reusing earlier uploads fails (the
+    file was deleted, or the key changed projects), those uploads are dropped
+    and the request is retried once with the images inline. With stream, images
+    are saved and text is logged chunk by chunk as they arrive, and each chunk
+    is released once handled.
+    """
+    # Build contents (images first if editing, prompt only if generating)
+    reused: list[bytes] = []
+    if inputs:
+        parts, reused = input_parts(client, types, inputs, cache, log)
+        contents = [*parts, prompt]
+        img_count = len(inputs)
+        log(f"Processing {img_count} image{'s' if img_count > 1 else ''} with resolution {resolution}...")
+    else:
+        contents = prompt
+        log(f"Generating image with resolution {resolution}...")
+
+    config = types.GenerateContentConfig(
+        response_modalities=["TEXT", "IMAGE"],
+        image_config=types.ImageConfig(
+            image_size=resolution
+        )
+    )
+
+    def send(contents) -> bool:
+        # Process response and save in the requested format
+        request = {"model": MODEL, "contents": contents, "config": config}
+        if not stream:
+            response = client.models.generate_content(**request)
+            return save_parts(response.parts, output_path, fmt, log)
+        image_saved = False
+        text: list[str] = []
+        try:
+            for chunk in client.models.generate_content_stream(**request):
+                image_saved = save_parts(chunk.parts, output_path, fmt, log, text) or image_saved
+        finally:
+            if text:
+                log("")  # end the response line
+        return image_saved
+
+    try:
+        return send(contents)
+    except Exception as e:
+        if not reused:
+            raise
+        for data in reused:
+            cache.forget_upload(data)
+        log(f"Request with previously uploaded input images failed ({e}); retrying inline.")
+    inline = [types.Part.from_bytes(data=data, mime_type=mime_type) for data, mime_type in inputs]
+    return send([*inline, prompt])
+
+
+def check_item(item) -> dict:
+    """Validate one job object (a manifest line or a worker request); raises ValueError."""
+    if not isinstance(item, dict):
+        raise ValueError("expected a JSON object")
+    if not item.get("prompt") or not item.get("filename"):
+        raise ValueError('"prompt" and "filename" are required')
+    if not isinstance(item["prompt"], str) or not isinstance(item["filename"], str):
+        raise ValueError('"prompt" and "filename" must be strings')
+    inputs = item.get("inputs") or []
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    if not isinstance(inputs, list) or not all(isinstance(path, str) for path in inputs):
+        raise ValueError('"inputs" must be a path or a list of paths')
+    item["inputs"] = inputs
+    if item.get("resolution") not in (None, *INPUT_MAX_EDGE):
+        raise ValueError(f"unknown resolution {item['resolution']!r}")
+    if item.get("format") not in (None, *OUTPUT_FORMATS):
+        raise ValueError(f"unknown format {item['format']!r}")
+    return item
+
+
+def read_batch_manifest(path: str) -> list[dict]:
+    """Parse a JSONL manifest; malformed lines become items carrying an "error"."""
+    items = []
+    with open(path, encoding="utf-8") as handle:
+        for line_no, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = check_item(json.loads(line))
+            except ValueError as e:  # json.JSONDecodeError is a ValueError
+                item = {"error": f"line {line_no}: {e}"}
+            item["line"] = line_no
+            items.append(item)
+    return items
+
+
+def run_item(
+    client, types, item: dict, downscale: bool, pool=None, log=print, cache=None, results=None
+) -> dict:
+    """Load inputs for one job item and generate it; returns {"filename", "path" or "error"}.
+
+    With a ResultCache, a cached image is copied to the filename instead, and
+    fresh images are added to it.
+    """
+    try:
+        output_path, fmt = resolve_output(item["filename"], item.get("format"))
+        key = results.item_key(item, fmt, downscale) if results is not None else None
+        if key and results.fetch(key, output_path):
+            log("Reusing cached result (pass --no-cache to regenerate).")
+            return {"filename": item["filename"], "path": str(output_path.resolve())}
+        inputs, resolution = load_inputs(
+            item["inputs"], item.get("resolution"), downscale, pool, log, cache
+        )
+        if not generate_image(
+            client,
+            types,
+            item["prompt"],
+            inputs,
+            resolution,
+            output_path,
+            fmt,
+            log,
+            cache,
+            item.get("stream", False),
+        ):
+            raise RuntimeError("No image was generated in the response.")
+    except Exception as e:
+        return {"filename": item["filename"], "error": str(e)}
+    if key:
+        try:
+            results.store(key, output_path)
+        except OSError as e:
+            log(f"Could not cache the result: {e}")
+    return {"filename": item["filename"], "path": str(output_path.resolve())}
+
+
+def run_batch(
+    client,
+    types,
+    items: list[dict],
+    concurrency: int,
+    downscale: bool,
+    cache=None,
+    results=None,
+) -> list[dict]:
+    """Generate every manifest item over one client; returns a result dict per item."""
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    total = len(items)
+    print_lock = threading.Lock()
+
+    def run(index: int, item: dict) -> dict:
+        label = f"[{index}/{total}]"
+
+        def log(message: str, end: str = "\n") -> None:
+            # Items run concurrently, so streamed fragments get a labelled line each.
+            if message:
+                with print_lock:
+                    print(f"{label} {message}", flush=True)
+
+        if "error" in item:
+            return {"line": item["line"], "error": item["error"]}
+        result = {
+            "line": item["line"],
+            **run_item(client, types, item, downscale, pool, log, cache, results),
+        }
+        if "path" in result:
+            with print_lock:
+                print(f"{label} Image saved: {result['path']}")
+                print(f"MEDIA: {result['path']}", flush=True)
+        return result
+
+    with ProcessPoolExecutor() as pool, ThreadPoolExecutor(max_workers=max(1, concurrency)) as threads:
+        futures = [threads.submit(run, index, item) for index, item in enumerate(items, start=1)]
+        return [future.result() for future in futures]
+
+
+def serve_worker(
+    socket_path: str,
+    client,
+    types,
+    concurrency: int = 4,
+    idle_timeout: float = WORKER_IDLE_TIMEOUT,
+    cache: InputCache | None = None,
+) -> None:
+    """Serve job items on a Unix socket with one warm client until idle_timeout (0: never).
+
+    Each connection sends one JSON job line (check_item fields plus optional
+    "downscale", "input_cache" and "stream" booleans) and gets back
+    {"log": ..., "end": ...} lines followed by the run_item result. At most `concurrency`
+    jobs generate at once; input preprocessing shares one process pool and
+    `cache`, and PIL stays imported after the first job.
+    """
+    import socket
+    import socketserver
+    from concurrent.futures import ProcessPoolExecutor
+
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        mode = None
+    if mode is not None:
+        if not stat.S_ISSOCK(mode):
+            raise RuntimeError(f"{socket_path} exists and is not a socket")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+        except ConnectionRefusedError:
+            os.unlink(socket_path)  # left behind by a worker that died
+        else:
+            raise RuntimeError(f"A worker is already listening on {socket_path}")
+        finally:
+            probe.close()
+
+    slots = threading.BoundedSemaphore(max(1, concurrency))
+    lock = threading.Lock()
+    state = {"active": 0, "last": time.monotonic()}
+    pool = ProcessPoolExecutor()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def send(self, message: dict) -> None:
+            self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+        def handle(self) -> None:
+            with lock:
+                state["active"] += 1
+            try:
+                try:
+                    item = check_item(json.loads(self.rfile.readline()))
+                except ValueError as e:
+                    result = {"error": f"bad request: {e}"}
+                else:
+                    with slots:
+                        result = run_item(
+                            client,
+                            types,
+                            item,
+                            item.get("downscale", True),
+                            pool,
+                            lambda message, end="\n": self.send({"log": message, "end": end}),
+                            cache if item.get("input_cache", True) else None,
+                        )
+                try:
+                    self.send(result)
+                except OSError:
+                    pass  # client went away
+            finally:
+                with lock:
+                    state["active"] -= 1
+                    state["last"] = time.monotonic()
+
+    def watch_idle() -> None:
+        while True:
+            time.sleep(min(1.0, idle_timeout))
+            with lock:
+                if not state["active"] and time.monotonic() - state["last"] >= idle_timeout:
+                    break
+        server.shutdown()
+
+    # Requests spend this worker's API key: create the socket owner-only, with no
+    # window between bind and chmod in which another user could connect.
+    umask = os.umask(0o077)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    finally:
+        os.umask(umask)
+    server.daemon_threads = True
+    try:
+        if idle_timeout:
+            threading.Thread(target=watch_idle, daemon=True).start()
+        print(f"Worker listening on {socket_path}", flush=True)
+        server.serve_forever()
+    finally:
+        server.server_close()
+        pool.shutdown()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def send_to_worker(socket_path: str, item: dict) -> dict | None:
+    """Run one job on a --serve worker, printing its log lines; None if none is listening."""
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    with sock, sock.makefile("rwb") as stream:
+        stream.write(json.dumps(item).encode("utf-8") + b"\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "log" not in message:
+                return message
+            print(message["log"], end=message.get("end", "\n"), flush=True)
+    return {"error": "worker closed the connection without a result"}
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Generate images using Nano Banana Pro (Gemini 3 Pro Image)"
     )
     parser.add_argument(
         "--prompt", "-p",
-        required=True,
         help="Image description/prompt"
     )
     parser.add_argument(
         "--filename", "-f",
-        required=True,
         help="Output filename (e.g., sunset-mountains.png)"
     )
     parser.add_argument(
@@ -48,13 +963,82 @@ def main():
         action="append",
         dest="input_images",
         metavar="IMAGE",
-        help="Input image path(s) for editing/composition. Can be specified multiple times (up to 14 images)."
+        help=f"Input image path(s) for editing/composition. Can be specified multiple times (up to {MAX_INPUT_IMAGES} images)."
     )
     parser.add_argument(
         "--resolution", "-r",
         choices=["1K", "2K", "4K"],
-        default="1K",
-        help="Output resolution: 1K (default), 2K, or 4K"
+        help="Output resolution: 1K (default), 2K, or 4K. Auto-detected from input images if omitted"
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(OUTPUT_FORMATS),
+        help="Output format: png, jpeg, or webp (default: from the --filename suffix, else png)"
+    )
+    parser.add_argument(
+        "--batch", "-b",
+        metavar="MANIFEST",
+        help='JSONL file with one {"prompt", "filename", "inputs", "resolution", "format"} object per line'
+    )
+    parser.add_argument(
+        "--concurrency", "-c",
+        type=int,
+        default=4,
+        help="Requests in flight at once in --batch and --serve modes (default: 4)"
+    )
+    parser.add_argument(
+        "--no-downscale",
+        action="store_true",
+        help="Upload input images at full size instead of fitting them to the output resolution"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream the response: print model text and save the image as soon as each arrives"
+    )
+    parser.add_argument(
+        "--no-input-cache",
+        action="store_true",
+        help="Re-prepare and re-send input images instead of reusing cached copies and uploads"
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        default=os.environ.get("NANO_BANANA_CACHE", "").lower() in {"1", "true", "yes"},
+        help="Reuse an earlier image for the same prompt, inputs, resolution and format (env: NANO_BANANA_CACHE)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="With --cache, generate fresh anyway; the new image replaces the cached one"
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=1024,
+        help="Disk budget for cached results, least recently used removed first (default: 1024)"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=str(default_cache_dir()),
+        help="Cache directory (default: $XDG_CACHE_HOME/nano-banana-pro)"
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        help="Run a warm worker on this Unix socket instead of generating once"
+    )
+    parser.add_argument(
+        "--worker",
+        metavar="SOCKET",
+        default=os.environ.get("NANO_BANANA_WORKER"),
+        help="Send the request to a --serve worker on this socket if one is listening (env: NANO_BANANA_WORKER)"
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=WORKER_IDLE_TIMEOUT,
+        help=f"Seconds a --serve worker waits for requests before exiting, 0 for never (default: {WORKER_IDLE_TIMEOUT})"
     )
     parser.add_argument(
         "--api-key", "-k",
@@ -62,6 +1046,55 @@ def main():
     )
 
     args = parser.parse_args()
+    if not (args.batch or args.serve) and not (args.prompt and args.filename):
+        parser.error("--prompt and --filename are required unless --batch or --serve is given")
+
+    result_cache = None
+    if args.cache:
+        result_cache = ResultCache(
+            Path(args.cache_dir) / "results", args.cache_max_mb * 1024 * 1024, not args.no_cache
+        )
+
+    # A cached result needs neither the API key nor the SDK.
+    result_key = None
+    if result_cache is not None and not (args.batch or args.serve):
+        output_path, fmt = resolve_output(args.filename, args.format)
+        job = {
+            "prompt": args.prompt,
+            "inputs": args.input_images or [],
+            "resolution": args.resolution,
+        }
+        result_key = result_cache.item_key(job, fmt, not args.no_downscale)
+        if result_key and result_cache.fetch(result_key, output_path):
+            full_path = output_path.resolve()
+            print("Reusing cached result (pass --no-cache to regenerate).")
+            print(f"\nImage saved: {full_path}")
+            print(f"MEDIA: {full_path}")
+            return
+
+    if args.worker and not (args.batch or args.serve):
+        # Paths are resolved here: the worker may run in another directory.
+        item = {
+            "prompt": args.prompt,
+            "filename": str(resolve_output(args.filename, args.format)[0].absolute()),
+            "inputs": [str(Path(path).absolute()) for path in args.input_images or []],
+            "resolution": args.resolution,
+            "format": args.format,
+            "downscale": not args.no_downscale,
+            "input_cache": not args.no_input_cache,
+            "stream": args.stream,
+        }
+        result = send_to_worker(args.worker, item)
+        if result is not None:
+            if "error" in result:
+                print(f"Error generating image: {result['error']}", file=sys.stderr)
+                sys.exit(1)
+            if result_key:
+                result_cache.store(result_key, Path(result["path"]))
+            print(f"\nImage saved: {result['path']}")
+            print(f"MEDIA: {result['path']}")
+            return
+        print(f"No worker listening on {args.worker}; generating in-process.", file=sys.stderr)
 
     # Get API key
     api_key = get_api_key(args.api_key)
@@ -72,114 +1105,89 @@ def main():
         print("  2. Set GEMINI_API_KEY environment variable", file=sys.stderr)
         sys.exit(1)
 
+    if args.batch:
+        try:
+            items = read_batch_manifest(args.batch)
+        except OSError as e:
+            print(f"Error: Cannot read batch manifest: {e}", file=sys.stderr)
+            sys.exit(1)
+        if not items:
+            print("Error: Batch manifest is empty.", file=sys.stderr)
+            sys.exit(1)
+        for item in items:
+            item.setdefault("stream", args.stream)
+
+    cache = None
+    if not args.no_input_cache:
+        cache = InputCache(Path(args.cache_dir) / "inputs", api_key=api_key)
+
     # Import here after checking API key to avoid slow import on error
     from google import genai
     from google.genai import types
-    from PIL import Image as PILImage
 
-    # Initialise client
+    # Initialise client (once, shared by every item in --batch and --serve modes)
     client = genai.Client(api_key=api_key)
 
-    # Set up output path
-    output_path = Path(args.filename)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
-    # Load input images if provided (up to 14 supported by Nano Banana Pro)
-    input_images = []
-    output_resolution = args.resolution
-    if args.input_images:
-        if len(args.input_images) > 14:
-            print(f"Error: Too many input images ({len(args.input_images)}). Maximum is 14.", file=sys.stderr)
+    if args.serve:
+        try:
+            serve_worker(
+                args.serve, client, types, args.concurrency, args.idle_timeout, cache
+            )
+        except (OSError, RuntimeError) as e:
+            print(f"Error: {e}", file=sys.stderr)
             sys.exit(1)
+        except KeyboardInterrupt:
+            pass
+        return
 
-        max_input_dim = 0
-        for img_path in args.input_images:
-            try:
-                with PILImage.open(img_path) as img:
-                    copied = img.copy()
-                    width, height = copied.size
-                input_images.append(copied)
-                print(f"Loaded input image: {img_path}")
-
-                # Track largest dimension for auto-resolution
-                max_input_dim = max(max_input_dim, width, height)
-            except Exception as e:
-                print(f"Error loading input image '{img_path}': {e}", file=sys.stderr)
-                sys.exit(1)
-
-        # Auto-detect resolution from largest input if not explicitly set
-        if args.resolution == "1K" and max_input_dim > 0:  # Default value
-            if max_input_dim >= 3000:
-                output_resolution = "4K"
-            elif max_input_dim >= 1500:
-                output_resolution = "2K"
-            else:
-                output_resolution = "1K"
-            print(f"Auto-detected resolution: {output_resolution} (from max input dimension {max_input_dim})")
-
-    # Build contents (images first if editing, prompt only if generating)
-    if input_images:
-        contents = [*input_images, args.prompt]
-        img_count = len(input_images)
-        print(f"Processing {img_count} image{'s' if img_count > 1 else ''} with resolution {output_resolution}...")
-    else:
-        contents = args.prompt
-        print(f"Generating image with resolution {output_resolution}...")
+    if args.batch:
+        results = run_batch(
+            client, types, items, args.concurrency, not args.no_downscale, cache, result_cache
+        )
+        failures = [result for result in results if "error" in result]
+        print(f"\nBatch done: {len(results) - len(failures)} of {len(results)} images saved.")
+        for failure in failures:
+            target = failure.get("filename", "")
+            print(f"  line {failure['line']} {target}: {failure['error']}", file=sys.stderr)
+        sys.exit(1 if failures else 0)
 
+    # Load input images if provided (up to 14 supported by Nano Banana Pro)
     try:
-        response = client.models.generate_content(
-            model="gemini-3-pro-image-preview",
-            contents=contents,
-            config=types.GenerateContentConfig(
-                response_modalities=["TEXT", "IMAGE"],
-                image_config=types.ImageConfig(
-                    image_size=output_resolution
-                )
-            )
+        inputs, output_resolution = load_inputs(
+            args.input_images or [], args.resolution, not args.no_downscale, cache=cache
         )
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
 
-        # Process response and convert to PNG
-        image_saved = False
-        for part in response.parts:
-            if part.text is not None:
-                print(f"Model response: {part.text}")
-            elif part.inline_data is not None:
-                # Convert inline data to PIL Image and save as PNG
-                from io import BytesIO
-
-                # inline_data.data is already bytes, not base64
-                image_data = part.inline_data.data
-                if isinstance(image_data, str):
-                    # If it's a string, it might be base64
-                    import base64
-                    image_data = base64.b64decode(image_data)
-
-                image = PILImage.open(BytesIO(image_data))
-
-                # Ensure RGB mode for PNG (convert RGBA to RGB with white background if needed)
-                if image.mode == 'RGBA':
-                    rgb_image = PILImage.new('RGB', image.size, (255, 255, 255))
-                    rgb_image.paste(image, mask=image.split()[3])
-                    rgb_image.save(str(output_path), 'PNG')
-                elif image.mode == 'RGB':
-                    image.save(str(output_path), 'PNG')
-                else:
-                    image.convert('RGB').save(str(output_path), 'PNG')
-                image_saved = True
-
-        if image_saved:
-            full_path = output_path.resolve()
-            print(f"\nImage saved: {full_path}")
-            # OpenClaw parses MEDIA tokens and will attach the file on supported providers.
-            print(f"MEDIA: {full_path}")
-        else:
-            print("Error: No image was generated in the response.", file=sys.stderr)
-            sys.exit(1)
-
+    output_path, fmt = resolve_output(args.filename, args.format)
+    try:
+        image_saved = generate_image(
+            client,
+            types,
+            args.prompt,
+            inputs,
+            output_resolution,
+            output_path,
+            fmt,
+            cache=cache,
+            stream=args.stream,
+        )
     except Exception as e:
         print(f"Error generating image: {e}", file=sys.stderr)
         sys.exit(1)
 
+    if image_saved:
+        if result_key:
+            result_cache.store(result_key, output_path)
+        full_path = output_path.resolve()
+        print(f"\nImage saved: {full_path}")
+        # OpenClaw parses MEDIA tokens and will attach the file on supported providers.
+        print(f"MEDIA: {full_path}")
+    else:
+        print("Error: No image was generated in the response.", file=sys.stderr)
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
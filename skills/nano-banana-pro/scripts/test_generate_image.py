@@ -0,0 +1,465 @@
+"""Tests for generate_image.py: probing, caches, batch, worker and streaming modes."""
+
+import io
+import json
+import os
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import generate_image
+import pytest
+from generate_image import (
+    InputCache,
+    ResultCache,
+    auto_resolution,
+    is_plain_rgb,
+    prepare_inputs,
+    probe_image_size,
+    read_batch_manifest,
+    resolve_output,
+    run_batch,
+    run_item,
+    save_image,
+    send_to_worker,
+    serve_worker,
+)
+from generate_image import generate_image as generate
+
+
+def _write(tmpdir: str, name: str, data: bytes) -> str:
+    path = Path(tmpdir) / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def _rgb_png(tag: bytes = b"") -> bytes:
+    """Header-only RGB PNG: saved through the raw path, so no PIL is needed."""
+    ihdr = struct.pack(">IIBBBBB", 8, 8, 8, 2, 0, 0, 0)
+    header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + ihdr
+    return header + b"\x00" * 4 + b"IDAT" + tag
+
+
+def test_probe_png_gif_and_webp_headers():
+    png = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 4000, 3000)
+    gif = b"GIF89a" + struct.pack("<HH", 640, 480) + b"\x00" * 8
+    vp8 = b"RIFF\x00\x00\x00\x00WEBPVP8 \x00\x00\x00\x00" + b"\x00\x00\x00\x9d\x01\x2a"
+    vp8 += struct.pack("<HH", 1920, 1080)
+    vp8l_bits = (1199) | (799 << 14)
+    vp8l = b"RIFF\x00\x00\x00\x00WEBPVP8L\x00\x00\x00\x00\x2f" + vp8l_bits.to_bytes(4, "little")
+    vp8l += b"\x00" * 8
+    vp8x = b"RIFF\x00\x00\x00\x00WEBPVP8X" + b"\x0a\x00\x00\x00" + b"\x10\x00\x00\x00"
+    vp8x += (4095).to_bytes(3, "little") + (2047).to_bytes(3, "little")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        assert probe_image_size(_write(tmpdir, "a.png", png)) == ("PNG", 4000, 3000)
+        assert probe_image_size(_write(tmpdir, "b.gif", gif)) == ("GIF", 640, 480)
+        assert probe_image_size(_write(tmpdir, "c.webp", vp8)) == ("WEBP", 1920, 1080)
+        assert probe_image_size(_write(tmpdir, "d.webp", vp8l)) == ("WEBP", 1200, 800)
+        assert probe_image_size(_write(tmpdir, "e.webp", vp8x)) == ("WEBP", 4096, 2048)
+        assert probe_image_size(_write(tmpdir, "f.txt", b"not an image")) is None
+
+
+def test_probe_jpeg_skips_large_exif_segment():
+    app1 = b"\xff\xe1" + struct.pack(">H", 60002) + b"Exif\x00\x00" + b"\x00" * 59994
+    sof2 = b"\xff\xc2" + struct.pack(">HBHH", 17, 8, 3024, 4032) + b"\x00" * 10
+    jpeg = b"\xff\xd8" + app1 + b"\xff\xff" + sof2 + b"\xff\xd9"
+    with tempfile.TemporaryDirectory() as tmpdir:
+        assert probe_image_size(_write(tmpdir, "photo.jpg", jpeg)) == ("JPEG", 4032, 3024)
+        assert probe_image_size(_write(tmpdir, "cut.jpg", jpeg[:1000])) is None
+
+
+def test_auto_resolution_thresholds():
+    assert [auto_resolution(dim) for dim in (800, 1500, 2999, 3000)] == ["1K", "2K", "2K", "4K"]
+
+
+def test_read_batch_manifest_reports_bad_lines():
+    lines = [
+        '{"prompt": "a fox", "filename": "out/fox.png", "inputs": "fox.jpg"}',
+        "",
+        '{"prompt": "no filename"}',
+        "not json",
+        '{"prompt": "owl", "filename": "owl.png", "resolution": "8K"}',
+        '{"prompt": "owl", "filename": "owl.png", "resolution": "2K"}',
+        '{"prompt": "owl", "filename": "owl.png", "inputs": 5}',
+        '{"prompt": "owl", "filename": 7}',
+        '{"prompt": "owl", "filename": "owl.png", "inputs": ["a.png", null]}',
+    ]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        items = read_batch_manifest(_write(tmpdir, "jobs.jsonl", "\n".join(lines).encode()))
+
+    assert items[0] == {
+        "prompt": "a fox",
+        "filename": "out/fox.png",
+        "inputs": ["fox.jpg"],
+        "line": 1,
+    }
+    assert [item["line"] for item in items] == [1, 3, 4, 5, 6, 7, 8, 9]
+    assert "required" in items[1]["error"]
+    assert items[2]["error"].startswith("line 4:")
+    assert "8K" in items[3]["error"]
+    assert "error" not in items[4]
+    assert "list of paths" in items[5]["error"] and "list of paths" in items[7]["error"]
+    assert "must be strings" in items[6]["error"]
+
+
+def test_run_batch_shares_one_client_and_isolates_failures():
+    image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    image.new("RGB", (8, 8), (200, 10, 10)).save(buffer, "PNG")
+    calls = []
+
+    def generate_content(model, contents, config):
+        prompt = contents if isinstance(contents, str) else contents[-1]
+        calls.append((prompt, config.image_config.image_size))
+        if prompt == "boom":
+            raise RuntimeError("quota exceeded")
+        part = SimpleNamespace(text=None, inline_data=SimpleNamespace(data=buffer.getvalue()))
+        return SimpleNamespace(parts=[SimpleNamespace(text="ok", inline_data=None), part])
+
+    client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+    types = SimpleNamespace(
+        Part=SimpleNamespace(from_bytes=lambda data, mime_type: (mime_type, len(data))),
+        GenerateContentConfig=lambda **kwargs: SimpleNamespace(**kwargs),
+        ImageConfig=lambda **kwargs: SimpleNamespace(**kwargs),
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        items = [
+            {"prompt": "cat", "filename": f"{tmpdir}/cat.png", "inputs": [], "line": 1},
+            {"prompt": "boom", "filename": f"{tmpdir}/boom.png", "inputs": [], "line": 2},
+            {"error": "line 3: bad", "line": 3},
+            {
+                "prompt": "dog",
+                "filename": f"{tmpdir}/d/dog.png",
+                "inputs": [],
+                "line": 4,
+                "resolution": "2K",
+            },
+        ]
+        results = run_batch(client, types, items, concurrency=2, downscale=True)
+        assert Path(tmpdir, "d", "dog.png").is_file()
+
+    assert [("error" in result) for result in results] == [False, True, True, False]
+    assert results[1]["error"] == "quota exceeded"
+    assert sorted(calls) == [("boom", "1K"), ("cat", "1K"), ("dog", "2K")]
+
+
+def test_resolve_output_follows_suffix_or_format():
+    assert resolve_output("out/a.png", None) == (Path("out/a.png"), "png")
+    assert resolve_output("a.JPG", None) == (Path("a.JPG"), "jpeg")
+    assert resolve_output("a", None) == (Path("a"), "png")
+    assert resolve_output("a.png", "webp") == (Path("a.webp"), "webp")
+    assert resolve_output("a.jpeg", "jpeg") == (Path("a.jpeg"), "jpeg")
+
+
+def test_save_image_writes_matching_rgb_bytes_without_decoding():
+    # Header-only fakes: decoding them would fail, so this proves the raw fast path.
+    ihdr = struct.pack(">IIBBBBB", 8, 8, 8, 2, 0, 0, 0)
+    rgb_png = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + ihdr + b"\x00" * 4
+    rgb_png += struct.pack(">I", 16) + b"IDAT" + b"\x00" * 16
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+
+    def jpeg(components):
+        sof0 = b"\xff\xc0" + struct.pack(">HBHHB", 8 + 3 * components, 8, 8, 8, components)
+        return b"\xff\xd8" + app0 + sof0 + b"\x00" * 3 * components + b"\x00" * 16
+
+    # Grayscale and CMYK JPEGs still need converting to RGB.
+    assert [is_plain_rgb(jpeg(n), "jpeg") for n in (1, 3, 4)] == [False, True, False]
+    assert not is_plain_rgb(b"\xff\xd8\xff\xe0" + b"\x00" * 32, "jpeg")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir)
+        assert save_image(rgb_png, out / "a.png", "png") is False
+        assert (out / "a.png").read_bytes() == rgb_png
+        assert save_image(jpeg(3), out / "b.jpg", "jpeg") is False
+        assert (out / "b.jpg").read_bytes() == jpeg(3)
+
+
+def test_save_image_flattens_alpha_onto_white():
+    image = pytest.importorskip("PIL.Image")
+
+    def encode(img, fmt):
+        buffer = io.BytesIO()
+        img.save(buffer, fmt)
+        return buffer.getvalue()
+
+    transparent = image.new("RGBA", (4, 4), (255, 0, 0, 255))
+    transparent.putpixel((0, 0), (0, 0, 0, 0))
+    opaque = image.new("RGBA", (4, 4), (0, 0, 255, 255))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir)
+        assert save_image(encode(transparent, "PNG"), out / "t.png", "png") is True
+        with image.open(out / "t.png") as saved:
+            assert saved.mode == "RGB"
+            assert saved.getpixel((0, 0)) == (255, 255, 255)
+            assert saved.getpixel((1, 1)) == (255, 0, 0)
+
+        assert save_image(encode(opaque, "PNG"), out / "o.webp", "webp") is True
+        with image.open(out / "o.webp") as saved:
+            assert (saved.format, saved.mode) == ("WEBP", "RGB")
+
+        gray = image.new("L", (4, 4), 128)
+        assert save_image(encode(gray, "JPEG"), out / "g.jpg", "jpeg") is True
+        with image.open(out / "g.jpg") as saved:
+            assert (saved.format, saved.mode) == ("JPEG", "RGB")
+
+
+def test_worker_serves_requests_over_a_unix_socket(capsys):
+    png = _rgb_png()
+    prompts = []
+
+    def generate_content(model, contents, config):
+        prompts.append(contents)
+        if contents == "boom":
+            raise RuntimeError("quota exceeded")
+        part = SimpleNamespace(text=None, inline_data=SimpleNamespace(data=png))
+        return SimpleNamespace(parts=[SimpleNamespace(text="ok", inline_data=None), part])
+
+    client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+    types = SimpleNamespace(
+        GenerateContentConfig=lambda **kwargs: SimpleNamespace(**kwargs),
+        ImageConfig=lambda **kwargs: SimpleNamespace(**kwargs),
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sock = os.path.join(tmpdir, "worker.sock")
+        assert send_to_worker(sock, {"prompt": "cat", "filename": "x.png"}) is None
+
+        worker = threading.Thread(target=serve_worker, args=(sock, client, types, 2, 0.5))
+        worker.start()
+        try:
+            for _ in range(200):
+                if os.path.exists(sock):
+                    break
+                time.sleep(0.01)
+            mode = stat.S_IMODE(os.stat(sock).st_mode)
+            target = os.path.join(tmpdir, "out", "cat.png")
+            result = send_to_worker(sock, {"prompt": "cat", "filename": target})
+            failed = send_to_worker(sock, {"prompt": "boom", "filename": target})
+            invalid = send_to_worker(sock, {"prompt": "no filename"})
+        finally:
+            worker.join(timeout=10)
+
+        assert mode & 0o077 == 0
+        assert result == {"filename": target, "path": target}
+        assert Path(target).read_bytes() == png
+        assert not worker.is_alive() and not os.path.exists(sock)
+
+    assert failed["error"] == "quota exceeded"
+    assert "required" in invalid["error"]
+    assert prompts == ["cat", "boom"]
+    assert "Model response: ok" in capsys.readouterr().out
+
+
+def test_worker_refuses_to_replace_a_file_that_is_not_a_socket():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir, "photo.png")
+        path.write_bytes(b"keep me")
+        with pytest.raises(RuntimeError, match="not a socket"):
+            serve_worker(str(path), None, None, idle_timeout=0)
+        assert path.read_bytes() == b"keep me"
+
+
+def test_input_cache_skips_preprocessing_of_repeat_inputs(monkeypatch):
+    calls = []
+
+    def fake_prepare(path, max_edge):
+        calls.append((path, max_edge))
+        return path.encode().ljust(600, b"\0"), "image/jpeg", max_edge, max_edge // 2
+
+    monkeypatch.setattr(generate_image, "prepare_input", fake_prepare)
+    gif = b"GIF89a" + struct.pack("<HH", 640, 320) + b"\x00" * 8
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = InputCache(Path(tmpdir, "cache"), max_bytes=1500)
+        first, second = _write(tmpdir, "a.gif", gif), _write(tmpdir, "b.gif", gif + b"b")
+        probe = [("GIF", 640, 320)]
+        logs = []
+
+        prepared = prepare_inputs([first], probe, 512, cache=cache, log=logs.append)
+        again = prepare_inputs([first], probe, 512, cache=cache, log=logs.append)
+        assert again == prepared and calls == [(first, 512)]
+        assert logs[-1].endswith("KB image/jpeg, cached)")
+
+        prepare_inputs([first], probe, 1024, cache=cache)  # other edge: separate entry
+        prepare_inputs([second], probe, 512, cache=cache)  # over budget: LRU entry evicted
+        assert len(cache.entries()) == 2
+        prepare_inputs([first], probe, 512, cache=cache)
+        assert calls[-1] == (first, 512) and len(calls) == 4
+
+
+def test_input_cache_reuses_uploads_until_they_expire():
+    uploads = []
+    expires = {"at": datetime.now(timezone.utc) + timedelta(hours=48)}
+
+    def upload(file, config):
+        uploads.append((file.read(), config["mime_type"]))
+        return SimpleNamespace(uri=f"files/{len(uploads)}", expiration_time=expires["at"])
+
+    sent = []
+
+    def generate_content(model, contents, config):
+        sent.append(contents)
+        return SimpleNamespace(parts=[])
+
+    client = SimpleNamespace(
+        files=SimpleNamespace(upload=upload),
+        models=SimpleNamespace(generate_content=generate_content),
+    )
+    types = SimpleNamespace(
+        Part=SimpleNamespace(
+            from_bytes=lambda data, mime_type: ("inline", mime_type),
+            from_uri=lambda file_uri, mime_type: ("uri", file_uri),
+        ),
+        GenerateContentConfig=lambda **kwargs: SimpleNamespace(**kwargs),
+        ImageConfig=lambda **kwargs: SimpleNamespace(**kwargs),
+    )
+    inputs = [(b"one", "image/png"), (b"two", "image/jpeg")]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = InputCache(Path(tmpdir))
+        out = Path(tmpdir, "out.png")
+        generate(client, types, "edit", inputs, "1K", out, log=lambda _: None, cache=cache)
+        generate(client, types, "again", inputs, "1K", out, log=lambda _: None, cache=cache)
+        assert sorted(uploads) == [(b"one", "image/png"), (b"two", "image/jpeg")]
+        assert sent[1] == sent[0][:2] + ["again"]
+
+        # Close to expiry: uploaded again rather than referenced.
+        record = next(Path(tmpdir, "uploads").glob("*.json"))
+        stale = dict(json.loads(record.read_text()), expires=time.time() + 60)
+        record.write_text(json.dumps(stale))
+        generate(client, types, "third", inputs, "1K", out, log=lambda _: None, cache=cache)
+        assert len(uploads) == 3
+
+        # Files belong to the uploading key's project: another key uploads its own copy.
+        other_key = InputCache(Path(tmpdir), api_key="other-key")
+        quiet = dict(log=lambda _: None, cache=other_key)
+        generate(client, types, "fourth", inputs[:1], "1K", out, **quiet)
+        assert len(uploads) == 4
+
+        # A URI the backend rejects is dropped and the request retried inline once.
+        def reject_uris(model, contents, config):
+            sent.append(contents)
+            if any(part[0] == "uri" for part in contents[:-1]):
+                raise RuntimeError("403 PERMISSION_DENIED: file not accessible")
+            return SimpleNamespace(parts=[])
+
+        client.models.generate_content = reject_uris
+        logs = []
+        generate(client, types, "fifth", inputs, "1K", out, log=logs.append, cache=cache)
+        assert sent[-1] == [("inline", "image/png"), ("inline", "image/jpeg"), "fifth"]
+        assert any("retrying inline" in line for line in logs)
+        assert len(list(Path(tmpdir, "uploads").glob("*.json"))) == 1  # only other_key's
+
+    def unsupported(file, config):
+        raise ValueError("This method is only supported in the Gemini Developer client.")
+
+    client.files.upload = unsupported
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = InputCache(Path(tmpdir))
+        logs = []
+        generate(client, types, "vertex", inputs[:1], "1K", out, log=logs.append, cache=cache)
+    assert sent[-1] == [("inline", "image/png"), "vertex"]
+    assert not cache.uploads_supported
+    assert any("Files API unavailable" in line for line in logs)
+
+
+def test_stream_saves_images_as_chunks_arrive_and_skips_thoughts():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir, "out", "final.png")
+        seen_on_disk = []
+        logs = []
+        logged_before_final = []
+
+        def log(message, end="\n"):
+            logs.append((message, end))
+
+        def image(data, thought=None):
+            inline_data = SimpleNamespace(data=data)
+            return SimpleNamespace(text=None, inline_data=inline_data, thought=thought)
+
+        def generate_content_stream(model, contents, config):
+            yield SimpleNamespace(parts=[SimpleNamespace(text="Sketching ", inline_data=None)])
+            yield SimpleNamespace(parts=[image(_rgb_png(b"draft"), thought=True)])
+            seen_on_disk.append(out.exists())
+            yield SimpleNamespace(parts=None)
+            logged_before_final.extend(logs)
+            yield SimpleNamespace(parts=[image(_rgb_png(b"final"))])
+            seen_on_disk.append(out.read_bytes())
+            yield SimpleNamespace(parts=[SimpleNamespace(text="done.", inline_data=None)])
+
+        client = SimpleNamespace(
+            models=SimpleNamespace(generate_content_stream=generate_content_stream)
+        )
+        types = SimpleNamespace(
+            GenerateContentConfig=lambda **kwargs: SimpleNamespace(**kwargs),
+            ImageConfig=lambda **kwargs: SimpleNamespace(**kwargs),
+        )
+        assert generate(client, types, "owl", [], "1K", out, log=log, stream=True)
+
+    assert seen_on_disk == [False, _rgb_png(b"final")]
+    # Text is written as it arrives, ahead of the final image, with one prefix per response.
+    assert logged_before_final[1:] == [("Model response: Sketching ", "")]
+    assert logs[1:] == [("Model response: Sketching ", ""), ("done.", ""), ("", "\n")]
+
+
+def test_result_cache_reuses_images_until_refreshed_or_inputs_change():
+    generated = []
+
+    def generate_content(model, contents, config):
+        generated.append(contents)
+        data = _rgb_png(str(len(generated)).encode())
+        part = SimpleNamespace(text=None, inline_data=SimpleNamespace(data=data))
+        return SimpleNamespace(parts=[part])
+
+    client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+    types = SimpleNamespace(
+        Part=SimpleNamespace(from_bytes=lambda data, mime_type: (mime_type, data)),
+        GenerateContentConfig=lambda **kwargs: SimpleNamespace(**kwargs),
+        ImageConfig=lambda **kwargs: SimpleNamespace(**kwargs),
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = _write(tmpdir, "in.png", _rgb_png(b"source"))
+        target = str(Path(tmpdir, "out.png"))
+        item = {"prompt": "owl", "filename": target, "inputs": [source]}
+        results = ResultCache(Path(tmpdir, "results"), max_bytes=1 << 20)
+
+        def run(cache=results):
+            logs = []
+            result = run_item(client, types, item, True, log=logs.append, results=cache)
+            return result, Path(target).read_bytes(), logs
+
+        first = run()
+        hit = run()
+        assert hit[0] == first[0] and hit[1] == _rgb_png(b"1") and len(generated) == 1
+        assert hit[2] == ["Reusing cached result (pass --no-cache to regenerate)."]
+
+        refreshed = run(ResultCache(results.root, results.max_bytes, reuse=False))
+        assert refreshed[1] == _rgb_png(b"2") and run()[1] == _rgb_png(b"2")
+
+        Path(source).write_bytes(_rgb_png(b"edited"))
+        assert run()[1] == _rgb_png(b"3") and len(generated) == 3
+        assert len(results.entries()) == 2
+
+        # The CLI serves a hit without an API key or the SDK installed.
+        key = results.item_key(item, "png", True)
+        assert key and results.path(key).is_file()
+        env = dict(os.environ, GEMINI_API_KEY="", NANO_BANANA_CACHE="1")
+        proc = subprocess.run(
+            [
+                sys.executable,
+                str(Path(generate_image.__file__)),
+                "--prompt", "owl", "--filename", "copy.png", "-i", source,
+                "--cache-dir", tmpdir, "--cache-max-mb", "1",
+            ],
+            cwd=tmpdir,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        assert proc.returncode == 0, proc.stderr
+        assert f"MEDIA: {Path(tmpdir, 'copy.png').resolve()}" in proc.stdout
+        assert Path(tmpdir, "copy.png").read_bytes() == _rgb_png(b"3")
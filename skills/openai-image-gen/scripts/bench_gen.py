@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark gen.py end to end against the bundled mock Images API.
+
+Each batch runs gen.py in a subprocess and reports images/minute, the child's
+peak RSS and the time to rebuild the gallery for the finished run.
+
+Usage:
+    python bench_gen.py --counts 10,100,1000 --latency 0.5 --payload-kb 1500
+    python bench_gen.py --mode url --max-in-flight 4 --concurrency 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from gen import write_gallery
+
+HERE = Path(__file__).resolve().parent
+
+
+def start_mock(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    cmd = [
+        sys.executable,
+        str(HERE / "mock_images_api.py"),
+        "--port",
+        "0",
+        "--mode",
+        args.mode,
+        "--latency",
+        str(args.latency),
+        "--jitter",
+        str(args.jitter),
+        "--payload-kb",
+        str(args.payload_kb),
+        "--error-rate",
+        str(args.error_rate),
+        "--max-in-flight",
+        str(args.max_in_flight),
+        "--retry-after",
+        str(args.retry_after),
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    base_url = proc.stdout.readline().strip()
+    if not base_url:
+        raise SystemExit("mock server failed to start")
+    return proc, base_url
+
+
+def run_gen(count: int, base_url: str, out_dir: Path, extra: list[str]) -> tuple[float, float, int]:
+    """Run one gen.py batch; returns (seconds, peak RSS in MiB, exit code)."""
+    env = dict(os.environ, OPENAI_API_KEY="mock", OPENAI_BASE_URL=base_url)
+    cmd = [
+        sys.executable,
+        str(HERE / "gen.py"),
+        "--count",
+        str(count),
+        "--out-dir",
+        str(out_dir),
+        "--no-cache",
+        *extra,
+    ]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    rss_mib = usage.ru_maxrss / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+    return elapsed, rss_mib, proc.returncode
+
+
+def gallery_ms(out_dir: Path, runs: int = 3) -> float:
+    items = json.loads((out_dir / "prompts.json").read_text(encoding="utf-8"))
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        write_gallery(out_dir, items)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark gen.py against a mock Images API.")
+    parser.add_argument("--counts", default="10,100,1000", help="Comma-separated batch sizes.")
+    parser.add_argument("--mode", choices=["b64", "url"], default="b64")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--payload-kb", type=int, default=1024)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-in-flight", type=int, default=0)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--download-workers", type=int, default=4, help="Pooled downloads (url).")
+    parser.add_argument("--prompt", default="", help="Fixed prompt, so requests batch with n>1.")
+    parser.add_argument("--thumbs", action="store_true", help="Also render thumbnails.")
+    args = parser.parse_args()
+
+    extra = ["--concurrency", str(args.concurrency), "--max-concurrency", str(args.max_concurrency)]
+    extra += ["--download-workers", str(args.download_workers)]
+    if args.prompt:
+        extra += ["--prompt", args.prompt]
+    if not args.thumbs:
+        extra.append("--no-thumbs")
+
+    mock, base_url = start_mock(args)
+    print(f"mock: {base_url} mode={args.mode} latency={args.latency}s payload={args.payload_kb} KiB")
+    print(f"{'images':>7} {'seconds':>9} {'images/min':>11} {'peak RSS':>12} {'gallery':>10}  exit")
+    try:
+        for count in (int(value) for value in args.counts.split(",") if value.strip()):
+            with tempfile.TemporaryDirectory(prefix="bench-gen-") as tmpdir:
+                out_dir = Path(tmpdir)
+                elapsed, rss_mib, code = run_gen(count, base_url, out_dir, extra)
+                gallery = gallery_ms(out_dir) if (out_dir / "prompts.json").is_file() else 0.0
+            print(
+                f"{count:>7} {elapsed:>9.2f} {count / elapsed * 60:>11.0f}"
+                f" {rss_mib:>8.1f} MiB {gallery:>7.1f} ms  {code}"
+            )
+    finally:
+        mock.terminate()
+        stats = mock.communicate(timeout=10)[0].strip()
+    print(f"mock stats: {stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
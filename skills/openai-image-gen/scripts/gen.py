@@ -1,14 +1,25 @@
 #!/usr/bin/env python3
 import argparse
 import base64
+import binascii
+import bisect
 import datetime as dt
+import email.utils
+import hashlib
+import http.client
+import importlib.util
 import json
 import os
 import random
 import re
+import shutil
 import sys
+import threading
+import time
 import urllib.error
+import urllib.parse
 import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
 from html import escape as html_escape
 from pathlib import Path
 
@@ -75,6 +86,16 @@ def get_model_defaults(model: str) -> tuple[str, str]:
         return ("1024x1024", "high")
 
 
+def max_images_per_request(model: str) -> int:
+    """Largest `n` the Images API accepts for the model (dall-e-3 only supports 1)."""
+    if model == "dall-e-3":
+        return 1
+    return 10
+
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+
 def request_images(
     api_key: str,
     prompt: str,
@@ -84,13 +105,16 @@ def request_images(
     background: str = "",
     output_format: str = "",
     style: str = "",
+    n: int = 1,
+    open_sink=None,
+    base_url: str = DEFAULT_BASE_URL,
 ) -> dict:
-    url = "https://api.openai.com/v1/images/generations"
+    url = f"{base_url.rstrip('/')}/images/generations"
     args = {
         "model": model,
         "prompt": prompt,
         "size": size,
-        "n": 1,
+        "n": n,
     }
 
     # Quality parameter - dall-e-2 doesn't accept this parameter
@@ -121,24 +145,775 @@ def request_images(
     )
     try:
         with urllib.request.urlopen(req, timeout=300) as resp:
+            if open_sink is not None:
+                return read_images_response(resp, open_sink)
             return json.loads(resp.read().decode("utf-8"))
     except urllib.error.HTTPError as e:
         payload = e.read().decode("utf-8", errors="replace")
-        raise RuntimeError(f"OpenAI Images API failed ({e.code}): {payload}") from e
+        raise ImagesAPIError(
+            f"OpenAI Images API failed ({e.code}): {payload}",
+            status=e.code,
+            retry_after=parse_retry_after(e.headers),
+            retryable=e.code in RETRYABLE_STATUS and "insufficient_quota" not in payload,
+        ) from e
+    except (OSError, http.client.HTTPException) as e:
+        raise ImagesAPIError(f"OpenAI Images API request failed: {e}", retryable=True) from e
+
+
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class ImagesAPIError(RuntimeError):
+    """A failed Images API call, with what the scheduler needs to decide on a retry."""
+
+    def __init__(
+        self,
+        message: str,
+        status: int | None = None,
+        retry_after: float | None = None,
+        retryable: bool = False,
+    ) -> None:
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+
+def parse_retry_after(headers) -> float | None:
+    """Seconds to wait from retry-after-ms or Retry-After (delta seconds or HTTP date)."""
+    if headers is None:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=dt.timezone.utc)
+    return max(0.0, (when - dt.datetime.now(dt.timezone.utc)).total_seconds())
+
+
+class _Base64Writer:
+    """Decode base64 text fed in arbitrary slices into a binary file."""
+
+    def __init__(self, handle) -> None:
+        self.handle = handle
+        self.pending = b""
+
+    def feed(self, data: bytes) -> None:
+        data = self.pending + data
+        if b"\\" in data:
+            # JSON may escape "/" as "\/" or wrap long strings with "\n".
+            data = data.replace(b"\\/", b"/").replace(b"\\n", b"").replace(b"\\r", b"")
+        usable = len(data) - len(data) % 4
+        if data.endswith(b"\\"):
+            usable = min(usable, (len(data) - 1) // 4 * 4)
+        if usable:
+            self.handle.write(binascii.a2b_base64(data[:usable]))
+        self.pending = data[usable:]
+
+    def close(self) -> None:
+        try:
+            if self.pending:
+                self.handle.write(binascii.a2b_base64(self.pending))
+        finally:
+            self.handle.close()
+
+
+_B64_KEY = b"b64_json"
+_WHITESPACE = frozenset(b" \t\r\n")
+
+
+def read_images_response(stream, open_sink, chunk_size: int = 1 << 16) -> dict:
+    """Parse an Images API JSON body without holding b64_json payloads in memory.
+
+    Every "b64_json" string is decoded chunk by chunk into the binary file returned
+    by open_sink(k), k counting from 0, and replaced by the int k in the result.
+    The rest of the body (URLs, revised prompts, usage) is small and goes to json.loads.
+    """
+    skeleton = bytearray()
+    token = bytearray()
+    in_string = escaped = False
+    after_key = before_value = False
+    writer = None
+    count = 0
+    try:
+        while chunk := stream.read(chunk_size):
+            pos = 0
+            size = len(chunk)
+            while pos < size:
+                if writer is not None:
+                    end = chunk.find(b'"', pos)
+                    writer.feed(chunk[pos : size if end < 0 else end])
+                    if end < 0:
+                        break
+                    writer.close()
+                    writer = None
+                    pos = end + 1
+                    continue
+                byte = chunk[pos]
+                pos += 1
+                if in_string:
+                    skeleton.append(byte)
+                    if escaped:
+                        escaped = False
+                    elif byte == 0x5C:
+                        escaped = True
+                    elif byte == 0x22:
+                        in_string = False
+                        after_key = token == _B64_KEY
+                    elif len(token) <= len(_B64_KEY):
+                        token.append(byte)
+                    continue
+                if byte in _WHITESPACE:
+                    continue
+                if byte == 0x22 and before_value:
+                    skeleton += str(count).encode()
+                    writer = _Base64Writer(open_sink(count))
+                    count += 1
+                    before_value = False
+                    continue
+                before_value = after_key and byte == 0x3A
+                after_key = False
+                skeleton.append(byte)
+                if byte == 0x22:
+                    in_string = True
+                    token.clear()
+        if writer is not None:
+            raise RuntimeError("Images API response ended inside b64_json")
+    finally:
+        if writer is not None:
+            writer.handle.close()
+    return json.loads(skeleton)
+
+
+class RateLimiter:
+    """Spaces out request starts so at most `per_minute` begin in any minute."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RequestScheduler:
+    """Run API calls with retries, an optional RPM cap, and AIMD concurrency.
+
+    Requests in flight start at `concurrency` and grow by about one slot per
+    window of successes, up to `max_concurrency`. A 429 halves the limit (once per
+    window, so a burst of 429s from requests already in flight counts once) and,
+    when the server sends Retry-After, holds back every new request until then.
+    Other retryable failures back off with full jitter.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 1,
+        max_concurrency: int = 0,
+        max_rpm: float = 0,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+    ) -> None:
+        self.max_concurrency = max(1, concurrency, max_concurrency)
+        self.limit = float(max(1, concurrency))
+        self.rate = RateLimiter(max_rpm)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.in_flight = 0
+        self.resume_at = 0.0
+        self.last_cut = 0.0
+        self.cond = threading.Condition()
+
+    def acquire(self) -> float:
+        with self.cond:
+            while True:
+                wait = self.resume_at - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    break
+                self.cond.wait(wait if wait > 0 else None)
+            self.in_flight += 1
+        self.rate.acquire()
+        return time.monotonic()
+
+    def release(self, started: float, outcome: str, retry_after: float | None = None) -> None:
+        with self.cond:
+            self.in_flight -= 1
+            if outcome == "ok":
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            elif outcome == "throttled":
+                if started >= self.last_cut:
+                    self.limit = max(1.0, self.limit / 2)
+                    self.last_cut = time.monotonic()
+                if retry_after:
+                    self.resume_at = max(self.resume_at, time.monotonic() + retry_after)
+            self.cond.notify_all()
+
+    def backoff(self, attempt: int, error: ImagesAPIError) -> float:
+        if error.retry_after is not None:
+            return error.retry_after + random.uniform(0, self.backoff_base / 4)
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2**attempt))
+
+    def call(self, fn, label: str = ""):
+        attempt = 0
+        while True:
+            started = self.acquire()
+            try:
+                result = fn()
+            except ImagesAPIError as e:
+                throttled = e.status == 429
+                self.release(started, "throttled" if throttled else "error", e.retry_after)
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt, e)
+                attempt += 1
+                print(
+                    f"{label} retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                    f" (limit {int(self.limit)} in flight): {e}",
+                    file=sys.stderr,
+                    flush=True,
+                )
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self.release(started, "error")
+                raise
+            self.release(started, "ok")
+            return result
+
+
+def plan_batches(jobs: list[tuple[int, str]], max_n: int) -> list[tuple[str, list[int]]]:
+    """Group (1-based index, prompt) jobs into (prompt, [indices]) requests of at most max_n."""
+    groups: dict[str, list[int]] = {}
+    for idx, prompt in jobs:
+        groups.setdefault(prompt, []).append(idx)
+    batches = [
+        (prompt, indices[start : start + max_n])
+        for prompt, indices in groups.items()
+        for start in range(0, len(indices), max(1, max_n))
+    ]
+    return sorted(batches, key=lambda batch: batch[1][0])
+
+
+def image_filename(idx: int, prompt: str, file_ext: str) -> str:
+    return f"{idx:03d}-{slugify(prompt)[:40]}.{file_ext}"
+
+
+def write_image(data: dict, filepath: Path, parts: dict[int, Path] | None = None) -> None:
+    image_b64 = data.get("b64_json")
+    image_url = data.get("url")
+    if isinstance(image_b64, int) and not isinstance(image_b64, bool):
+        # Already decoded to disk by read_images_response.
+        os.replace(parts[image_b64], filepath)
+    elif image_b64:
+        filepath.write_bytes(base64.b64decode(image_b64))
+    elif image_url:
+        # Callers without a pool still get the Downloader's size and timeout limits.
+        downloader = Downloader(workers=1)
+        try:
+            downloader.download(image_url, filepath)
+        finally:
+            downloader.close()
+    else:
+        raise RuntimeError(f"Unexpected response item: {json.dumps(data)[:400]}")
+
+
+class Downloader:
+    """Fetch result URLs on a thread pool, reusing one keep-alive connection per host and thread.
+
+    Each body is streamed to a .part file and only renamed into place once its
+    size matches Content-Length and stays under max_bytes. The thread pool is
+    started by the first submit(), so runs that only get b64_json never start it.
+    """
+
+    def __init__(self, workers: int = 4, max_bytes: int = 64 << 20, timeout: float = 120) -> None:
+        self.workers = max(1, workers)
+        self.pool: ThreadPoolExecutor | None = None
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections: list[http.client.HTTPConnection] = []
+
+    def submit(self, fn, *args) -> Future:
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix="download")
+            return self.pool.submit(fn, *args)
+
+    def connection(self, scheme: str, netloc: str) -> tuple[http.client.HTTPConnection, bool]:
+        """Return (connection, reused) for this thread."""
+        pool = self.local.__dict__.setdefault("connections", {})
+        conn = pool.get((scheme, netloc))
+        if conn is not None:
+            return conn, True
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        conn = cls(netloc, timeout=self.timeout)
+        pool[(scheme, netloc)] = conn
+        with self.lock:
+            self.connections.append(conn)
+        return conn, False
+
+    def discard(self, scheme: str, netloc: str) -> None:
+        conn = self.local.__dict__.get("connections", {}).pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def open(self, url: str, redirects: int = 5) -> tuple[http.client.HTTPResponse, tuple]:
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise RuntimeError(f"Unsupported image URL: {url}")
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        key = (parts.scheme, parts.netloc)
+        while True:
+            conn, reused = self.connection(*key)
+            try:
+                conn.request("GET", target, headers={"Accept-Encoding": "identity"})
+                resp = conn.getresponse()
+                break
+            except (OSError, http.client.HTTPException):
+                self.discard(*key)
+                if not reused:
+                    raise
+                # The server closed an idle keep-alive connection; retry on a fresh one.
+        if resp.status in (301, 302, 303, 307, 308) and resp.getheader("Location") and redirects:
+            resp.read()
+            return self.open(urllib.parse.urljoin(url, resp.getheader("Location")), redirects - 1)
+        return resp, key
+
+    def download(self, url: str, dest: Path) -> int:
+        try:
+            resp, key = self.open(url)
+        except (OSError, http.client.HTTPException) as e:
+            raise RuntimeError(f"Failed to download image from {url}: {e}") from e
+        tmp = dest.with_name(f".{dest.name}.part")
+        written = 0
+        try:
+            if resp.status != 200:
+                raise RuntimeError(f"Failed to download image from {url}: HTTP {resp.status}")
+            length = resp.getheader("Content-Length")
+            expected = int(length) if length and length.isdigit() else None
+            if expected is not None and expected > self.max_bytes:
+                raise RuntimeError(f"Image at {url} is {expected} bytes (limit {self.max_bytes})")
+            with tmp.open("wb") as handle:
+                while chunk := resp.read(1 << 16):
+                    written += len(chunk)
+                    if written > self.max_bytes:
+                        raise RuntimeError(f"Image at {url} exceeds {self.max_bytes} bytes")
+                    handle.write(chunk)
+            if expected is not None and written != expected:
+                raise RuntimeError(f"Truncated image from {url}: {written} of {expected} bytes")
+            if not written:
+                raise RuntimeError(f"Empty image from {url}")
+            os.replace(tmp, dest)
+        except BaseException as e:
+            tmp.unlink(missing_ok=True)
+            self.discard(*key)  # the body may be half-read; don't reuse the connection
+            if isinstance(e, (OSError, http.client.HTTPException)):
+                raise RuntimeError(f"Failed to download image from {url}: {e}") from e
+            raise
+        if resp.will_close:
+            self.discard(*key)
+        return written
+
+    def close(self) -> None:
+        with self.lock:
+            pool = self.pool
+        if pool is not None:
+            pool.shutdown(wait=True)
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections.clear()
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "openai-image-gen"
+
+
+def copy_atomic(src: Path, dest: Path) -> None:
+    tmp = dest.with_name(f".{dest.name}.tmp")
+    tmp.unlink(missing_ok=True)
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+class ImageCache:
+    """Content-addressed store of generated images, evicted least-recently-used first.
+
+    Entries are keyed on the full request (minus the API key) plus a slot, the
+    occurrence number of the prompt within a run, so `--count 4` of one prompt
+    caches four distinct images. Hits are copied into out_dir, never hardlinked,
+    so editing an output in place cannot change the cached image.
+    """
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total: int | None = None
+
+    @staticmethod
+    def key(prompt: str, request_args: dict) -> str:
+        fields = {k: v for k, v in request_args.items() if k != "api_key"}
+        fields["prompt"] = prompt
+        blob = json.dumps(fields, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(blob).hexdigest()
+
+    def path(self, key: str, slot: int) -> Path:
+        return self.root / key[:2] / f"{key}-{slot}"
+
+    def fetch(self, key: str, slot: int, dest: Path) -> bool:
+        entry = self.path(key, slot)
+        try:
+            copy_atomic(entry, dest)
+            os.utime(entry)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def store(self, key: str, slot: int, src: Path) -> None:
+        entry = self.path(key, slot)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        copy_atomic(src, entry)
+        with self.lock:
+            if self.total is None:
+                self.total = sum(size for _, size, _ in self.entries())
+            else:
+                self.total += entry.stat().st_size
+            if self.total > self.max_bytes:
+                self.evict()
+
+    def entries(self) -> list[tuple[float, int, Path]]:
+        found = []
+        for entry in self.root.glob("??/*"):
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            found.append((st.st_mtime, st.st_size, entry))
+        return found
+
+    def evict(self) -> None:
+        entries = sorted(self.entries())
+        self.total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if self.total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            self.total -= size
+
+
+def generate_batch(
+    prompt: str,
+    indices: list[int],
+    out_dir: Path,
+    file_ext: str,
+    request_args: dict,
+    scheduler: RequestScheduler,
+    downloader: Downloader | None = None,
+) -> list[tuple[int, dict | Future]]:
+    """Request len(indices) images of one prompt in a single call (retried by scheduler).
+
+    Writes each as {idx:03d}-<slug>.<ext> and returns (idx, item) pairs, where
+    item is a gallery entry or, for images that failed, carries an "error".
+    With a downloader, URL results come back as Futures of that item instead.
+    """
+
+    def download(url: str, idx: int, filename: str) -> dict:
+        try:
+            downloader.download(url, out_dir / filename)
+        except Exception as e:
+            return {"prompt": prompt, "index": idx, "error": str(e)}
+        return {"prompt": prompt, "file": filename}
+
+    # Keyed by sink index: a retried attempt reopens the same paths from 0.
+    parts: dict[int, Path] = {}
+
+    def open_part(k: int):
+        part = out_dir / f".{indices[0]:03d}-{k}.part"
+        parts[k] = part
+        return part.open("wb")
+
+    label = f"[{indices[0]}]"
+    try:
+        res = scheduler.call(
+            lambda: request_images(
+                prompt=prompt, n=len(indices), open_sink=open_part, **request_args
+            ),
+            label,
+        )
+        data = res.get("data") or []
+        if not data:
+            raise RuntimeError(f"Unexpected response: {json.dumps(res)[:400]}")
+
+        results: list[tuple[int, dict]] = []
+        for pos, idx in enumerate(indices):
+            if pos >= len(data):
+                error = f"API returned {len(data)} of {len(indices)} images"
+                results.append((idx, {"prompt": prompt, "index": idx, "error": error}))
+                continue
+            filename = image_filename(idx, prompt, file_ext)
+            url = data[pos].get("url")
+            if downloader is not None and url and not data[pos].get("b64_json"):
+                results.append((idx, downloader.submit(download, url, idx, filename)))
+                continue
+            try:
+                write_image(data[pos], out_dir / filename, parts)
+            except Exception as e:
+                results.append((idx, {"prompt": prompt, "index": idx, "error": str(e)}))
+                continue
+            results.append((idx, {"prompt": prompt, "file": filename}))
+        return results
+    finally:
+        for part in parts.values():
+            part.unlink(missing_ok=True)
+
+
+def generate_all(
+    prompts: list[str],
+    out_dir: Path,
+    file_ext: str,
+    request_args: dict,
+    concurrency: int = 1,
+    max_rpm: float = 0,
+    max_n: int = 1,
+    cache: ImageCache | None = None,
+    done: dict[int, dict] | None = None,
+    on_result=None,
+    max_concurrency: int = 0,
+    max_retries: int = 5,
+    download_workers: int = 4,
+) -> tuple[list[dict], list[dict]]:
+    """Generate every prompt, starting with `concurrency` requests in flight.
+
+    Concurrency then adapts to 429s up to `max_concurrency` (see RequestScheduler)
+    and retryable failures are retried up to `max_retries` times. URL results are
+    downloaded by `download_workers` threads while generation continues.
+
+    Identical prompts are grouped into requests of up to `max_n` images. With a
+    cache, hits are copied into out_dir without a request and new images are stored.
+    Indices in `done` (from a resumed run) are skipped and returned as-is, and
+    on_result(idx, result) is called from worker threads as each image finishes.
+    Returns (items, failures) in prompt order; one failed request does not stop the rest.
+    """
+    scheduler = RequestScheduler(concurrency, max_concurrency, max_rpm, max_retries)
+    downloader = Downloader(download_workers)
+    total = len(prompts)
+    finished: list[tuple[int, dict]] = list((done or {}).items())
+    slots: dict[int, tuple[str, int]] = {}
+    seen: dict[str, int] = {}
+    pending = []
+    for idx, prompt in enumerate(prompts, start=1):
+        slot = seen.get(prompt, 0)
+        seen[prompt] = slot + 1
+        if done and idx in done:
+            continue
+        if cache is not None:
+            key = cache.key(prompt, request_args)
+            filename = image_filename(idx, prompt, file_ext)
+            if cache.fetch(key, slot, out_dir / filename):
+                print(f"[{idx}/{total}] cached {prompt}", flush=True)
+                result = {"prompt": prompt, "file": filename}
+                finished.append((idx, result))
+                if on_result is not None:
+                    on_result(idx, result)
+                continue
+            slots[idx] = (key, slot)
+        pending.append((idx, prompt))
+
+    def finish(idx: int, result: dict) -> None:
+        if "error" in result:
+            print(f"[{idx}/{total}] failed: {result['error']}", file=sys.stderr, flush=True)
+        elif cache is not None:
+            try:
+                cache.store(*slots[idx], out_dir / result["file"])
+            except OSError as e:
+                print(f"[{idx}/{total}] cache store failed: {e}", file=sys.stderr, flush=True)
+        if on_result is not None:
+            on_result(idx, result)
+
+    def run(batch: tuple[str, list[int]]) -> list[tuple[int, dict | Future]]:
+        prompt, indices = batch
+        label = f"[{indices[0]}/{total}]" + (f" x{len(indices)}" if len(indices) > 1 else "")
+        print(f"{label} {prompt}", flush=True)
+        try:
+            results = generate_batch(
+                prompt, indices, out_dir, file_ext, request_args, scheduler, downloader
+            )
+        except Exception as e:
+            results = [(idx, {"prompt": prompt, "index": idx, "error": str(e)}) for idx in indices]
+        for idx, result in results:
+            if isinstance(result, Future):
+                result.add_done_callback(lambda future, idx=idx: finish(idx, future.result()))
+            else:
+                finish(idx, result)
+        return results
+
+    try:
+        with ThreadPoolExecutor(max_workers=scheduler.max_concurrency) as pool:
+            batches = list(pool.map(run, plan_batches(pending, max_n)))
+    finally:
+        downloader.close()
+    pairs = sorted(
+        [
+            *finished,
+            *(
+                (idx, result.result() if isinstance(result, Future) else result)
+                for batch in batches
+                for idx, result in batch
+            ),
+        ],
+        key=lambda pair: pair[0],
+    )
+    results = [result for _, result in pairs]
+    items = [r for r in results if "error" not in r]
+    failures = [r for r in results if "error" in r]
+    return items, failures
+
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def load_manifest(out_dir: Path) -> tuple[dict, dict[int, dict]]:
+    """Read a run's settings and the images already on disk from out_dir/manifest.jsonl."""
+    run: dict = {}
+    done: dict[int, dict] = {}
+    with (out_dir / MANIFEST_NAME).open(encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn final line from an interrupted run
+            if "run" in record:
+                run = record["run"]
+            elif "file" in record and (out_dir / record["file"]).is_file():
+                done[record["index"]] = {"prompt": record["prompt"], "file": record["file"]}
+    if not run:
+        raise RuntimeError(f"No run record in {out_dir / MANIFEST_NAME}")
+    return run, done
+
+
+THUMB_DIR = "thumbs"
+THUMB_SIZE = 384
+GALLERY_PAGE_SIZE = 100
+
+
+def thumbnail_name(filename: str) -> str:
+    return f"{THUMB_DIR}/{Path(filename).stem}.webp"
+
+
+def make_thumbnail(src: str, dest: str, size: int = THUMB_SIZE) -> None:
+    """Write a WebP thumbnail of src to dest (runs in a worker process)."""
+    from PIL import Image
+
+    with Image.open(src) as img:
+        img.draft("RGB", (size, size))  # JPEG: decode at a reduced scale
+        img.thumbnail((size, size))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if img.mode in ("LA", "PA", "P") else "RGB")
+        tmp = f"{dest}.tmp"
+        img.save(tmp, "WEBP", quality=75)
+    os.replace(tmp, dest)
 
 
-def write_gallery(out_dir: Path, items: list[dict]) -> None:
+class Thumbnailer:
+    """Render thumbnails in a process pool while generation continues."""
+
+    def __init__(self, out_dir: Path, workers: int | None = None, size: int = THUMB_SIZE) -> None:
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.out_dir = out_dir
+        self.size = size
+        (out_dir / THUMB_DIR).mkdir(exist_ok=True)
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+
+    @staticmethod
+    def available() -> bool:
+        return importlib.util.find_spec("PIL") is not None
+
+    def submit(self, filename: str, on_done) -> None:
+        thumb = thumbnail_name(filename)
+        future = self.pool.submit(
+            make_thumbnail, str(self.out_dir / filename), str(self.out_dir / thumb), self.size
+        )
+
+        def finished(future) -> None:
+            if future.exception() is not None:
+                print(f"Thumbnail failed for {filename}: {future.exception()}", file=sys.stderr)
+            else:
+                on_done(thumb)
+
+        future.add_done_callback(finished)
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True)
+
+
+def gallery_page(page: int) -> str:
+    return "index.html" if page == 1 else f"index-{page}.html"
+
+
+def write_gallery(
+    out_dir: Path, items: list[dict], page_size: int = GALLERY_PAGE_SIZE, first_page: int = 1
+) -> int:
+    """Write index.html, plus index-N.html per further page_size items; returns the page count.
+
+    Images show their "thumb" when one exists and link to the full-size file.
+    Pages before first_page are assumed current and left untouched.
+    """
+    pages = max(1, -(-len(items) // page_size))
+    for page in range(first_page, pages + 1):
+        _write_gallery_page(out_dir, items[(page - 1) * page_size : page * page_size], page, pages)
+    stale = pages + 1
+    while (out_dir / gallery_page(stale)).is_file():
+        (out_dir / gallery_page(stale)).unlink()
+        stale += 1
+    return pages
+
+
+def _write_gallery_page(out_dir: Path, items: list[dict], page: int, pages: int) -> None:
     thumbs = "\n".join(
         [
             f"""
 <figure>
-  <a href="{html_escape(it["file"], quote=True)}"><img src="{html_escape(it["file"], quote=True)}" loading="lazy" /></a>
+  <a href="{html_escape(it["file"], quote=True)}"><img src="{html_escape(it.get("thumb") or it["file"], quote=True)}" loading="lazy" decoding="async" /></a>
   <figcaption>{html_escape(it["prompt"])}</figcaption>
 </figure>
 """.strip()
             for it in items
         ]
     )
+    links = []
+    if page > 1:
+        links.append(f'<a href="{gallery_page(page - 1)}">&larr; previous</a>')
+    if page < pages:
+        links.append(f'<a href="{gallery_page(page + 1)}">next &rarr;</a>')
+    nav = f'<nav>Page {page} {" ".join(links)}</nav>' if pages > 1 else ""
     html = f"""<!doctype html>
 <meta charset="utf-8" />
 <title>openai-image-gen</title>
@@ -151,14 +926,90 @@ def write_gallery(out_dir: Path, items: list[dict]) -> None:
   img {{ width: 100%; height: auto; border-radius: 10px; display: block; }}
   figcaption {{ margin-top: 10px; color: #b7c2cc; }}
   code {{ color: #9cd1ff; }}
+  nav {{ margin: 16px 0; }}
+  nav a {{ color: #9cd1ff; margin-left: 12px; }}
 </style>
 <h1>openai-image-gen</h1>
 <p>Output: <code>{html_escape(out_dir.as_posix())}</code></p>
+{nav}
 <div class="grid">
 {thumbs}
 </div>
+{nav}
 """
-    (out_dir / "index.html").write_text(html, encoding="utf-8")
+    (out_dir / gallery_page(page)).write_text(html, encoding="utf-8")
+
+
+class RunLog:
+    """Append each finished image to manifest.jsonl and refresh the index.html gallery.
+
+    With a Thumbnailer, thumbnails are queued as images land and swapped into the
+    gallery as they finish. Only the gallery pages from the changed item on are rewritten.
+    prompts.json is written once by the final write_outputs(); until then
+    manifest.jsonl is the record of progress.
+    """
+
+    def __init__(
+        self,
+        out_dir: Path,
+        done: dict[int, dict] | None = None,
+        thumbnailer: Thumbnailer | None = None,
+        page_size: int = GALLERY_PAGE_SIZE,
+    ) -> None:
+        self.out_dir = out_dir
+        self.items = {idx: dict(item) for idx, item in (done or {}).items()}
+        self.order = sorted(self.items)
+        self.thumbnailer = thumbnailer
+        self.page_size = page_size
+        self.pages = 1
+        self.lock = threading.Lock()
+        manifest = out_dir / MANIFEST_NAME
+        if manifest.is_file() and manifest.stat().st_size:
+            with manifest.open("rb+") as handle:
+                handle.seek(-1, os.SEEK_END)
+                if handle.read(1) != b"\n":
+                    handle.write(b"\n")  # terminate a torn line so new records stay parseable
+        for idx, item in self.items.items():
+            if (out_dir / thumbnail_name(item["file"])).is_file():
+                item["thumb"] = thumbnail_name(item["file"])
+            else:
+                self.queue_thumbnail(idx, item["file"])
+
+    def start(self, run: dict) -> None:
+        self.append({"run": run})
+
+    def append(self, record: dict) -> None:
+        with (self.out_dir / MANIFEST_NAME).open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def record(self, idx: int, result: dict) -> None:
+        with self.lock:
+            self.append({"index": idx, **result})
+            if "error" in result:
+                return
+            self.items[idx] = dict(result)
+            bisect.insort(self.order, idx)
+            self.write_outputs(idx)
+        self.queue_thumbnail(idx, result["file"])
+
+    def queue_thumbnail(self, idx: int, filename: str) -> None:
+        if self.thumbnailer is not None:
+            self.thumbnailer.submit(filename, lambda thumb: self.set_thumb(idx, thumb))
+
+    def set_thumb(self, idx: int, thumb: str) -> None:
+        with self.lock:
+            self.items[idx]["thumb"] = thumb
+            self.write_outputs(idx)
+
+    def write_outputs(self, changed: int | None = None) -> None:
+        items = [self.items[idx] for idx in self.order]
+        first_page = 1
+        if changed is None:
+            (self.out_dir / "prompts.json").write_text(json.dumps(items, indent=2), encoding="utf-8")
+        else:
+            rank = bisect.bisect_left(self.order, changed)
+            first_page = min(rank // self.page_size + 1, self.pages)
+        self.pages = write_gallery(self.out_dir, items, self.page_size, first_page)
 
 
 def main() -> int:
@@ -171,69 +1022,107 @@ def main() -> int:
     ap.add_argument("--background", default="", help="Background transparency (GPT models only): transparent, opaque, or auto.")
     ap.add_argument("--output-format", default="", help="Output format (GPT models only): png, jpeg, or webp.")
     ap.add_argument("--style", default="", help="Image style (dall-e-3 only): vivid or natural.")
+    ap.add_argument("--base-url", default="", help="API base URL (default: $OPENAI_BASE_URL or https://api.openai.com/v1).")
     ap.add_argument("--out-dir", default="", help="Output directory (default: ./tmp/openai-image-gen-<ts>).")
+    ap.add_argument("--concurrency", type=int, default=1, help="Requests in flight to start with (default: 1).")
+    ap.add_argument("--max-concurrency", type=int, default=8, help="Ceiling for adaptive concurrency; backs off on 429s (default: 8).")
+    ap.add_argument("--max-retries", type=int, default=5, help="Retries per request on 429/5xx/network errors (default: 5).")
+    ap.add_argument("--max-rpm", type=float, default=0, help="Max requests started per minute (default: unlimited).")
+    ap.add_argument("--resume", default="", metavar="OUT_DIR", help="Continue an interrupted run in OUT_DIR, skipping images already on disk.")
+    ap.add_argument("--download-workers", type=int, default=4, help="Parallel downloads for URL results, e.g. dall-e (default: 4).")
+    ap.add_argument("--thumbs", action=argparse.BooleanOptionalAction, help="WebP thumbnails for the gallery (default: when Pillow is installed); --no-thumbs shows full-size images.")
+    ap.add_argument("--no-cache", action="store_true", help="Always call the API; do not read or write the image cache.")
+    ap.add_argument("--cache-dir", default="", help="Image cache directory (default: ~/.cache/openai-image-gen).")
+    ap.add_argument("--cache-max-mb", type=float, default=2048, help="Evict least-recently-used cached images beyond this size (default: 2048).")
     args = ap.parse_args()
 
     api_key = (os.environ.get("OPENAI_API_KEY") or "").strip()
+    base_url = args.base_url or os.environ.get("OPENAI_BASE_URL") or DEFAULT_BASE_URL
     if not api_key:
         print("Missing OPENAI_API_KEY", file=sys.stderr)
         return 2
 
-    # Apply model-specific defaults if not specified
-    default_size, default_quality = get_model_defaults(args.model)
-    size = args.size or default_size
-    quality = args.quality or default_quality
-
-    count = args.count
-    if args.model == "dall-e-3" and count > 1:
-        print(f"Warning: dall-e-3 only supports generating 1 image at a time. Reducing count from {count} to 1.", file=sys.stderr)
-        count = 1
+    if args.resume:
+        out_dir = Path(args.resume).expanduser()
+        try:
+            run, done = load_manifest(out_dir)
+        except (OSError, RuntimeError) as e:
+            print(f"Cannot resume {out_dir}: {e}", file=sys.stderr)
+            return 2
+        prompts, file_ext, settings = run["prompts"], run["file_ext"], run["settings"]
+        print(f"Resuming {out_dir.as_posix()}: {len(done)} of {len(prompts)} images done", flush=True)
+    else:
+        # Apply model-specific defaults if not specified
+        default_size, default_quality = get_model_defaults(args.model)
+        size = args.size or default_size
+        quality = args.quality or default_quality
 
-    out_dir = Path(args.out_dir).expanduser() if args.out_dir else default_out_dir()
-    out_dir.mkdir(parents=True, exist_ok=True)
+        count = args.count
+        if args.model == "dall-e-3" and count > 1:
+            print(f"Warning: dall-e-3 only supports generating 1 image at a time. Reducing count from {count} to 1.", file=sys.stderr)
+            count = 1
 
-    prompts = [args.prompt] * count if args.prompt else pick_prompts(count)
+        out_dir = Path(args.out_dir).expanduser() if args.out_dir else default_out_dir()
+        out_dir.mkdir(parents=True, exist_ok=True)
 
-    # Determine file extension based on output format
-    if args.model.startswith("gpt-image") and args.output_format:
-        file_ext = args.output_format
-    else:
-        file_ext = "png"
+        prompts = [args.prompt] * count if args.prompt else pick_prompts(count)
 
-    items: list[dict] = []
-    for idx, prompt in enumerate(prompts, start=1):
-        print(f"[{idx}/{len(prompts)}] {prompt}")
-        res = request_images(
-            api_key,
-            prompt,
-            args.model,
-            size,
-            quality,
-            args.background,
-            args.output_format,
-            args.style,
-        )
-        data = res.get("data", [{}])[0]
-        image_b64 = data.get("b64_json")
-        image_url = data.get("url")
-        if not image_b64 and not image_url:
-            raise RuntimeError(f"Unexpected response: {json.dumps(res)[:400]}")
-
-        filename = f"{idx:03d}-{slugify(prompt)[:40]}.{file_ext}"
-        filepath = out_dir / filename
-        if image_b64:
-            filepath.write_bytes(base64.b64decode(image_b64))
+        # Determine file extension based on output format
+        if args.model.startswith("gpt-image") and args.output_format:
+            file_ext = args.output_format
         else:
-            try:
-                urllib.request.urlretrieve(image_url, filepath)
-            except urllib.error.URLError as e:
-                raise RuntimeError(f"Failed to download image from {image_url}: {e}") from e
+            file_ext = "png"
 
-        items.append({"prompt": prompt, "file": filename})
+        settings = {
+            "model": args.model,
+            "size": size,
+            "quality": quality,
+            "background": args.background,
+            "output_format": args.output_format,
+            "style": args.style,
+        }
+        done = {}
+
+    thumbnailer = None
+    if args.thumbs is not False:
+        if Thumbnailer.available():
+            thumbnailer = Thumbnailer(out_dir)
+        elif args.thumbs:
+            print("Pillow not installed; the gallery will use full-size images.", file=sys.stderr)
+    log = RunLog(out_dir, done, thumbnailer)
+    if not args.resume:
+        log.start({"prompts": prompts, "file_ext": file_ext, "settings": settings})
+    items, failures = generate_all(
+        prompts,
+        out_dir,
+        file_ext,
+        {"api_key": api_key, "base_url": base_url, **settings},
+        concurrency=args.concurrency,
+        max_rpm=args.max_rpm,
+        max_n=max_images_per_request(settings["model"]),
+        cache=None
+        if args.no_cache
+        else ImageCache(
+            Path(args.cache_dir).expanduser() if args.cache_dir else default_cache_dir(),
+            int(args.cache_max_mb * 1024 * 1024),
+        ),
+        done=done,
+        on_result=log.record,
+        max_concurrency=args.max_concurrency,
+        max_retries=args.max_retries,
+        download_workers=args.download_workers,
+    )
 
-    (out_dir / "prompts.json").write_text(json.dumps(items, indent=2), encoding="utf-8")
-    write_gallery(out_dir, items)
+    if thumbnailer is not None:
+        thumbnailer.close()
+    log.write_outputs()
     print(f"\nWrote: {(out_dir / 'index.html').as_posix()}")
+    if failures:
+        print(f"{len(failures)} of {len(prompts)} images failed:", file=sys.stderr)
+        for failure in failures:
+            print(f"  [{failure['index']}] {failure['prompt']}: {failure['error']}", file=sys.stderr)
+        print(f"Retry the failed images with: --resume {out_dir.as_posix()}", file=sys.stderr)
+        return 1
     return 0
 
 
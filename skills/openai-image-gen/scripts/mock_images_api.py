@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI Images API, for offline load tests of gen.py.
+
+Serves POST /v1/images/generations with synthetic PNGs, either inline as b64_json
+or as URLs served from the same process, with configurable latency, payload size
+and injected 429s.
+
+Usage:
+    python mock_images_api.py --port 8765 --latency 2 --payload-kb 1500
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock python gen.py --count 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import random
+import signal
+import struct
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def synthetic_png(payload_bytes: int, width: int = 512) -> bytes:
+    """A valid, incompressible RGB PNG of roughly payload_bytes."""
+    row = width * 3 + 1
+    height = max(1, payload_bytes // row)
+    raw = bytearray(os.urandom(row * height))
+    raw[::row] = bytes(height)  # filter type 0 at the start of every scanline
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+        )
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(bytes(raw), 0))
+        + chunk(b"IEND", b"")
+    )
+
+
+class MockImagesServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        mode: str = "b64",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        payload_kb: int = 256,
+        error_rate: float = 0.0,
+        max_in_flight: int = 0,
+        retry_after: float = 1.0,
+    ) -> None:
+        super().__init__(address, MockHandler)
+        self.mode = mode
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.image = synthetic_png(payload_kb * 1024)
+        self.image_b64 = base64.b64encode(self.image).decode("ascii")
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = {"requests": 0, "images": 0, "throttled": 0, "downloads": 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockImagesServer
+
+    def log_message(self, *_args) -> None:
+        pass
+
+    def send_json(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if not self.path.startswith("/images/"):
+            self.send_json(404, {"error": {"message": "not found"}})
+            return
+        server = self.server
+        with server.lock:
+            server.stats["downloads"] += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(server.image)))
+        self.end_headers()
+        self.wfile.write(server.image)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self.send_json(400, {"error": {"message": "invalid JSON body"}})
+            return
+        if self.path.rstrip("/") != "/v1/images/generations":
+            self.send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        server = self.server
+        with server.lock:
+            server.stats["requests"] += 1
+            over = server.max_in_flight and server.in_flight >= server.max_in_flight
+            if over or random.random() < server.error_rate:
+                server.stats["throttled"] += 1
+                throttle = True
+            else:
+                server.in_flight += 1
+                throttle = False
+        if throttle:
+            self.send_json(
+                429,
+                {"error": {"code": "rate_limit_exceeded", "message": "mock rate limit"}},
+                {"Retry-After": f"{server.retry_after:g}"},
+            )
+            return
+
+        try:
+            time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+            n = max(1, int(request.get("n") or 1))
+            if server.mode == "url":
+                host = self.headers.get("Host") or "%s:%d" % server.server_address[:2]
+                data = [
+                    {"url": f"http://{host}/images/{random.getrandbits(64):x}.png"}
+                    for _ in range(n)
+                ]
+            else:
+                data = [{"b64_json": server.image_b64, "revised_prompt": request.get("prompt")}] * n
+            with server.lock:
+                server.stats["images"] += n
+            self.send_json(200, {"created": int(time.time()), "data": data})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Mock OpenAI Images API for offline gen.py runs.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765, help="Port (0 picks a free one).")
+    ap.add_argument("--mode", choices=["b64", "url"], default="b64", help="b64_json or URLs.")
+    ap.add_argument("--latency", type=float, default=0.0, help="Seconds per generation request.")
+    ap.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on --latency.")
+    ap.add_argument("--payload-kb", type=int, default=256, help="Approximate PNG size per image.")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests sent 429.")
+    ap.add_argument(
+        "--max-in-flight", type=int, default=0, help="429 beyond this many concurrent requests."
+    )
+    ap.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on 429s.")
+    args = ap.parse_args()
+
+    server = MockImagesServer(
+        (args.host, args.port),
+        mode=args.mode,
+        latency=args.latency,
+        jitter=args.jitter,
+        payload_kb=args.payload_kb,
+        error_rate=args.error_rate,
+        max_in_flight=args.max_in_flight,
+        retry_after=args.retry_after,
+    )
+    print(server.base_url, flush=True)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,8 +1,16 @@
-"""Tests for write_gallery HTML escaping (fixes #12538 - stored XSS)."""
+"""Tests for gen.py: write_gallery HTML escaping (fixes #12538 - stored XSS) and batching."""
 
+import base64
+import io
+import json
+import os
 import tempfile
+import threading
+import time
 from pathlib import Path
 
+import gen
+import pytest
 from gen import write_gallery
 
 
@@ -48,3 +56,491 @@ def test_write_gallery_normal_output():
         assert 'src="001-lobster.png"' in html
         assert "002-nook.png" in html
 
+
+
+def _fake_b64(prompt: str) -> str:
+    return base64.b64encode(prompt.encode("utf-8")).decode("ascii")
+
+
+def test_generate_all_runs_concurrently_and_keeps_names(monkeypatch):
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def fake_request_images(prompt, n=1, **_kwargs):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.05)
+        with lock:
+            in_flight -= 1
+        if prompt == "boom":
+            raise RuntimeError("OpenAI Images API failed (500): oops")
+        return {"data": [{"b64_json": _fake_b64(prompt)}]}
+
+    monkeypatch.setattr(gen, "request_images", fake_request_images)
+    prompts = ["a cat", "boom", "a dog", "a fox"]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir)
+        items, failures = gen.generate_all(prompts, out, "png", {}, concurrency=4)
+
+        assert [it["file"] for it in items] == ["001-a-cat.png", "003-a-dog.png", "004-a-fox.png"]
+        assert (out / "003-a-dog.png").read_bytes() == b"a dog"
+    assert failures == [{"prompt": "boom", "index": 2, "error": "OpenAI Images API failed (500): oops"}]
+    assert peak > 1
+
+
+def test_generate_all_batches_identical_prompts(monkeypatch):
+    calls = []
+
+    def fake_request_images(prompt, n=1, **_kwargs):
+        calls.append((prompt, n))
+        # Return one image short for the big batch to exercise per-item failures.
+        count = n - 1 if n == 3 else n
+        return {"data": [{"b64_json": _fake_b64(f"{prompt}-{i}")} for i in range(count)]}
+
+    monkeypatch.setattr(gen, "request_images", fake_request_images)
+    prompts = ["cat", "dog", "cat", "cat", "cat", "dog"]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir)
+        items, failures = gen.generate_all(prompts, out, "png", {}, concurrency=2, max_n=3)
+
+        assert (out / "003-cat.png").read_bytes() == b"cat-1"
+        assert (out / "005-cat.png").read_bytes() == b"cat-0"
+    assert sorted(calls) == [("cat", 1), ("cat", 3), ("dog", 2)]
+    assert [it["file"] for it in items] == [
+        "001-cat.png",
+        "002-dog.png",
+        "003-cat.png",
+        "005-cat.png",
+        "006-dog.png",
+    ]
+    assert [f["index"] for f in failures] == [4]
+
+
+def test_read_images_response_streams_b64_to_sinks():
+    images = [bytes(range(256)) * 40, b"second image"]
+    encoded = [base64.b64encode(img).decode("ascii") for img in images]
+    # Escaped slashes, as some JSON encoders emit them.
+    encoded[0] = encoded[0].replace("/", "\\/")
+    body = (
+        '{"created": 1, "data": [{"revised_prompt": "say \\"b64_json\\"", "b64_json": "%s"},'
+        ' {"b64_json" : "%s"}], "usage": {"total_tokens": 3}}' % tuple(encoded)
+    ).encode("utf-8")
+
+    for chunk_size in (1, 3, 7, 4096):
+        sinks = {}
+
+        def open_sink(k):
+            sinks[k] = io.BytesIO()
+            sinks[k].close = lambda: None
+            return sinks[k]
+
+        res = gen.read_images_response(io.BytesIO(body), open_sink, chunk_size=chunk_size)
+        assert res["data"][0] == {"revised_prompt": 'say "b64_json"', "b64_json": 0}
+        assert res["data"][1] == {"b64_json": 1}
+        assert res["usage"] == {"total_tokens": 3}
+        assert [sinks[k].getvalue() for k in (0, 1)] == images
+
+
+def test_generate_batch_renames_streamed_parts(monkeypatch):
+    def fake_request_images(prompt, n=1, open_sink=None, **_kwargs):
+        body = json.dumps({"data": [{"b64_json": _fake_b64(f"{prompt}-{i}")} for i in range(n)]})
+        return gen.read_images_response(io.BytesIO(body.encode("utf-8")), open_sink)
+
+    monkeypatch.setattr(gen, "request_images", fake_request_images)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir)
+        results = gen.generate_batch("owl", [1, 2], out, "png", {}, gen.RequestScheduler())
+
+        assert [r["file"] for _, r in results] == ["001-owl.png", "002-owl.png"]
+        assert (out / "002-owl.png").read_bytes() == b"owl-1"
+        assert sorted(p.name for p in out.iterdir()) == ["001-owl.png", "002-owl.png"]
+
+
+def test_generate_batch_retries_after_a_failure_mid_stream(monkeypatch):
+    attempts = []
+
+    def flaky_request_images(prompt, n=1, open_sink=None, **_kwargs):
+        attempts.append(1)
+        if len(attempts) == 1:
+            with open_sink(0) as sink:
+                sink.write(b"truncated")
+            raise gen.ImagesAPIError("connection reset", retryable=True)
+        body = json.dumps({"data": [{"b64_json": _fake_b64(f"{prompt}-{i}")} for i in range(n)]})
+        return gen.read_images_response(io.BytesIO(body.encode("utf-8")), open_sink)
+
+    monkeypatch.setattr(gen, "request_images", flaky_request_images)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir)
+        scheduler = gen.RequestScheduler(backoff_base=0.001)
+        results = gen.generate_batch("owl", [1, 2], out, "png", {}, scheduler)
+
+        assert len(attempts) == 2
+        assert [r.get("file") for _, r in results] == ["001-owl.png", "002-owl.png"]
+        assert (out / "001-owl.png").read_bytes() == b"owl-0"
+        assert (out / "002-owl.png").read_bytes() == b"owl-1"
+        assert sorted(p.name for p in out.iterdir()) == ["001-owl.png", "002-owl.png"]
+
+
+def test_generate_all_reuses_cached_images(monkeypatch):
+    calls = []
+
+    def fake_request_images(prompt, n=1, **_kwargs):
+        calls.append((prompt, n))
+        return {"data": [{"b64_json": _fake_b64(f"{prompt}-{len(calls)}-{i}")} for i in range(n)]}
+
+    monkeypatch.setattr(gen, "request_images", fake_request_images)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        cache = gen.ImageCache(root / "cache", max_bytes=1 << 20)
+        args = {"api_key": "k1", "model": "gpt-image-1", "size": "1024x1024"}
+        (root / "a").mkdir()
+        gen.generate_all(["cat", "cat"], root / "a", "png", args, max_n=10, cache=cache)
+
+        # Same request with a different key: both slots hit, one new slot is generated.
+        (root / "b").mkdir()
+        other_key = dict(args, api_key="k2")
+        items, failures = gen.generate_all(
+            ["cat", "cat", "cat"], root / "b", "png", other_key, max_n=10, cache=cache
+        )
+        assert failures == []
+        assert [it["file"] for it in items] == ["001-cat.png", "002-cat.png", "003-cat.png"]
+        assert (root / "b" / "002-cat.png").read_bytes() == b"cat-1-1"
+        assert (root / "b" / "003-cat.png").read_bytes() == b"cat-2-0"
+        assert calls == [("cat", 2), ("cat", 1)]
+
+        # Outputs are copies: editing one in place leaves the cached image intact.
+        with (root / "b" / "002-cat.png").open("r+b") as handle:
+            handle.write(b"dog")
+        (root / "d").mkdir()
+        gen.generate_all(["cat", "cat"], root / "d", "png", args, max_n=10, cache=cache)
+        assert (root / "d" / "002-cat.png").read_bytes() == b"cat-1-1"
+
+        # Changing any generation parameter misses the cache.
+        (root / "c").mkdir()
+        gen.generate_all(["cat"], root / "c", "png", dict(args, size="512x512"), cache=cache)
+        assert calls[-1] == ("cat", 1) and len(calls) == 3
+
+
+def test_image_cache_evicts_least_recently_used():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        cache = gen.ImageCache(root / "cache", max_bytes=25)
+        for name in ("a", "b", "c"):
+            src = root / name
+            src.write_bytes(name.encode() * 10)
+            cache.store(name * 64, 0, src)
+            os.utime(cache.path(name * 64, 0), (0, {"a": 1, "b": 2, "c": 3}[name]))
+            if name == "b":
+                # Touch "a" so "b" becomes the least recently used entry.
+                assert cache.fetch("a" * 64, 0, root / "hit")
+                os.utime(cache.path("a" * 64, 0), (0, 5))
+
+        assert cache.path("a" * 64, 0).exists()
+        assert not cache.path("b" * 64, 0).exists()
+        assert cache.path("c" * 64, 0).exists()
+
+
+def test_resume_skips_images_recorded_in_manifest(monkeypatch):
+    calls = []
+    broken = {"dog"}
+
+    def fake_request_images(prompt, n=1, **_kwargs):
+        calls.append(prompt)
+        if prompt in broken:
+            raise RuntimeError("OpenAI Images API failed (500): oops")
+        return {"data": [{"b64_json": _fake_b64(prompt)}]}
+
+    monkeypatch.setattr(gen, "request_images", fake_request_images)
+    prompts = ["cat", "dog", "fox"]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir)
+        log = gen.RunLog(out)
+        log.start({"prompts": prompts, "file_ext": "png", "settings": {"model": "gpt-image-1"}})
+        _, failures = gen.generate_all(prompts, out, "png", {}, on_result=log.record)
+        assert [f["index"] for f in failures] == [2]
+        # The gallery already lists finished images before the run ends; prompts.json waits.
+        assert "003-fox.png" in (out / "index.html").read_text()
+        assert not (out / "prompts.json").exists()
+
+        (out / "003-fox.png").unlink()
+        with (out / gen.MANIFEST_NAME).open("a") as handle:
+            handle.write('{"index": 1, "pro')  # torn line from a crash
+        run, done = gen.load_manifest(out)
+        assert run["prompts"] == prompts
+        assert done == {1: {"prompt": "cat", "file": "001-cat.png"}}
+
+        broken.clear()
+        calls.clear()
+        log = gen.RunLog(out, done)
+        items, failures = gen.generate_all(prompts, out, "png", {}, done=done, on_result=log.record)
+        assert calls == ["dog", "fox"]
+        assert failures == []
+        assert [it["file"] for it in items] == ["001-cat.png", "002-dog.png", "003-fox.png"]
+        log.write_outputs()
+        assert json.loads((out / "prompts.json").read_text()) == items
+        assert sorted(gen.load_manifest(out)[1]) == [1, 2, 3]
+
+
+def test_write_gallery_paginates_and_prefers_thumbnails():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir)
+        items = [{"prompt": f"p{i}", "file": f"{i:03d}-p.png"} for i in range(1, 6)]
+        items[0]["thumb"] = "thumbs/001-p.webp"
+        assert write_gallery(out, items, page_size=2) == 3
+
+        first = (out / "index.html").read_text()
+        assert '<a href="001-p.png"><img src="thumbs/001-p.webp"' in first
+        assert 'src="002-p.png"' in first and "003-p.png" not in first
+        assert 'href="index-2.html"' in first
+        last = (out / "index-3.html").read_text()
+        assert "005-p.png" in last and 'href="index-2.html"' in last
+
+        assert write_gallery(out, items[:2], page_size=2) == 1
+        assert not (out / "index-2.html").exists()
+
+
+def test_run_log_rewrites_only_changed_pages():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir)
+        log = gen.RunLog(out, page_size=2)
+        for idx in (1, 2, 3):
+            log.record(idx, {"prompt": f"p{idx}", "file": f"{idx:03d}-p.png"})
+        assert 'href="index-2.html"' in (out / "index.html").read_text()
+
+        (out / "index.html").write_text("untouched")
+        log.set_thumb(3, "thumbs/003-p.webp")
+        assert (out / "index.html").read_text() == "untouched"
+        assert 'src="thumbs/003-p.webp"' in (out / "index-2.html").read_text()
+
+
+def test_make_thumbnail_writes_small_webp():
+    image = pytest.importorskip("PIL.Image")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "001-big.png"
+        image.new("RGBA", (2048, 1024), (255, 0, 0, 128)).save(src)
+        dest = Path(tmpdir) / "thumb.webp"
+        gen.make_thumbnail(str(src), str(dest), size=256)
+        with image.open(dest) as thumb:
+            assert thumb.format == "WEBP"
+            assert thumb.size == (256, 128)
+
+
+def _http_error(code, body, headers=None):
+    import email.message
+    import urllib.error
+
+    msg = email.message.Message()
+    for key, value in (headers or {}).items():
+        msg[key] = value
+    return urllib.error.HTTPError("https://example.test", code, "err", msg, io.BytesIO(body))
+
+
+def test_request_images_classifies_http_errors(monkeypatch):
+    errors = [
+        _http_error(429, b'{"error": {"code": "rate_limit_exceeded"}}', {"Retry-After": "7"}),
+        _http_error(429, b'{"error": {"code": "insufficient_quota"}}'),
+        _http_error(400, b'{"error": {"code": "content_policy_violation"}}'),
+        _http_error(503, b"busy", {"retry-after-ms": "250"}),
+    ]
+
+    def fake_urlopen(req, timeout):
+        raise errors.pop(0)
+
+    monkeypatch.setattr(gen.urllib.request, "urlopen", fake_urlopen)
+    seen = []
+    for _ in range(4):
+        with pytest.raises(gen.ImagesAPIError) as info:
+            gen.request_images("k", "p", "gpt-image-1", "1024x1024", "high")
+        seen.append((info.value.status, info.value.retry_after, info.value.retryable))
+    assert seen == [(429, 7.0, True), (429, None, False), (400, None, False), (503, 0.25, True)]
+
+
+def test_parse_retry_after_accepts_http_date():
+    when = gen.dt.datetime.now(gen.dt.timezone.utc) + gen.dt.timedelta(seconds=30)
+    delay = gen.parse_retry_after({"Retry-After": gen.email.utils.format_datetime(when)})
+    assert 25 < delay <= 30
+    assert gen.parse_retry_after({"Retry-After": "soon"}) is None
+
+
+def test_scheduler_retries_and_backs_off_on_429():
+    scheduler = gen.RequestScheduler(concurrency=4, max_concurrency=8, backoff_base=0.01)
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise gen.ImagesAPIError("slow down", status=429, retry_after=0.05, retryable=True)
+        return "ok"
+
+    assert scheduler.call(flaky) == "ok"
+    assert attempts[1] - attempts[0] >= 0.05
+    # Halved once per 429 (4 -> 2 -> 1), then grows by 1/limit on success.
+    assert scheduler.limit == 2.0
+    assert scheduler.in_flight == 0
+
+    calls = []
+
+    def rejected():
+        calls.append(1)
+        raise gen.ImagesAPIError("bad request", status=400)
+
+    with pytest.raises(gen.ImagesAPIError):
+        scheduler.call(rejected)
+    assert calls == [1]
+
+
+def test_scheduler_grows_concurrency_on_success():
+    scheduler = gen.RequestScheduler(concurrency=1, max_concurrency=3)
+    for _ in range(20):
+        scheduler.call(lambda: None)
+    assert scheduler.limit == 3
+
+
+def test_generate_all_adapts_to_rate_limits(monkeypatch):
+    in_flight = 0
+    lock = threading.Lock()
+    throttled = 0
+
+    def fake_request_images(prompt, n=1, **_kwargs):
+        nonlocal in_flight, throttled
+        with lock:
+            in_flight += 1
+            over = in_flight > 2
+            throttled += over
+        try:
+            if over:
+                raise gen.ImagesAPIError("429", status=429, retry_after=0.01, retryable=True)
+            time.sleep(0.02)
+            return {"data": [{"b64_json": _fake_b64(prompt)}]}
+        finally:
+            with lock:
+                in_flight -= 1
+
+    monkeypatch.setattr(gen, "request_images", fake_request_images)
+    prompts = [f"p{i}" for i in range(12)]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        items, failures = gen.generate_all(
+            prompts, Path(tmpdir), "png", {}, concurrency=8, max_concurrency=8
+        )
+    assert failures == []
+    assert len(items) == 12
+    assert throttled > 0
+
+
+def _serve_images(bodies):
+    """Serve bodies[path] over HTTP/1.1 keep-alive; returns (server, base_url, connections)."""
+    import http.server
+
+    connections = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            connections.append(self.client_address)
+
+        def do_GET(self):
+            body = bodies.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", connections
+
+
+def test_generate_all_downloads_url_results_over_pooled_connections(monkeypatch):
+    bodies = {f"/img/{i}.png": f"image-{i}".encode() * 1000 for i in range(8)}
+    server, base, connections = _serve_images(bodies)
+
+    def fake_request_images(prompt, n=1, **_kwargs):
+        return {"data": [{"url": f"{base}/img/{prompt[1:]}.png"}]}
+
+    monkeypatch.setattr(gen, "request_images", fake_request_images)
+    prompts = [f"p{i}" for i in range(8)] + ["pgone"]
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out = Path(tmpdir)
+            items, failures = gen.generate_all(
+                prompts, out, "png", {}, concurrency=4, download_workers=2
+            )
+            assert len(items) == 8
+            assert (out / "004-p3.png").read_bytes() == bodies["/img/3.png"]
+            assert not [p.name for p in out.iterdir() if p.name.startswith(".")]
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert [f["prompt"] for f in failures] == ["pgone"]
+    assert "HTTP 404" in failures[0]["error"]
+    # Two download threads, each on one kept-alive connection (plus one after the 404).
+    assert len(connections) <= 3
+
+
+def test_downloader_rejects_oversized_images():
+    server, base, _ = _serve_images({"/big.png": b"x" * 5000})
+    downloader = gen.Downloader(workers=1, max_bytes=4096)
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dest = Path(tmpdir) / "big.png"
+            with pytest.raises(RuntimeError, match="limit 4096"):
+                downloader.download(f"{base}/big.png", dest)
+            assert list(Path(tmpdir).iterdir()) == []
+    finally:
+        downloader.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_request_images_against_mock_server(monkeypatch):
+    from mock_images_api import MockImagesServer
+
+    downloaders = []
+
+    class RecordingDownloader(gen.Downloader):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            downloaders.append(self)
+
+    monkeypatch.setattr(gen, "Downloader", RecordingDownloader)
+
+    server = MockImagesServer(("127.0.0.1", 0), payload_kb=8, max_in_flight=1, retry_after=3)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out = Path(tmpdir)
+            request_args = {
+                "api_key": "mock",
+                "base_url": server.base_url,
+                "model": "gpt-image-1",
+                "size": "1024x1024",
+                "quality": "low",
+            }
+            items, failures = gen.generate_all(["a", "a"], out, "png", request_args, max_n=10)
+            assert failures == []
+            assert (out / "002-a.png").read_bytes() == server.image
+            assert server.image.startswith(b"\x89PNG")
+            # Only b64_json came back, so the download pool was never started.
+            assert downloaders and all(d.pool is None for d in downloaders)
+
+        server.in_flight = 1  # simulate a concurrent request holding the only slot
+        with pytest.raises(gen.ImagesAPIError) as info:
+            gen.request_images(
+                "mock", "b", "gpt-image-1", "1024x1024", "low", base_url=server.base_url
+            )
+        assert (info.value.status, info.value.retry_after) == (429, 3.0)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert server.stats["images"] == 2 and server.stats["throttled"] == 1